@@ -1,13 +1,27 @@
 import os
+import time
 import base64
-from typing import List
+import asyncio
+import logging
+from typing import Dict, List, Optional, Union
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 
-from config import RAW_PDF_DIR, EXTRACTED_TEXT_DIR
-from buscador.search_engine import search
+from config import (RAW_PDF_DIR, EXTRACTED_TEXT_DIR, SEARCH_MODES,
+                    SEARCH_MODE_DEFAULT, CANDIDATES_K_DEFAULT, SHARDS, LOG_LEVEL)
+from buscador.search_engine import search, get_indices, start_index_watcher
+from buscador.coordinador import (search_shard, search_shards, shards_from_config,
+                                  warm_shards, watch_shard_generations)
+from buscador.filtros import ConsultaInvalida
+from buscador.metricas import span, render_metrics, REQUEST_LATENCY
+from indexador.snippet_index import make_snippet
+
+logging.basicConfig(level=LOG_LEVEL,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 
 class SearchResult(BaseModel):
@@ -18,8 +32,22 @@ class SearchResult(BaseModel):
     score: float
 
 
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
+    candidatos: int
+    documentos: int
+    tiempos_ms: Optional[Dict[str, float]] = None
+    facetas: Optional[Dict[str, Dict[str, int]]] = None
+
+
 app = FastAPI(title="Buscador Semántico")
 
+# Con BUSCADOR_SHARDS esta API es el coordinador: reparte cada consulta
+# entre los shards en lugar de buscar en un índice propio
+_SHARDS = []
+# Tarea que cambia los shards locales de generación
+_SHARD_WATCHER = []
+
 # CORS para permitir llamadas desde React en localhost:3000
 origins = [
     "http://localhost:3000",
@@ -35,10 +63,41 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+async def load_indices_on_startup():
+    """
+    Carga los índices al arrancar para que la primera consulta no pague la
+    lectura de disco ni la carga del modelo fastText, y arranca el hilo que
+    activa en caliente las generaciones que publique una reindexación.
+    Como coordinador espera a que todos los shards hayan cargado y, con
+    shards locales, arranca la tarea que los cambia de generación.
+    """
+    if SHARDS:
+        _SHARDS.extend(shards_from_config(SHARDS))
+        logger.info("Coordinador de %d shards: %s", len(_SHARDS),
+                    [shard.name for shard in _SHARDS])
+        await warm_shards(_SHARDS)
+        if SHARDS.strip() == 'local':
+            _SHARD_WATCHER.append(asyncio.create_task(watch_shard_generations(_SHARDS)))
+        return
+    get_indices()
+    start_index_watcher()
+
+
+@app.on_event("shutdown")
+def close_shards():
+    for task in _SHARD_WATCHER:
+        task.cancel()
+    for shard in _SHARDS:
+        shard.close()
+
+
 def get_snippet(query: str, txt_path: str) -> str:
     """
     Extrae 100 caracteres antes y después del primer término encontrado
     en txt_path; si no hay coincidencias, devuelve los primeros 200 caracteres.
+    Solo se usa si no se ha construido el índice de snippets (lee el libro
+    entero en cada llamada).
     """
     if not os.path.exists(txt_path):
         return ""
@@ -53,39 +112,103 @@ def get_snippet(query: str, txt_path: str) -> str:
     return text[:200].strip()
 
 
-@app.get("/search", response_model=List[SearchResult])
+def server_timing(tiempos: dict) -> str:
+    """
+    Formatea los tiempos por etapa (ms) como cabecera HTTP `Server-Timing`.
+    """
+    return ", ".join(f"{etapa};dur={ms:.3f}" for etapa, ms in tiempos.items())
+
+
+@app.get("/search", response_model=Union[List[SearchResult], SearchResponse])
 async def search_endpoint(
     q: str,
+    response: Response,
     top: int = 10,
-    weight: float = 0.5
+    weight: float = 0.5,
+    mode: str = SEARCH_MODE_DEFAULT,
+    k: int = CANDIDATES_K_DEFAULT,
+    debug: Optional[str] = None,
+    filter: Optional[List[str]] = Query(None),
+    facets: bool = False,
+    highlight: bool = False
 ):
     """
     q: términos de búsqueda
     top: número de resultados a devolver (default 10)
     weight: peso TF-IDF vs BM25F [0..1]
+    mode: 'completo' (todo el corpus) o 'etapas' (BM25F + re-puntuación)
+    k: número de candidatos BM25F a re-puntuar en modo 'etapas'
+    debug: 'timings' para envolver los resultados junto a los tiempos por etapa
+    filter: filtros de metadatos, repetibles (filter=year>=2019&filter=lang=es)
+    facets: envolver los resultados junto a los recuentos por source/lang/year
+    highlight: snippet en HTML escapado con los términos entre <mark></mark>
+
+    Los tiempos por etapa se devuelven siempre en la cabecera `Server-Timing`,
+    el número de candidatos evaluados en `X-Search-Candidates` y la
+    generación de índices usada en `X-Index-Generation`. Como coordinador,
+    `X-Search-Shards` indica cuántos shards han respondido (ok/total); si
+    falta alguno los resultados son parciales.
     """
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400,
+                            detail=f"mode debe ser uno de {list(SEARCH_MODES)}")
+    if k < 1:
+        raise HTTPException(status_code=400, detail="k debe ser >= 1")
+    if debug not in (None, 'timings'):
+        raise HTTPException(status_code=400, detail="debug solo admite 'timings'")
+
+    inicio = time.perf_counter()
+
+    # Búsqueda y snippets sobre la misma generación aunque se recargue a mitad
+    # (el coordinador no tiene índices: los snippets los devuelven los shards)
+    indices = None if _SHARDS else get_indices()
+
     # Llamamos a la función híbrida (TF-IDF, BM25F y fastText)
-    results = search(q, top_n=top, tfidf_weight=weight)
+    stats = {}
+    try:
+        if _SHARDS:
+            results = await search_shards(q, _SHARDS, top_n=top, stats=stats,
+                                          tfidf_weight=weight, mode=mode, candidates_k=k,
+                                          filters=filter, facets=facets,
+                                          snippets=True, highlight=highlight)
+        else:
+            results = search(q, top_n=top, tfidf_weight=weight,
+                             mode=mode, candidates_k=k, stats=stats,
+                             indices=indices, filters=filter, facets=facets)
+    except ConsultaInvalida as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    tiempos = stats['tiempos_ms']
 
-    response = []
+    items = []
     for doc_path, score in results:
         # Título (nombre de archivo sin extensión)
         filename = os.path.basename(doc_path)
         title, _ = os.path.splitext(filename)
 
-        # Snippet
-        txt_path = os.path.join(EXTRACTED_TEXT_DIR, title + '.txt')
-        snippet = get_snippet(q, txt_path)
+        # Snippet: ventana precalculada; si no hay índice, lectura completa
+        with span('snippet', tiempos):
+            snippet = None
+            if _SHARDS:
+                snippet = stats.get('snippets', {}).get(doc_path)
+            elif (indices is not None and indices['snippet_index'] is not None
+                    and indices['positional_index'] is not None):
+                snippet = make_snippet(doc_path, stats['terminos'], stats['expandidos'],
+                                       indices['positional_index'],
+                                       indices['snippet_index'], highlight=highlight)
+            if snippet is None:
+                txt_path = os.path.join(EXTRACTED_TEXT_DIR, doc_path + '.txt')
+                snippet = get_snippet(q, txt_path)
 
         # Ruta absoluta al PDF
         absolute_pdf_path = os.path.abspath(os.path.join(RAW_PDF_DIR, filename))+'.pdf'
 
         # Lectura y codificación Base64
-        with open(absolute_pdf_path, 'rb') as f:
-            file_bytes = f.read()
-        file_base64 = base64.b64encode(file_bytes).decode('utf-8')
+        with span('lectura_pdf', tiempos):
+            with open(absolute_pdf_path, 'rb') as f:
+                file_bytes = f.read()
+            file_base64 = base64.b64encode(file_bytes).decode('utf-8')
 
-        response.append(
+        items.append(
             SearchResult(
                 title=title,
                 content=snippet,
@@ -95,7 +218,66 @@ async def search_endpoint(
             )
         )
 
-    return response
+    REQUEST_LATENCY.observe('/search', time.perf_counter() - inicio)
+    response.headers['Server-Timing'] = server_timing(tiempos)
+    response.headers['X-Search-Candidates'] = f"{stats['candidatos']}/{stats['documentos']}"
+    if _SHARDS:
+        ok = sum(1 for estado in stats['shards'].values() if estado == 'ok')
+        response.headers['X-Search-Shards'] = f"{ok}/{len(_SHARDS)}"
+        response.headers['X-Index-Generation'] = 'shards'
+    else:
+        response.headers['X-Index-Generation'] = indices.get('generacion') or 'plano'
+    logger.info("q=%r modo=%s candidatos=%d/%d resultados=%d total=%.1fms",
+                q, mode, stats['candidatos'], stats['documentos'], len(items),
+                (time.perf_counter() - inicio) * 1000.0)
+
+    if debug == 'timings' or facets:
+        return SearchResponse(
+            results=items,
+            candidatos=stats['candidatos'],
+            documentos=stats['documentos'],
+            tiempos_ms=({etapa: round(ms, 3) for etapa, ms in tiempos.items()}
+                        if debug == 'timings' else None),
+            facetas=stats.get('facetas')
+        )
+    return items
+
+
+@app.get("/shard/search")
+def shard_search_endpoint(
+    q: str,
+    top_n: int = 10,
+    tfidf_weight: float = 0.5,
+    mode: str = SEARCH_MODE_DEFAULT,
+    candidates_k: int = CANDIDATES_K_DEFAULT,
+    filters: Optional[List[str]] = Query(None),
+    facets: bool = False,
+    snippets: bool = False,
+    highlight: bool = False
+):
+    """
+    Búsqueda interna para el coordinador (buscador/coordinador.py, HttpShard)
+    cuando esta API sirve un shard (BUSCADOR_SHARD=<n>). Devuelve el top_n
+    del shard con sus scores y las estadísticas de la consulta (con
+    `snippets`, también el snippet de cada resultado en stats['snippets']).
+    """
+    params = {'top_n': top_n, 'tfidf_weight': tfidf_weight, 'mode': mode,
+              'candidates_k': candidates_k, 'filters': filters, 'facets': facets,
+              'snippets': snippets, 'highlight': highlight}
+    try:
+        results, stats = search_shard(q, params, indices=get_indices())
+    except ConsultaInvalida as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {'results': [[doc, float(score)] for doc, score in results], 'stats': stats}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """
+    Histogramas de latencia por etapa y por petición en formato Prometheus.
+    """
+    return PlainTextResponse(render_metrics(),
+                             media_type="text/plain; version=0.0.4")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+# benchmarks/compare.py
+"""
+Compara dos informes de benchmarks/run_benchmarks.py.
+
+Uso:
+    python -m benchmarks.compare base.json nuevo.json [--umbral 10]
+
+Imprime la variación porcentual de cada métrica numérica y termina con
+código 1 si alguna métrica de rendimiento empeora más que el umbral: sube
+una latencia, un tiempo, un tamaño o la memoria, o baja un throughput (qps,
+*_por_segundo), un recall o una reducción de memoria.
+"""
+
+import sys
+import json
+import argparse
+
+
+# Dirección de cada métrica según su camino en el informe ('a.b.c'): se
+# comprueba primero MAYOR_ES_MEJOR ('docs_por_segundo' no es un tiempo). Las
+# que no encajan en ninguna (tamaño del corpus, candidatos) solo se muestran
+MAYOR_ES_MEJOR = ('qps', '_por_segundo', 'recall', 'coincidencia', 'reduccion')
+MENOR_ES_MEJOR = ('_ms', 'segundos', 'bytes')
+
+
+def direction(key: str) -> int:
+    """
+    +1 si un valor mayor de la métrica es mejor, -1 si es peor, 0 si no es
+    una métrica de rendimiento.
+    """
+    if any(pattern in key for pattern in MAYOR_ES_MEJOR):
+        return 1
+    if any(pattern in key for pattern in MENOR_ES_MEJOR):
+        return -1
+    return 0
+
+
+def flatten(data: dict, prefix: str = '') -> dict:
+    """
+    Aplana un informe anidado a {'a.b.c': valor} con solo valores numéricos.
+    """
+    flat = {}
+    for key, value in data.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(base: dict, new: dict, threshold: float) -> list:
+    """
+    Retorna [(métrica, base, nuevo, delta_pct, regresión)] para las métricas
+    presentes en ambos informes (se omiten los parámetros de la ejecución).
+    Es regresión si la métrica empeora, en su dirección, más del `threshold` %.
+    """
+    rows = []
+    flat_base = flatten({k: v for k, v in base.items() if k != 'meta'})
+    flat_new = flatten({k: v for k, v in new.items() if k != 'meta'})
+    for key in sorted(flat_base.keys() & flat_new.keys()):
+        old, cur = flat_base[key], flat_new[key]
+        delta = (cur - old) / old * 100.0 if old else 0.0
+        regression = -direction(key) * delta > threshold
+        rows.append((key, old, cur, delta, regression))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base')
+    parser.add_argument('nuevo')
+    parser.add_argument('--umbral', type=float, default=10.0,
+                        help='empeoramiento máximo permitido de cada métrica (%%)')
+    args = parser.parse_args(argv)
+
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.nuevo, encoding='utf-8') as f:
+        new = json.load(f)
+
+    if base['meta']['parametros'] != new['meta']['parametros']:
+        print("⚠️  Los informes usan parámetros distintos; la comparación no es directa.")
+
+    print(f"base={base['meta']['commit']}  nuevo={new['meta']['commit']}")
+    rows = compare(base, new, args.umbral)
+    width = max((len(r[0]) for r in rows), default=10)
+    for key, old, cur, delta, regression in rows:
+        mark = '  ← REGRESIÓN' if regression else ''
+        print(f"{key:<{width}}  {old:>14.4f}  {cur:>14.4f}  {delta:>+8.1f}%{mark}")
+
+    if any(r[4] for r in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,578 @@
+# benchmarks/run_benchmarks.py
+"""
+Benchmark reproducible de indexado y consulta sobre un corpus sintético.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.run_benchmarks --docs 10000 --output bench.json
+    python -m benchmarks.compare base.json bench.json
+
+No necesita PDFs, PyPDF2 ni el modelo fastText: el corpus y la tabla de
+embeddings se generan con una semilla fija, de modo que dos ejecuciones con
+los mismos parámetros miden exactamente el mismo trabajo.
+
+Por defecto todo el corpus se indexa en un solo proceso y en memoria
+(tokens, TF-IDF, BM25F, posiciones y embeddings a la vez: unos 220 bytes
+por token), así que --docs x --doc-length está limitado a MAX_CORPUS_TOKENS
+(~4-5 GB de pico). Para corpus mayores, --shards N escribe el corpus en
+disco en streaming (un .txt por documento, en el directorio temporal del
+sistema: TMPDIR), lo indexa con indexador.shards.build_sharded_index (en
+memoria solo hay un shard a la vez, el límite pasa a ser por shard) y mide
+las consultas a través del coordinador con un LocalShard por shard:
+
+    python -m benchmarks.run_benchmarks --docs 1000000 --doc-length 500 --shards 32
+
+En ese modo los metadatos son los que extrae el indexador (sin PDFs), de
+modo que no hay consultas '<modo>_filtros', ni --compartido ni --cuantizacion.
+"""
+
+import os
+import sys
+import json
+import time
+import heapq
+import shutil
+import asyncio
+import argparse
+import contextlib
+import platform
+import tempfile
+import subprocess
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import numpy as np
+
+from extractor.preprocess import preprocess_text
+from indexador.tfidf_index import (compute_tfidf_index, save_tfidf_index,
+                                   load_tfidf_index)
+from indexador.bm25f_index import (compute_bm25f_index, save_bm25f_index,
+                                   load_bm25f_index)
+from indexador.fasttext_index import (compute_doc_embedding, embeddings_matrix,
+                                      save_quantized_embeddings, load_quantized_embeddings,
+                                      QUANTIZATION_METHODS)
+from indexador.positional_index import (compute_positional_index,
+                                        save_positional_index,
+                                        load_positional_index)
+from buscador.search_engine import search
+from buscador.filtros import build_filter_index
+from buscador.shared_index import publish_shared_index, attach_shared_index
+from buscador.coordinador import local_shards, warm_shards, search_shards
+from indexador.shards import build_sharded_index
+from benchmarks.synthetic import (generate_corpus, generate_queries,
+                                  generate_phrase_queries, generate_metadata,
+                                  SyntheticEmbeddings)
+from config import SEARCH_MODES, CANDIDATES_K_DEFAULT, PQ_SUBVECTORS, EMBEDDINGS_RERANK
+
+PERCENTILES = (50, 95, 99)
+
+# Límite de --docs x --doc-length / --shards (tokens antes de preprocesar
+# que se indexan en memoria a la vez); --sin-limite lo ignora
+MAX_CORPUS_TOKENS = 20_000_000
+
+# Documentos del corpus escrito en disco (--shards) de los que se toman las
+# consultas de frase
+PHRASE_SAMPLE_DOCS = 2000
+
+# Filtros de las consultas '<modo>_filtros' (~13% de los documentos)
+BENCH_FILTERS = ['year>=2020', 'lang=es', 'source!=fuente_0']
+
+
+def peak_rss_bytes(children: bool = False):
+    """
+    Pico de memoria residente del proceso (ru_maxrss está en KB en Linux y en
+    bytes en macOS). Con `children`, el del mayor de los procesos hijos ya
+    terminados. None si la plataforma no lo expone.
+    """
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocido'
+
+
+def latency_summary(samples_ms: list) -> dict:
+    """
+    p50/p95/p99, media y máximo (ms) de una lista de tiempos.
+    """
+    arr = np.asarray(samples_ms, dtype=np.float64)
+    summary = {f"p{p}": round(float(np.percentile(arr, p)), 4) for p in PERCENTILES}
+    summary['media'] = round(float(arr.mean()), 4)
+    summary['max'] = round(float(arr.max()), 4)
+    return summary
+
+
+def dir_size(path: str) -> dict:
+    sizes = {name: os.path.getsize(os.path.join(path, name))
+             for name in sorted(os.listdir(path))}
+    sizes['total'] = sum(sizes.values())
+    return sizes
+
+
+def tree_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, files in os.walk(path) for name in files)
+
+
+def throughput(n_docs: int, n_tokens: int, segundos: float, tokens_key: str = 'tokens') -> dict:
+    return {
+        'segundos': round(segundos, 4),
+        'docs_por_segundo': round(n_docs / segundos, 2) if segundos else None,
+        f'{tokens_key}_por_segundo': round(n_tokens / segundos, 2) if segundos else None,
+    }
+
+
+def query_summary(totals: list, per_stage: dict, candidates: list) -> dict:
+    """
+    Resumen de una serie de consultas: latencia total y por etapa (ms),
+    candidatos medios y consultas por segundo.
+    """
+    return {
+        'total_ms': latency_summary(totals),
+        'etapas_ms': {etapa: latency_summary(ms) for etapa, ms in per_stage.items()},
+        'candidatos_media': round(float(np.mean(candidates)), 2),
+        'qps': round(len(totals) / (sum(totals) / 1000.0), 2),
+    }
+
+
+def bench_indexing(args) -> tuple:
+    """
+    Genera el corpus, lo preprocesa e indexa midiendo cada etapa.
+    Retorna (métricas, índices en memoria, tokens por documento).
+    """
+    metrics = {}
+
+    t0 = time.perf_counter()
+    docs_tokens = {}
+    n_chars = 0
+    for doc_id, text in generate_corpus(args.docs, args.doc_length,
+                                        args.vocab, seed=args.seed):
+        n_chars += len(text)
+        docs_tokens[doc_id] = preprocess_text(text)
+    t_pre = time.perf_counter() - t0
+    n_tokens = sum(len(toks) for toks in docs_tokens.values())
+
+    t0 = time.perf_counter()
+    tfidf_index, idf, doc_ids = compute_tfidf_index(docs_tokens)
+    t_tfidf = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    inverted_index, bm25f_stats = compute_bm25f_index(docs_tokens)
+    t_bm25f = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    positional_index = compute_positional_index(docs_tokens)
+    t_pos = time.perf_counter() - t0
+
+    model = SyntheticEmbeddings(dim=args.dim, vocabulary=sorted(idf), seed=args.seed)
+    t0 = time.perf_counter()
+    doc_embeddings = {}
+    for doc_id, tokens in docs_tokens.items():
+        emb = compute_doc_embedding(tokens, model)
+        if emb is not None:
+            doc_embeddings[doc_id] = emb
+    t_emb = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    filter_index = build_filter_index(generate_metadata(doc_ids, seed=args.seed), doc_ids)
+    t_meta = time.perf_counter() - t0
+
+    for etapa, segundos in (('preproceso', t_pre), ('tfidf', t_tfidf),
+                            ('bm25f', t_bm25f), ('posicional', t_pos),
+                            ('embeddings', t_emb), ('metadatos', t_meta)):
+        metrics[etapa] = throughput(args.docs, n_tokens, segundos)
+    metrics['corpus'] = {'documentos': len(docs_tokens), 'tokens': n_tokens,
+                         'caracteres': n_chars, 'terminos': len(idf)}
+    metrics['pico_rss_bytes'] = peak_rss_bytes()
+
+    indices = {
+        'tfidf_index': tfidf_index,
+        'idf': idf,
+        'doc_ids': doc_ids,
+        'inverted_index': inverted_index,
+        'bm25f_stats': bm25f_stats,
+        'positional_index': positional_index,
+        'filter_index': filter_index,
+        'doc_embeddings': doc_embeddings,
+        'model': model,
+    }
+    return metrics, indices, docs_tokens
+
+
+def bench_storage(indices: dict) -> dict:
+    """
+    Persiste los índices en un directorio temporal y mide tamaño y carga.
+    """
+    tmp = tempfile.mkdtemp(prefix='bench_indices_')
+    try:
+        t0 = time.perf_counter()
+        save_tfidf_index(indices['tfidf_index'], indices['idf'],
+                         indices['doc_ids'], index_dir=tmp)
+        save_bm25f_index(indices['inverted_index'], indices['bm25f_stats'],
+                         index_dir=tmp)
+        save_positional_index(indices['positional_index'], index_dir=tmp)
+        t_save = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        load_tfidf_index(index_dir=tmp)
+        t_load_tfidf = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        load_bm25f_index(index_dir=tmp)
+        t_load_bm25f = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        load_positional_index(index_dir=tmp)
+        t_load_pos = time.perf_counter() - t0
+
+        return {
+            'bytes': dir_size(tmp),
+            'guardado_segundos': round(t_save, 4),
+            'carga_segundos': {'tfidf': round(t_load_tfidf, 4),
+                               'bm25f': round(t_load_bm25f, 4),
+                               'posicional': round(t_load_pos, 4)},
+        }
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_queries(args, indices: dict, docs_tokens: dict) -> dict:
+    """
+    Ejecuta el mismo conjunto de consultas en cada modo y resume la latencia
+    total y por etapa. Las consultas de frase ('<modo>_frases') y las mismas
+    consultas con filtros de metadatos ('<modo>_filtros') se miden aparte.
+    """
+    queries = generate_queries(args.queries, args.vocab, seed=args.seed)
+    query_sets = {
+        '': (queries, None),
+        '_frases': (generate_phrase_queries(docs_tokens, args.queries, seed=args.seed), None),
+        '_filtros': (queries, BENCH_FILTERS),
+    }
+    results = {}
+    for (mode, suffix) in [(m, sfx) for m in args.modes for sfx in query_sets]:
+        queries, filters = query_sets[suffix]
+        # Calentamiento: cachés de embeddings y de CPU
+        for q in queries[:args.warmup]:
+            search(q, top_n=args.top, mode=mode, candidates_k=args.k,
+                   indices=indices, filters=filters)
+
+        per_stage = {}
+        totals = []
+        candidates = []
+        for q in queries:
+            stats = {}
+            t0 = time.perf_counter()
+            search(q, top_n=args.top, mode=mode, candidates_k=args.k,
+                   stats=stats, indices=indices, filters=filters)
+            totals.append((time.perf_counter() - t0) * 1000.0)
+            candidates.append(stats['candidatos'])
+            for etapa, ms in stats['tiempos_ms'].items():
+                per_stage.setdefault(etapa, []).append(ms)
+
+        results[mode + suffix] = query_summary(totals, per_stage, candidates)
+    return results
+
+
+def bench_shared(args, indices: dict, docs_tokens: dict) -> dict:
+    """
+    Publica los índices como generación compartida (mmap) en un directorio
+    temporal y repite las consultas sobre ella.
+    """
+    tmp = tempfile.mkdtemp(prefix='bench_compartido_')
+    try:
+        t0 = time.perf_counter()
+        name = publish_shared_index(indices, base_dir=tmp)
+        t_publish = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        shared = attach_shared_index(base_dir=tmp)
+        t_attach = time.perf_counter() - t0
+        shared['filter_index'] = indices['filter_index']
+
+        return {
+            'bytes': dir_size(os.path.join(tmp, name))['total'],
+            'publicacion_segundos': round(t_publish, 4),
+            'conexion_segundos': round(t_attach, 4),
+            'consultas': bench_queries(args, shared, docs_tokens),
+        }
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_quantization(args, indices: dict) -> dict:
+    """
+    Cuantiza los embeddings de documento (int8 y PQ) y los compara con los
+    float32: memoria (total y por documento; los codebooks de PQ no crecen
+    con el corpus), recall@top de los vecinos por coseno respecto a los
+    float32 (sin re-rank y con re-rank exacto de los EMBEDDINGS_RERANK
+    mejores por coseno aproximado; en `search()` el re-rank se aplica a los
+    mejores tras la fusión), latencia del score semántico sobre todo el corpus y
+    coincidencia del top de `search()` en modo completo.
+    """
+    model = indices['model']
+    doc_ids = indices['doc_ids']
+    ids, matrix = embeddings_matrix(indices['doc_embeddings'], doc_ids)
+    q_embs = []
+    for q in generate_queries(args.queries, args.vocab, seed=args.seed):
+        vecs = [model.get_word_vector(t) for t in preprocess_text(q)]
+        if vecs:
+            q_embs.append((q, np.mean(vecs, axis=0)))
+
+    # Referencia float32 (matriz de vectores unitarios, mismo formato de
+    # salida que cosine_scores): vecinos exactos y top de search()
+    totals = []
+    exact_top = []
+    for _, q_emb in q_embs:
+        t0 = time.perf_counter()
+        sims = matrix @ q_emb.astype(np.float32) / max(float(np.linalg.norm(q_emb)), 1e-12)
+        scores = dict(zip(ids, sims.tolist()))
+        totals.append((time.perf_counter() - t0) * 1000.0)
+        exact_top.append(set(heapq.nlargest(args.top, scores, key=scores.get)))
+    search_top = [[doc for doc, _ in search(q, top_n=args.top, indices=indices)]
+                  for q, _ in q_embs]
+    results = {'float32': {'bytes': matrix.nbytes,
+                           'bytes_por_documento': matrix.nbytes // max(len(ids), 1),
+                           'semantico_ms': latency_summary(totals)}}
+
+    tmp = tempfile.mkdtemp(prefix='bench_cuantizacion_')
+    try:
+        for method in QUANTIZATION_METHODS:
+            t0 = time.perf_counter()
+            save_quantized_embeddings(indices['doc_embeddings'], doc_ids, tmp, method,
+                                      n_subvectors=args.pq_subvectors)
+            t_quant = time.perf_counter() - t0
+            entry = {'segundos_cuantizacion': round(t_quant, 4)}
+            for rerank in (0, EMBEDDINGS_RERANK):
+                quantized = load_quantized_embeddings(tmp, method, rerank=rerank)
+                entry['bytes'] = quantized.nbytes
+                entry['bytes_por_documento'] = quantized.codes.nbytes // max(len(ids), 1)
+                entry['reduccion'] = round(matrix.nbytes / quantized.nbytes, 2)
+                totals = []
+                recalls = []
+                for (_, q_emb), expected in zip(q_embs, exact_top):
+                    t0 = time.perf_counter()
+                    scores = quantized.cosine_scores(q_emb, doc_ids)
+                    if quantized.rerank_k:
+                        scores.update(quantized.rerank(
+                            q_emb, heapq.nlargest(quantized.rerank_k, scores, key=scores.get)))
+                    totals.append((time.perf_counter() - t0) * 1000.0)
+                    found = heapq.nlargest(args.top, scores, key=scores.get)
+                    recalls.append(len(expected.intersection(found)) / len(expected))
+                with_quantized = dict(indices, doc_embeddings=quantized)
+                matches = [len(set(expected).intersection(
+                               doc for doc, _ in search(q, top_n=args.top, indices=with_quantized)))
+                           / max(len(expected), 1)
+                           for (q, _), expected in zip(q_embs, search_top)]
+                entry[f'rerank_{rerank}'] = {
+                    'recall': round(float(np.mean(recalls)), 4),
+                    'coincidencia_busqueda': round(float(np.mean(matches)), 4),
+                    'semantico_ms': latency_summary(totals),
+                }
+            results[method] = entry
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return results
+
+
+def write_corpus(args, text_dir: str) -> tuple:
+    """
+    Escribe el corpus sintético en text_dir, un .txt por documento, sin
+    tenerlo entero en memoria. Retorna (métricas, tokens preprocesados de los
+    PHRASE_SAMPLE_DOCS primeros documentos para las consultas de frase).
+    """
+    t0 = time.perf_counter()
+    sample = {}
+    n_words = n_chars = 0
+    for doc_id, text in generate_corpus(args.docs, args.doc_length,
+                                        args.vocab, seed=args.seed):
+        with open(os.path.join(text_dir, doc_id + '.txt'), 'w', encoding='utf-8') as f:
+            f.write(text)
+        n_words += text.count(' ') + 1
+        n_chars += len(text)
+        if len(sample) < PHRASE_SAMPLE_DOCS:
+            sample[doc_id] = preprocess_text(text)
+    metrics = throughput(args.docs, n_words, time.perf_counter() - t0, 'palabras')
+    corpus = {'documentos': args.docs, 'palabras': n_words, 'caracteres': n_chars}
+    return metrics, corpus, sample
+
+
+def bench_sharded_indexing(args, tmp: str) -> tuple:
+    """
+    Escribe el corpus en tmp/textos y construye la generación particionada en
+    tmp/shards con build_sharded_index. Retorna (métricas, tamaño en disco
+    de cada shard, generación, tokens de muestra para las frases).
+    """
+    text_dir = os.path.join(tmp, 'textos')
+    base_dir = os.path.join(tmp, 'shards')
+    os.makedirs(text_dir)
+    metrics = {}
+    metrics['escritura_corpus'], corpus, sample = write_corpus(args, text_dir)
+
+    model = SyntheticEmbeddings(dim=args.dim, seed=args.seed)
+    t0 = time.perf_counter()
+    # Los mensajes de progreso del indexador no van al JSON de stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        name = build_sharded_index(args.shards, text_dir, base_dir, model=model)
+    metrics['construccion'] = throughput(args.docs, corpus['palabras'],
+                                         time.perf_counter() - t0, 'palabras')
+    metrics['corpus'] = dict(corpus, shards=args.shards)
+    metrics['pico_rss_bytes'] = peak_rss_bytes()
+
+    gen_dir = os.path.join(base_dir, name)
+    sizes = {entry: tree_size(os.path.join(gen_dir, entry))
+             for entry in sorted(os.listdir(gen_dir))
+             if os.path.isdir(os.path.join(gen_dir, entry))}
+    sizes['total'] = tree_size(gen_dir)
+    return metrics, sizes, name, sample
+
+
+async def run_sharded_queries(args, shards: list, query_sets: dict) -> dict:
+    results = {}
+    for (mode, suffix) in [(m, sfx) for m in args.modes for sfx in query_sets]:
+        queries = query_sets[suffix]
+        params = dict(top_n=args.top, mode=mode, candidates_k=args.k)
+        for q in queries[:args.warmup]:
+            await search_shards(q, shards, **params)
+
+        per_stage = {}
+        totals = []
+        candidates = []
+        for q in queries:
+            stats = {}
+            t0 = time.perf_counter()
+            await search_shards(q, shards, stats=stats, **params)
+            totals.append((time.perf_counter() - t0) * 1000.0)
+            if stats['parcial']:
+                raise RuntimeError(f"Respuesta parcial de los shards: {stats['shards']}")
+            candidates.append(stats['candidatos'])
+            for etapa, ms in stats['tiempos_ms'].items():
+                per_stage.setdefault(etapa, []).append(ms)
+        results[mode + suffix] = query_summary(totals, per_stage, candidates)
+    return results
+
+
+def bench_sharded_queries(args, base_dir: str, name: str, sample: dict) -> tuple:
+    """
+    Sirve la generación particionada con un LocalShard por shard (procesos
+    propios, como la API con BUSCADOR_SHARDS=local) y repite las consultas a
+    través del coordinador. Las etapas son las del shard más lento más
+    'shards' (la consulta completa en el coordinador). Retorna (consultas,
+    arranque: segundos hasta tener todos los shards cargados y pico de
+    memoria del mayor proceso de shard).
+    """
+    query_sets = {
+        '': generate_queries(args.queries, args.vocab, seed=args.seed),
+        '_frases': generate_phrase_queries(sample, args.queries, seed=args.seed),
+    }
+    shards = local_shards(base_dir, name)
+    try:
+        t0 = time.perf_counter()
+        failed = asyncio.run(warm_shards(shards))
+        if failed:
+            raise RuntimeError(f"Shards sin cargar: {failed}")
+        startup = time.perf_counter() - t0
+        results = asyncio.run(run_sharded_queries(args, shards, query_sets))
+    finally:
+        for shard in shards:
+            # Esperar a los procesos para que cuenten en RUSAGE_CHILDREN
+            shard.executor.shutdown(wait=True)
+    return results, {'arranque_segundos': round(startup, 4),
+                     'procesos_por_shard': shards[0].processes if shards else 0,
+                     'pico_rss_proceso_bytes': peak_rss_bytes(children=True)}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', type=int, default=1000,
+                        help='documentos sintéticos (docs x doc-length / shards <= '
+                             f'{MAX_CORPUS_TOKENS:,} tokens: se indexan en memoria)')
+    parser.add_argument('--doc-length', type=int, default=2000,
+                        help='longitud media de documento (tokens)')
+    parser.add_argument('--vocab', type=int, default=50000, help='tamaño del vocabulario')
+    parser.add_argument('--dim', type=int, default=300, help='dimensión de embeddings')
+    parser.add_argument('--queries', type=int, default=200, help='número de consultas')
+    parser.add_argument('--warmup', type=int, default=10, help='consultas de calentamiento')
+    parser.add_argument('--top', type=int, default=10, help='top_n por consulta')
+    parser.add_argument('--k', type=int, default=CANDIDATES_K_DEFAULT,
+                        help="candidatos en modo 'etapas'")
+    parser.add_argument('--modes', nargs='+', default=list(SEARCH_MODES),
+                        choices=SEARCH_MODES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compartido', action='store_true',
+                        help='medir también las consultas sobre el índice compartido (mmap)')
+    parser.add_argument('--cuantizacion', action='store_true',
+                        help='comparar embeddings int8 y PQ con los float32 (memoria y recall)')
+    parser.add_argument('--pq-subvectors', type=int, default=PQ_SUBVECTORS,
+                        help='subvectores PQ (divisor de --dim)')
+    parser.add_argument('--shards', type=int, default=0,
+                        help='escribir el corpus en disco e indexarlo en N shards '
+                             '(corpus mayores que la memoria)')
+    parser.add_argument('--sin-limite', action='store_true',
+                        help='permitir más de MAX_CORPUS_TOKENS tokens en memoria')
+    parser.add_argument('--output', help='fichero JSON de salida (por defecto stdout)')
+    args = parser.parse_args(argv)
+    if args.shards < 0:
+        parser.error('--shards no puede ser negativo')
+    if args.shards and (args.compartido or args.cuantizacion):
+        parser.error('--compartido y --cuantizacion solo con el indexado en memoria (sin --shards)')
+    in_memory = args.docs * args.doc_length // max(args.shards, 1)
+    if in_memory > MAX_CORPUS_TOKENS and not args.sin_limite:
+        parser.error(f"{in_memory:,} tokens en memoria a la vez (--docs x --doc-length"
+                     f"{' / --shards' if args.shards else ''}) supera {MAX_CORPUS_TOKENS:,} "
+                     "(~220 bytes por token). Usa --shards N para indexar por partes, o "
+                     "--sin-limite si hay RAM suficiente.")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'parametros': {k: v for k, v in vars(args).items()
+                           if k not in ('output', 'sin_limite')},
+        }
+    }
+    if args.shards:
+        tmp = tempfile.mkdtemp(prefix='bench_shards_')
+        try:
+            report['indexado'], sizes, name, sample = bench_sharded_indexing(args, tmp)
+            report['almacenamiento'] = {'bytes': sizes}
+            report['consultas'], report['shards'] = bench_sharded_queries(
+                args, os.path.join(tmp, 'shards'), name, sample)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+    else:
+        report['indexado'], indices, docs_tokens = bench_indexing(args)
+        report['almacenamiento'] = bench_storage(indices)
+        report['consultas'] = bench_queries(args, indices, docs_tokens)
+        if args.compartido:
+            report['compartido'] = bench_shared(args, indices, docs_tokens)
+        if args.cuantizacion:
+            report['cuantizacion'] = bench_quantization(args, indices)
+    report['pico_rss_bytes'] = peak_rss_bytes()
+
+    out = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(out + '\n')
+        print(f"Resultados guardados en '{args.output}'")
+    else:
+        print(out)
+
+
+if __name__ == '__main__':
+    main()
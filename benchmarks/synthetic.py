@@ -0,0 +1,156 @@
+# benchmarks/synthetic.py
+
+import zlib
+
+import numpy as np
+
+from extractor.preprocess import STOPWORDS
+
+# Sílabas para construir palabras con aspecto de español
+ONSETS = ['', 'b', 'c', 'd', 'f', 'g', 'l', 'm', 'n', 'p', 'r', 's', 't', 'v',
+          'ch', 'll', 'br', 'tr', 'pl', 'cr', 'gr', 'pr']
+VOWELS = ['a', 'e', 'i', 'o', 'u', 'a', 'e', 'o', 'á', 'é', 'í', 'ó', 'ú']
+CODAS = ['', '', '', 'n', 's', 'r', 'l']
+PUNCTUATION = ['', '', '', '', '', '', ',', '.', ';', ':']
+
+# Stopwords "limpias" (sin barras ni variantes) que se intercalan en el texto
+_STOPWORDS = sorted(w for w in STOPWORDS if w.isalpha()) or ['de', 'la', 'que', 'el', 'en']
+
+
+def make_vocabulary(size: int, seed: int = 0) -> list:
+    """
+    Genera `size` palabras únicas de 2 a 4 sílabas.
+    """
+    rng = np.random.default_rng(seed)
+    vocab = []
+    seen = set()
+    while len(vocab) < size:
+        n_syl = int(rng.integers(2, 5))
+        word = ''.join(
+            ONSETS[rng.integers(len(ONSETS))]
+            + VOWELS[rng.integers(len(VOWELS))]
+            + CODAS[rng.integers(len(CODAS))]
+            for _ in range(n_syl)
+        )
+        if word not in seen:
+            seen.add(word)
+            vocab.append(word)
+    return vocab
+
+
+def zipf_weights(size: int, exponent: float = 1.1) -> np.ndarray:
+    """
+    Probabilidades de Zipf para los rangos 1..size.
+    """
+    weights = 1.0 / np.arange(1, size + 1) ** exponent
+    return weights / weights.sum()
+
+
+def generate_corpus(n_docs: int, mean_length: int = 2000, vocab_size: int = 50000,
+                    stopword_ratio: float = 0.35, seed: int = 0):
+    """
+    Genera un corpus sintético de `n_docs` documentos de texto.
+    La longitud de cada documento sigue una log-normal de media `mean_length`
+    tokens y las palabras siguen una distribución de Zipf sobre el vocabulario.
+    Es un generador de (doc_id, texto) para no tener todo el corpus en memoria.
+    """
+    rng = np.random.default_rng(seed)
+    vocab = np.array(make_vocabulary(vocab_size, seed))
+    probs = zipf_weights(vocab_size)
+    stop = np.array(_STOPWORDS)
+    sigma = 0.6
+    mu = np.log(mean_length) - sigma ** 2 / 2
+    for i in range(n_docs):
+        length = max(10, int(rng.lognormal(mu, sigma)))
+        words = vocab[rng.choice(vocab_size, size=length, p=probs)]
+        is_stop = rng.random(length) < stopword_ratio
+        words[is_stop] = stop[rng.integers(len(stop), size=int(is_stop.sum()))]
+        punct = rng.integers(len(PUNCTUATION), size=length)
+        text = ' '.join(w + PUNCTUATION[p] for w, p in zip(words, punct))
+        yield f"doc_{i:07d}", text.capitalize()
+
+
+def generate_queries(n_queries: int, vocab_size: int = 50000, max_terms: int = 4,
+                     seed: int = 0) -> list:
+    """
+    Genera consultas de 1 a `max_terms` palabras muestreadas con la misma
+    distribución de Zipf que el corpus (mezcla de términos comunes y raros).
+    """
+    rng = np.random.default_rng(seed + 1)
+    vocab = make_vocabulary(vocab_size, seed)
+    probs = zipf_weights(vocab_size, exponent=0.8)
+    queries = []
+    for _ in range(n_queries):
+        n_terms = int(rng.integers(1, max_terms + 1))
+        idx = rng.choice(vocab_size, size=n_terms, replace=False, p=probs)
+        queries.append(' '.join(vocab[i] for i in idx))
+    return queries
+
+
+def generate_phrase_queries(docs_tokens: dict, n_queries: int, max_terms: int = 3,
+                            seed: int = 0) -> list:
+    """
+    Consultas de frase ("a b c") tomadas de tokens consecutivos de documentos
+    del corpus ya preprocesado, de modo que siempre tienen al menos un acierto.
+    """
+    rng = np.random.default_rng(seed + 2)
+    doc_ids = list(docs_tokens)
+    queries = []
+    while len(queries) < n_queries:
+        tokens = docs_tokens[doc_ids[rng.integers(len(doc_ids))]]
+        n_terms = int(rng.integers(2, max_terms + 1))
+        if len(tokens) <= n_terms:
+            continue
+        start = int(rng.integers(len(tokens) - n_terms))
+        queries.append('"' + ' '.join(tokens[start:start + n_terms]) + '"')
+    return queries
+
+
+def generate_metadata(doc_ids: list, n_sources: int = 10, seed: int = 0) -> dict:
+    """
+    Columnas de metadatos sintéticas con el mismo formato que
+    `extractor.metadata.build_metadata_index`.
+    """
+    rng = np.random.default_rng(seed + 3)
+    n = len(doc_ids)
+    return {
+        'doc_ids': list(doc_ids),
+        'file': list(doc_ids),
+        'source': [f"fuente_{i}" for i in rng.integers(n_sources, size=n)],
+        'lang': list(rng.choice(['es', 'en'], size=n, p=[0.7, 0.3])),
+        'title': [''] * n,
+        'author': [''] * n,
+        'year': rng.integers(1995, 2025, size=n).astype(np.int32),
+        'pages': rng.integers(5, 600, size=n).astype(np.int32),
+        'size': rng.integers(50_000, 20_000_000, size=n).astype(np.int64),
+    }
+
+
+class SyntheticEmbeddings:
+    """
+    Sustituto del modelo fastText: tabla de vectores aleatorios deterministas
+    por palabra. Expone la misma interfaz que usa el buscador
+    (`get_word_vector`, `get_dimension`).
+    """
+
+    def __init__(self, dim: int = 300, vocabulary: list = None, seed: int = 0):
+        self.dim = dim
+        self.seed = seed
+        self._cache = {}
+        if vocabulary:
+            rng = np.random.default_rng(seed)
+            table = rng.standard_normal((len(vocabulary), dim)).astype(np.float32)
+            self._cache = dict(zip(vocabulary, table))
+
+    def get_dimension(self) -> int:
+        return self.dim
+
+    def get_word_vector(self, word: str) -> np.ndarray:
+        vec = self._cache.get(word)
+        if vec is None:
+            # Palabras fuera de la tabla: vector determinista según su hash
+            rng = np.random.default_rng(zlib.crc32(word.encode('utf-8')) ^ self.seed)
+            vec = rng.standard_normal(self.dim).astype(np.float32)
+            self._cache[word] = vec
+        return vec
+
@@ -0,0 +1,347 @@
+# buscador/coordinador.py
+"""
+Coordinador de búsqueda distribuida (scatter-gather) sobre los shards de
+indexador/shards.py.
+
+La consulta se envía a la vez a todos los shards con asyncio; cada shard
+devuelve su top_n local y el coordinador se queda con el top_n global
+(heapq). Como todos los shards puntúan con estadísticas globales, el
+score de cada documento es el mismo que en el índice único y en modo
+'completo' también el resultado; en 'etapas' cada shard re-puntúa sus
+propios candidates_k mejores por BM25F, así que se evalúan más candidatos
+que con el índice único (igual que con el bonus de proximidad, que cada
+shard da a sus PROXIMITY_CANDIDATES mejores). Un shard que no responde en
+SHARD_TIMEOUT_SECONDS, o que falla, se omite y la respuesta se marca como
+parcial (`stats['parcial']`). Cada shard devuelve también los snippets de
+sus resultados, así que el coordinador no necesita índices propios.
+
+Tipos de shard:
+- LocalShard: SHARD_PROCESSES procesos por shard con sus índices cargados
+  (y los vectores de palabra de la generación por mmap, sin fastText)
+- HttpShard: otra instancia de api.py arrancada con BUSCADOR_SHARD=<n>
+  (endpoint /shard/search)
+
+Los shards se calientan al arrancar (`warm_shards`) para que las primeras
+consultas no paguen la carga de los índices, y `watch_shard_generations`
+sustituye los LocalShard cuando se publica una generación nueva.
+"""
+
+import os
+import json
+import heapq
+import asyncio
+import logging
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+from buscador.filtros import ConsultaInvalida
+from indexador.generaciones import current_generation
+from config import (SHARDS, SHARDS_DIR, SHARD_TIMEOUT_SECONDS, SHARD_PROCESSES,
+                    SHARD_STARTUP_TIMEOUT_SECONDS, INDEX_RELOAD_SECONDS)
+
+logger = logging.getLogger(__name__)
+
+# Índices del shard cargados en cada proceso de LocalShard
+_SHARD_INDICES = None
+
+
+def _init_shard_process(shard_id: int, base_dir: str, generation: str) -> None:
+    global _SHARD_INDICES
+    from indexador.shards import load_shard_indices
+    _SHARD_INDICES = load_shard_indices(shard_id, base_dir, generation=generation)
+
+
+def _warm_shard_process() -> int:
+    # Consulta de calentamiento en un proceso ya inicializado; retorna su pid
+    from buscador.search_engine import search, WARMUP_QUERY
+    search(WARMUP_QUERY, indices=_SHARD_INDICES)
+    return os.getpid()
+
+
+def search_shard(query: str, params: dict, indices: dict = None) -> tuple:
+    """
+    Ejecuta `search()` sobre un shard. Retorna (resultados, stats) con solo
+    los campos de stats que el coordinador necesita (serializables).
+    Con `params['snippets']` añade en stats['snippets'] el snippet de cada
+    resultado (None si el shard no tiene índice de snippets), resaltado si
+    `params['highlight']`.
+    """
+    from buscador.search_engine import search
+    from buscador.metricas import span
+    from indexador.snippet_index import make_snippet
+
+    indices = indices or _SHARD_INDICES
+    params = dict(params)
+    snippets = params.pop('snippets', False)
+    highlight = params.pop('highlight', False)
+    stats = {}
+    results = search(query, stats=stats, indices=indices, **params)
+    if (snippets and indices['snippet_index'] is not None
+            and indices['positional_index'] is not None):
+        with span('snippet', stats['tiempos_ms']):
+            stats['snippets'] = {
+                doc: make_snippet(doc, stats['terminos'], stats['expandidos'],
+                                  indices['positional_index'], indices['snippet_index'],
+                                  highlight=highlight)
+                for doc, _ in results
+            }
+    keep = ('tiempos_ms', 'candidatos', 'documentos', 'terminos', 'expandidos', 'facetas',
+            'snippets')
+    return results, {k: stats[k] for k in keep if k in stats}
+
+
+class LocalShard:
+    """
+    Shard servido por `processes` procesos propios del mismo equipo, todos
+    con los índices de la generación `generation` (fijada al crearlo: una
+    generación nueva se sirve con LocalShard nuevos).
+    """
+
+    def __init__(self, shard_id: int, base_dir: str, generation: str,
+                 processes: int = SHARD_PROCESSES):
+        self.name = f"local:{shard_id}"
+        self.generation = generation
+        self.processes = processes
+        self.executor = ProcessPoolExecutor(max_workers=processes,
+                                            initializer=_init_shard_process,
+                                            initargs=(shard_id, base_dir, generation))
+
+    async def warm(self, timeout: float) -> None:
+        """
+        Arranca todos los procesos y espera a que hayan cargado los índices
+        y respondido a una consulta de calentamiento.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        ready = set()
+        while len(ready) < self.processes:
+            # Tantas tareas como procesos a la vez: el executor arranca uno
+            # nuevo por cada tarea que no encuentra un proceso libre
+            pending = [loop.run_in_executor(self.executor, _warm_shard_process)
+                       for _ in range(self.processes)]
+            done = await asyncio.wait_for(asyncio.gather(*pending),
+                                          max(deadline - loop.time(), 0.0))
+            ready.update(done)
+
+    async def search(self, query: str, params: dict, timeout: float) -> tuple:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, search_shard, query, params)
+        return await asyncio.wait_for(future, timeout)
+
+    def close(self) -> None:
+        # Sin cancelar: las consultas en curso terminan con estos procesos
+        self.executor.shutdown(wait=False)
+
+
+class HttpShard:
+    """
+    Shard remoto: una API arrancada con BUSCADOR_SHARD=<n>.
+    """
+
+    def __init__(self, url: str):
+        self.name = url
+        self.url = url.rstrip('/') + '/shard/search'
+
+    async def warm(self, timeout: float) -> None:
+        """
+        Espera a que el shard responda (su API carga los índices al arrancar).
+        """
+        from buscador.search_engine import WARMUP_QUERY
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(None, self._fetch, WARMUP_QUERY, {'top_n': 1}, timeout)
+        await asyncio.wait_for(future, timeout)
+
+    def _fetch(self, query: str, params: dict, timeout: float) -> tuple:
+        args = {'q': query}
+        for key, value in params.items():
+            if value is not None:
+                args[key] = str(value).lower() if isinstance(value, bool) else value
+        url = self.url + '?' + urllib.parse.urlencode(args, doseq=True)
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as resp:
+                data = json.load(resp)
+        except urllib.error.HTTPError as e:
+            if e.code == 400:
+                # Consulta o filtro no válidos: igual que en search()
+                raise ConsultaInvalida(json.load(e).get('detail', str(e)))
+            raise
+        return [tuple(item) for item in data['results']], data['stats']
+
+    async def search(self, query: str, params: dict, timeout: float) -> tuple:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(None, self._fetch, query, params, timeout)
+        return await asyncio.wait_for(future, timeout)
+
+    def close(self) -> None:
+        pass
+
+
+def local_shards(base_dir: str = SHARDS_DIR, generation: str = None) -> list:
+    """
+    Un LocalShard por shard de `generation` (por defecto la publicada).
+    """
+    from indexador.shards import current_shard_dirs, shard_dirs
+    if generation is None:
+        generation, dirs = current_shard_dirs(base_dir)
+    else:
+        dirs = shard_dirs(os.path.join(base_dir, generation))
+    return [LocalShard(i, base_dir, generation) for i in range(len(dirs))]
+
+
+def shards_from_config(spec: str = SHARDS, base_dir: str = SHARDS_DIR) -> list:
+    """
+    'local' -> un LocalShard por shard de la generación publicada;
+    'http://a:8001,http://b:8001' -> un HttpShard por URL.
+    """
+    if spec.strip() == 'local':
+        return local_shards(base_dir)
+    return [HttpShard(url.strip()) for url in spec.split(',') if url.strip()]
+
+
+async def warm_shards(shards: list, timeout: float = SHARD_STARTUP_TIMEOUT_SECONDS) -> list:
+    """
+    Calienta todos los shards a la vez. Retorna los nombres de los que no
+    han quedado listos en `timeout` (se registran en el log; sus consultas
+    contarán como fallos de shard).
+    """
+    outcomes = await asyncio.gather(*(shard.warm(timeout) for shard in shards),
+                                    return_exceptions=True)
+    failed = []
+    for shard, outcome in zip(shards, outcomes):
+        if isinstance(outcome, BaseException):
+            logger.error("El shard %s no ha cargado: %r", shard.name, outcome)
+            failed.append(shard.name)
+    return failed
+
+
+async def reload_local_shards(shards: list, base_dir: str = SHARDS_DIR) -> bool:
+    """
+    Si se ha publicado una generación distinta de la que sirven los
+    LocalShard de `shards`, crea y calienta shards nuevos y solo entonces
+    los pone en su lugar (modificando la lista) y cierra los anteriores:
+    las consultas en curso terminan con los procesos viejos. Si algún shard
+    nuevo no carga, se descartan y se siguen usando los actuales.
+    Retorna True si se ha cambiado de generación.
+    """
+    name = current_generation(base_dir)
+    if name is None or all(shard.generation == name for shard in shards):
+        return False
+    new = local_shards(base_dir, name)
+    failed = await warm_shards(new)
+    if failed:
+        for shard in new:
+            shard.close()
+        raise RuntimeError(f"No se activa la generación de shards '{name}': fallan {failed}")
+    old = list(shards)
+    shards[:] = new
+    for shard in old:
+        shard.close()
+    logger.info("Shards locales en la generación '%s'", name)
+    return True
+
+
+async def watch_shard_generations(shards: list, base_dir: str = SHARDS_DIR,
+                                  interval: float = INDEX_RELOAD_SECONDS) -> None:
+    """
+    Tarea del coordinador: cada `interval` segundos activa la generación
+    particionada publicada (`reload_local_shards`). Una generación que no
+    carga no se reintenta hasta que se publica otra.
+    """
+    failed = None
+    while True:
+        await asyncio.sleep(interval)
+        name = current_generation(base_dir)
+        if name == failed:
+            continue
+        try:
+            await reload_local_shards(shards, base_dir)
+        except Exception:
+            logger.exception("Error al activar la generación de shards '%s'", name)
+            failed = name
+
+
+def merge_shard_results(outcomes: list, shards: list, top_n: int, stats: dict) -> list:
+    """
+    Top_n global a partir de los top_n de cada shard. En `stats`:
+    - shards: estado de cada shard ('ok', 'timeout' o 'error: ...')
+    - parcial: True si falta algún shard
+    - documentos, candidatos: suma de los shards que han respondido
+    - tiempos_ms: por etapa, el máximo entre shards (el camino crítico)
+    - facetas: recuentos sumados
+    - snippets: los de los resultados del top_n global (si los shards los
+      han devuelto)
+    Una ConsultaInvalida de los shards (consulta o filtro no válidos) se
+    relanza; cualquier otro error cuenta como fallo de ese shard.
+    """
+    per_shard = []
+    status = {}
+    for shard, outcome in zip(shards, outcomes):
+        if isinstance(outcome, ConsultaInvalida):
+            raise outcome
+        if isinstance(outcome, asyncio.TimeoutError):
+            status[shard.name] = 'timeout'
+        elif isinstance(outcome, BaseException):
+            status[shard.name] = f"error: {outcome}"
+        else:
+            status[shard.name] = 'ok'
+            per_shard.append(outcome)
+    failed = {name: s for name, s in status.items() if s != 'ok'}
+    if failed:
+        logger.warning("Respuesta parcial: %s", failed)
+
+    tiempos = stats.setdefault('tiempos_ms', {})
+    facetas = {}
+    snippets = {}
+    stats['documentos'] = stats['candidatos'] = 0
+    for results, shard_stats in per_shard:
+        stats['documentos'] += shard_stats.get('documentos', 0)
+        stats['candidatos'] += shard_stats.get('candidatos', 0)
+        for etapa, ms in shard_stats.get('tiempos_ms', {}).items():
+            tiempos[etapa] = max(tiempos.get(etapa, 0.0), ms)
+        for field, counts in (shard_stats.get('facetas') or {}).items():
+            merged = facetas.setdefault(field, {})
+            for value, n in counts.items():
+                merged[value] = merged.get(value, 0) + n
+        snippets.update(shard_stats.get('snippets') or {})
+        stats.setdefault('terminos', shard_stats.get('terminos', []))
+        stats.setdefault('expandidos', shard_stats.get('expandidos', []))
+    if facetas:
+        stats['facetas'] = facetas
+    stats['shards'] = status
+    stats['parcial'] = bool(failed)
+
+    ranked = heapq.nlargest(top_n, (item for results, _ in per_shard for item in results),
+                            key=lambda x: x[1])
+    if snippets:
+        stats['snippets'] = {doc: snippets.get(doc) for doc, _ in ranked}
+    return ranked
+
+
+async def search_shards(query: str, shards: list, top_n: int = 10,
+                        timeout: float = SHARD_TIMEOUT_SECONDS,
+                        stats: dict = None, **params) -> list:
+    """
+    Lanza la consulta en todos los shards a la vez y mezcla sus top_n.
+    `params` son los de `search()` (tfidf_weight, mode, candidates_k,
+    filters, facets...) más los de `search_shard` (snippets, highlight).
+    Mismo formato de resultado que `search()`.
+    """
+    if stats is None:
+        stats = {}
+    params = dict(params, top_n=top_n)
+    loop = asyncio.get_running_loop()
+    inicio = loop.time()
+    outcomes = await asyncio.gather(*(shard.search(query, params, timeout) for shard in shards),
+                                    return_exceptions=True)
+    ranked = merge_shard_results(outcomes, shards, top_n, stats)
+    stats['tiempos_ms']['shards'] = (loop.time() - inicio) * 1000.0
+    return ranked
+
+
+def search_sharded(query: str, shards: list, **kwargs) -> list:
+    """
+    Versión síncrona de `search_shards` (scripts y evaluación).
+    """
+    return asyncio.run(search_shards(query, shards, **kwargs))
@@ -0,0 +1,173 @@
+# buscador/filtros.py
+
+import re
+import operator
+
+import numpy as np
+
+from extractor.metadata import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS
+
+# campo, operador y valor: "year>=2019", "lang=es", "source=tesis,articulos"
+FILTER_RE = re.compile(r'^\s*(\w+)\s*(>=|<=|!=|=|>|<)\s*(.*?)\s*$')
+
+NUMERIC_OPS = {
+    '=': operator.eq, '!=': operator.ne,
+    '>=': operator.ge, '<=': operator.le,
+    '>': operator.gt, '<': operator.lt,
+}
+
+# Campos con recuento de facetas (pocos valores distintos)
+FACET_FIELDS = ('source', 'lang', 'year')
+
+
+class ConsultaInvalida(ValueError):
+    """
+    Error en los parámetros de la consulta (filtro mal formado, modo
+    desconocido...): la API lo devuelve como 400. Cualquier otro error
+    dentro de la búsqueda es un fallo del servidor.
+    """
+
+
+def mask_to_bits(mask: np.ndarray) -> int:
+    """
+    Convierte una máscara booleana en un bitset (int de Python, bit i = doc i).
+    """
+    packed = np.packbits(mask.astype(bool), bitorder='little')
+    return int.from_bytes(packed.tobytes(), 'little')
+
+
+def bits_to_mask(bits: int, n: int) -> np.ndarray:
+    """
+    Inverso de `mask_to_bits` para un universo de `n` documentos.
+    """
+    raw = np.frombuffer(bits.to_bytes((n + 7) // 8, 'little'), dtype=np.uint8)
+    return np.unpackbits(raw, bitorder='little')[:n].astype(bool)
+
+
+def bits_to_docs(bits: int, doc_ids: list) -> list:
+    """
+    doc_ids cuyos bits están activos, en el orden de `doc_ids` (vectorizado).
+    """
+    rows = np.flatnonzero(bits_to_mask(bits, len(doc_ids)))
+    if hasattr(doc_ids, 'take'):
+        # Índice compartido: decodifica solo esas filas
+        return doc_ids.take(rows)
+    return [doc_ids[i] for i in rows]
+
+
+def build_filter_index(metadata: dict, doc_ids: list) -> dict:
+    """
+    Precalcula, alineados con `doc_ids`, las columnas de metadatos y un
+    bitset por cada valor de los campos de faceta (pocos valores distintos).
+    Los campos de alta cardinalidad (file, title, author) no tienen bitsets
+    precalculados: ocuparían N bits por documento.
+    """
+    meta_pos = {doc: i for i, doc in enumerate(metadata['doc_ids'])}
+    rows = [meta_pos.get(doc) for doc in doc_ids]
+
+    numeric = {}
+    for name, dtype in NUMERIC_COLUMNS.items():
+        column = metadata[name]
+        numeric[name] = np.array([column[r] if r is not None else 0 for r in rows],
+                                 dtype=dtype)
+
+    columns = {}
+    for name in CATEGORICAL_COLUMNS:
+        column = metadata[name]
+        columns[name] = np.array([column[r] if r is not None else '' for r in rows],
+                                 dtype=object)
+
+    categories = {}
+    for name in FACET_FIELDS:
+        values = numeric[name] if name in numeric else columns[name]
+        categories[name] = {(int(v) if name in numeric else v): mask_to_bits(values == v)
+                            for v in set(values.tolist()) if v}
+
+    return {
+        'doc_ids': doc_ids,
+        'pos': {doc: i for i, doc in enumerate(doc_ids)},
+        'all': (1 << len(doc_ids)) - 1,
+        'numeric': numeric,
+        'columns': columns,
+        'categories': categories,
+    }
+
+
+def parse_filter(expr: str) -> tuple:
+    match = FILTER_RE.match(expr)
+    if not match:
+        raise ConsultaInvalida(f"Filtro no válido: {expr!r} (formato campo<op>valor)")
+    return match.groups()
+
+
+def compile_filters(exprs: list, filter_index: dict) -> int:
+    """
+    Compila una lista de filtros (AND entre ellos) en un bitset de documentos.
+    - Numéricos (year, pages, size): =, !=, >=, <=, >, <
+    - Categóricos (source, lang, file, title, author): = o !=, con valores
+      alternativos separados por comas (OR)
+    """
+    bits = filter_index['all']
+    for expr in exprs:
+        field, op, value = parse_filter(expr)
+        if field in filter_index['numeric']:
+            try:
+                number = int(value)
+            except ValueError:
+                raise ConsultaInvalida(f"El filtro {field!r} espera un número: {expr!r}")
+            column = filter_index['numeric'][field]
+            field_bits = mask_to_bits(NUMERIC_OPS[op](column, number))
+        elif field in filter_index['columns']:
+            if op not in ('=', '!='):
+                raise ConsultaInvalida(f"El filtro {field!r} solo admite = o !=: {expr!r}")
+            wanted = [v.strip() for v in value.split(',')]
+            per_value = filter_index['categories'].get(field)
+            if per_value is not None:
+                field_bits = 0
+                for v in wanted:
+                    field_bits |= per_value.get(v, 0)
+            else:
+                column = filter_index['columns'][field]
+                # El índice compartido guarda la columna codificada (CodedColumn)
+                mask = column.isin(wanted) if hasattr(column, 'isin') else np.isin(column, wanted)
+                field_bits = mask_to_bits(mask)
+            if op == '!=':
+                field_bits = filter_index['all'] & ~field_bits
+        else:
+            raise ConsultaInvalida(f"Campo de filtro desconocido: {field!r}")
+        bits &= field_bits
+        if not bits:
+            break
+    return bits
+
+
+def facet_counts(filter_index: dict, bits: int, fields: tuple = FACET_FIELDS) -> dict:
+    """
+    Recuento por valor de cada campo dentro del bitset `bits`
+    (popcount de la intersección con el bitset de cada valor).
+    """
+    counts = {}
+    for field in fields:
+        per_value = filter_index['categories'].get(field, {})
+        field_counts = {}
+        for value, value_bits in per_value.items():
+            n = (value_bits & bits).bit_count()
+            if n:
+                field_counts[str(value)] = n
+        counts[field] = field_counts
+    return counts
+
+
+def docs_to_bits(docs, filter_index: dict) -> int:
+    """
+    Bitset de un conjunto de doc_ids (p. ej. los que tienen score > 0).
+    """
+    pos = filter_index['pos']
+    mask = np.zeros(len(filter_index['doc_ids']), dtype=bool)
+    if hasattr(pos, 'rows'):
+        # Índice compartido: búsqueda vectorizada de las filas
+        rows = pos.rows(list(docs))
+        mask[rows[rows >= 0]] = True
+    else:
+        mask[[pos[doc] for doc in docs if doc in pos]] = True
+    return mask_to_bits(mask)
@@ -0,0 +1,104 @@
+# buscador/metricas.py
+
+import os
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Etiqueta con el pid en todas las series: con varios workers (uvicorn
+# --workers) cada petición a /metrics la atiende uno solo y cada uno tiene
+# sus propios histogramas; sin ella las series parecerían reiniciarse.
+# Para el total: sum without (proceso) (...)
+PROCESS_LABEL = 'proceso'
+
+# Límites superiores (segundos) de los buckets del histograma de latencia
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Histograma acumulativo al estilo Prometheus, con una serie por etiqueta
+    (p. ej. una por etapa del pipeline). Seguro entre hilos.
+    """
+
+    def __init__(self, name: str, help_text: str, label: str,
+                 buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # valor de etiqueta -> [counts por bucket, suma, total]
+
+    def observe(self, label_value: str, value: float) -> None:
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            serie = self._series.get(label_value)
+            if serie is None:
+                serie = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._series[label_value] = serie
+            serie[0][idx] += 1
+            serie[1] += value
+            serie[2] += 1
+
+    def render(self) -> list:
+        """
+        Devuelve las líneas del formato de exposición de texto de Prometheus
+        (cada serie lleva además la etiqueta PROCESS_LABEL con el pid).
+        """
+        lines = [f"# HELP {self.name} {self.help_text}",
+                 f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+        pid = os.getpid()
+        for label_value, (counts, total_sum, total) in sorted(series.items()):
+            labels = f'{self.label}="{label_value}",{PROCESS_LABEL}="{pid}"'
+            acumulado = 0
+            for bound, count in zip(self.buckets, counts):
+                acumulado += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {acumulado}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {total}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total_sum}')
+            lines.append(f'{self.name}_count{{{labels}}} {total}')
+        return lines
+
+
+# Histograma global de duración por etapa (preproceso, bm25f, snippet, ...)
+STAGE_LATENCY = Histogram(
+    'buscador_etapa_duracion_segundos',
+    'Duración de cada etapa del pipeline de búsqueda.',
+    'etapa')
+
+# Histograma de la duración total de cada petición por endpoint
+REQUEST_LATENCY = Histogram(
+    'buscador_peticion_duracion_segundos',
+    'Duración total de cada petición.',
+    'endpoint')
+
+
+@contextmanager
+def span(etapa: str, tiempos: dict = None):
+    """
+    Mide la duración del bloque, la registra en STAGE_LATENCY y, si se pasa
+    `tiempos`, acumula los milisegundos bajo la clave `etapa`.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - inicio
+        STAGE_LATENCY.observe(etapa, segundos)
+        if tiempos is not None:
+            tiempos[etapa] = tiempos.get(etapa, 0.0) + segundos * 1000.0
+
+
+def render_metrics() -> str:
+    """
+    Serializa todos los histogramas en formato de texto de Prometheus.
+    """
+    lines = []
+    for hist in (STAGE_LATENCY, REQUEST_LATENCY):
+        lines.extend(hist.render())
+    return "\n".join(lines) + "\n"
@@ -2,34 +2,214 @@
 
 import os
 import sys
-import math
+import time
+import heapq
+import threading
 import pickle
+import logging
 
 import numpy as np
-import fasttext
 
 from extractor.preprocess import preprocess_text
 from indexador.tfidf_index import load_tfidf_index, vectorize_query
 from indexador.bm25f_index import load_bm25f_index, score_bm25f
+from indexador.positional_index import (load_positional_index, split_phrases,
+                                        phrase_matches, intersect_postings,
+                                        proximity_score)
 from expansion.semantic_expand import expand_query
-from indexador.fasttext_index import build_fasttext_index
-from config import FASTTEXT_MODEL_PATH, EMBEDDINGS_PATH, SEMANTIC_WEIGHT
+from buscador.metricas import span
+from buscador.filtros import (build_filter_index, compile_filters, bits_to_docs,
+                              docs_to_bits, facet_counts, ConsultaInvalida)
+from extractor.metadata import load_metadata
+from indexador.snippet_index import load_snippet_index
+from indexador.fasttext_index import (align_embeddings, load_quantized_embeddings,
+                                      EMBEDDINGS_FILE)
+from indexador.generaciones import current_generation, verify_generation
+from buscador.shared_index import attach_shared_index
+from indexador.shards import load_shard_indices
+from config import (FASTTEXT_MODEL_PATH, EMBEDDINGS_PATH, SEMANTIC_WEIGHT,
+                    SEARCH_MODES, SEARCH_MODE_DEFAULT, CANDIDATES_K_DEFAULT,
+                    BM25F_K1, BM25F_B, PROXIMITY_WEIGHT, PROXIMITY_CANDIDATES,
+                    INDEX_DIR, METADATA_DIR, INDEX_GENERATIONS_DIR,
+                    INDEX_RELOAD_SECONDS, SHARED_INDEX, SHARED_INDEX_DIR,
+                    SHARDS_DIR, SHARD_ID, EMBEDDINGS_QUANTIZATION, LOG_LEVEL)
 
-# 1) Carga índices TF-IDF
-tfidf_index, idf, doc_ids = load_tfidf_index()
+logger = logging.getLogger(__name__)
 
-# 2) Carga índice invertido BM25F
-inverted_index, bm25f_stats = load_bm25f_index()
+# Índices en memoria; se cargan la primera vez que se necesitan
+_INDICES = None
+# Serializa la carga inicial y las recargas (la lectura de _INDICES no lo necesita)
+_LOAD_LOCK = threading.Lock()
+# Última generación que no se pudo cargar (no se reintenta)
+_FAILED_GENERATION = None
 
-# 3) Asegurarse de que existen los embeddings; si no, generarlos
-if not os.path.exists(EMBEDDINGS_PATH):
-    print("⚙️  doc_embeddings.pkl no encontrado, generando embeddings con fastText…")
-    build_fasttext_index()
+# Consulta con la que se calienta una generación antes de activarla
+WARMUP_QUERY = 'prueba de carga del indice'
 
-# 4) Carga modelo fastText y embeddings de documentos
-FT_MODEL = fasttext.load_model(FASTTEXT_MODEL_PATH)
-with open(EMBEDDINGS_PATH, 'rb') as f:
-    doc_embeddings = pickle.load(f)
+
+def load_indices(index_dir: str = None, verify: bool = True, model=None) -> dict:
+    """
+    Carga desde disco todo lo que necesita `search()`:
+    tfidf_index, idf, doc_ids, inverted_index, bm25f_stats,
+    positional_index (None si no existe), filter_index (bitsets de
+    metadatos, None si no hay metadatos), snippet_index (offsets de tokens,
+    None si no existe), doc_embeddings (QuantizedEmbeddings si
+    EMBEDDINGS_QUANTIZATION), el modelo fastText ('model') y el
+    nombre de la generación ('generacion', None con índices planos).
+    `index_dir` es una generación concreta; por defecto la publicada o, si
+    no hay ninguna, los índices planos de INDEX_DIR. Todo se lee del mismo
+    directorio, resuelto una sola vez, y con `verify` se comprueban antes
+    los checksums del manifiesto.
+    `model` reutiliza un modelo ya cargado (no forma parte de la generación:
+    al recargar se pasa el de los índices activos en lugar de leer de nuevo
+    varios GB de disco).
+    """
+    from indexador.fasttext_index import build_fasttext_index
+
+    if index_dir is None:
+        name = current_generation()
+        index_dir = os.path.join(INDEX_GENERATIONS_DIR, name) if name else None
+    if index_dir is not None and verify:
+        verify_generation(index_dir)
+
+    # 1) Carga índices TF-IDF
+    tfidf_index, idf, doc_ids = load_tfidf_index(index_dir or INDEX_DIR)
+
+    # 2) Carga índice invertido BM25F
+    inverted_index, bm25f_stats = load_bm25f_index(index_dir or INDEX_DIR)
+    positional_index = load_positional_index(index_dir or INDEX_DIR)
+    metadata = load_metadata(index_dir or METADATA_DIR)
+    filter_index = build_filter_index(metadata, doc_ids) if metadata else None
+    snippet_index = load_snippet_index(index_dir or INDEX_DIR)
+
+    # 3) Asegurarse de que existen los embeddings; si no, generarlos
+    #    (solo con índices planos: una generación publicada no se modifica)
+    embeddings_path = (os.path.join(index_dir, EMBEDDINGS_FILE) if index_dir
+                       else EMBEDDINGS_PATH)
+    if not os.path.exists(embeddings_path) and index_dir is None:
+        logger.info("doc_embeddings.pkl no encontrado, generando embeddings con fastText…")
+        build_fasttext_index()
+
+    # 4) Carga modelo fastText y embeddings de documentos (cuantizados si
+    #    EMBEDDINGS_QUANTIZATION y se generaron al indexar)
+    if model is None:
+        import fasttext
+        model = fasttext.load_model(FASTTEXT_MODEL_PATH)
+    doc_embeddings = {}
+    quantized = None
+    if EMBEDDINGS_QUANTIZATION:
+        quantized = load_quantized_embeddings(index_dir or INDEX_DIR, EMBEDDINGS_QUANTIZATION)
+        if quantized is None:
+            logger.warning("No hay embeddings cuantizados (%s) en '%s'; se usan los float32",
+                           EMBEDDINGS_QUANTIZATION, index_dir or INDEX_DIR)
+    if quantized is not None:
+        doc_embeddings = quantized
+    elif os.path.exists(embeddings_path):
+        with open(embeddings_path, 'rb') as f:
+            doc_embeddings = align_embeddings(pickle.load(f), doc_ids)
+    else:
+        logger.warning("La generación '%s' no tiene embeddings de documento", index_dir)
+
+    return {
+        'tfidf_index': tfidf_index,
+        'idf': idf,
+        'doc_ids': doc_ids,
+        'inverted_index': inverted_index,
+        'bm25f_stats': bm25f_stats,
+        'positional_index': positional_index,
+        'filter_index': filter_index,
+        'snippet_index': snippet_index,
+        'doc_embeddings': doc_embeddings,
+        'model': model,
+        'generacion': os.path.basename(index_dir) if index_dir else None,
+    }
+
+
+def _load_active(model=None) -> dict:
+    # Con BUSCADOR_SHARD=<n> este proceso sirve solo ese shard del índice
+    # particionado; con SHARED_INDEX se conecta (mmap) a la generación de
+    # buscador.shared_index, que trae sus propios vectores de palabra
+    if SHARD_ID is not None:
+        return load_shard_indices(SHARD_ID, model=model)
+    return attach_shared_index() if SHARED_INDEX else load_indices(model=model)
+
+
+def _generations_dir() -> str:
+    # Directorio cuyo CURRENT indica la generación que debe estar activa
+    if SHARD_ID is not None:
+        return SHARDS_DIR
+    return SHARED_INDEX_DIR if SHARED_INDEX else INDEX_GENERATIONS_DIR
+
+
+def get_indices() -> dict:
+    """
+    Devuelve los índices activos, cargándolos desde disco si aún no lo están.
+    """
+    global _INDICES
+    if _INDICES is None:
+        with _LOAD_LOCK:
+            if _INDICES is None:
+                _INDICES = _load_active()
+    return _INDICES
+
+
+def set_indices(indices: dict) -> None:
+    """
+    Sustituye los índices activos (p. ej. por unos sintéticos en benchmarks).
+    """
+    global _INDICES
+    _INDICES = indices
+
+
+def reload_indices() -> bool:
+    """
+    Si se ha publicado una generación distinta de la activa, la carga entera
+    (verificando checksums), la calienta con una consulta y solo entonces la
+    activa sustituyendo la referencia: las consultas en curso terminan con
+    los índices que ya tenían y las nuevas usan la generación nueva (doble
+    búfer). El modelo fastText de los índices activos se reutiliza. Retorna
+    True si se ha cambiado de generación.
+    """
+    global _INDICES, _FAILED_GENERATION
+    with _LOAD_LOCK:
+        name = current_generation(_generations_dir())
+        active = _INDICES
+        if (name is None or name == _FAILED_GENERATION
+                or (active is not None and active.get('generacion') == name)):
+            return False
+        inicio = time.perf_counter()
+        try:
+            # El índice compartido y los shards traen sus vectores de palabra en
+            # la generación: solo se reutiliza el modelo fastText
+            model = (active.get('model') if active is not None
+                     and not SHARED_INDEX and SHARD_ID is None else None)
+            indices = _load_active(model)
+            search(WARMUP_QUERY, indices=indices)
+        except Exception:
+            _FAILED_GENERATION = name
+            logger.exception("No se pudo cargar la generación %s; se mantiene %s",
+                             name, active.get('generacion') if active else None)
+            return False
+        _INDICES = indices
+    logger.info("Generación %s activa (carga en %.1fs)", name, time.perf_counter() - inicio)
+    return True
+
+
+def start_index_watcher(interval: float = INDEX_RELOAD_SECONDS) -> threading.Thread:
+    """
+    Hilo en segundo plano que cada `interval` segundos llama a `reload_indices`.
+    """
+    def watch():
+        while True:
+            time.sleep(interval)
+            try:
+                reload_indices()
+            except Exception:
+                logger.exception("Error comprobando generaciones de índices")
+
+    thread = threading.Thread(target=watch, name='recarga-indices', daemon=True)
+    thread.start()
+    return thread
 
 
 def cosine_sim(a: np.ndarray, b: np.ndarray) -> float:
@@ -41,7 +221,22 @@ def cosine_sim(a: np.ndarray, b: np.ndarray) -> float:
     return float(num / den) if den else 0.0
 
 
-def search(query: str, top_n: int = 10, tfidf_weight: float = 0.5) -> list:
+def _top_k(scores: dict, k: int) -> list:
+    """
+    Devuelve los k doc_ids con mayor score (sin ordenar todo el diccionario).
+    """
+    return [doc for doc, _ in heapq.nlargest(k, scores.items(), key=lambda x: x[1])]
+
+
+def search(query: str, top_n: int = 10, tfidf_weight: float = 0.5,
+           mode: str = SEARCH_MODE_DEFAULT,
+           candidates_k: int = CANDIDATES_K_DEFAULT,
+           stats: dict = None, indices: dict = None,
+           semantic_weight: float = SEMANTIC_WEIGHT,
+           bm25f_k1: float = BM25F_K1, bm25f_b: float = BM25F_B,
+           expand: bool = True,
+           proximity_weight: float = PROXIMITY_WEIGHT,
+           filters: list = None, facets: bool = False) -> list:
     """
     Ejecuta el pipeline de búsqueda:
     1. Preprocesa la consulta
@@ -50,67 +245,183 @@ def search(query: str, top_n: int = 10, tfidf_weight: float = 0.5) -> list:
     4. Calcula similitud coseno TF-IDF y score BM25F
     5. Calcula score semántico con fastText
     6. Combina scores léxico y semántico y retorna top_n resultados
+
+    Con embeddings cuantizados el score semántico es aproximado; los
+    mejores documentos tras la fusión se re-puntúan con el vector exacto.
+
+    Las frases entre comillas ("programacion orientada objetos") exigen que
+    sus términos aparezcan consecutivos; sin índice posicional se degradan a
+    exigir todos los términos. Si hay índice posicional, los mejores
+    documentos reciben además un bonus por proximidad de los términos.
+    En modo 'etapas', BM25F selecciona los `candidates_k` mejores documentos
+    y solo esos se puntúan con TF-IDF y fastText.
+    Si se pasa `stats` (dict), se rellena con tiempos por etapa (ms), número
+    de candidatos evaluados y los términos (originales y expandidos). Cada
+    etapa se registra además en `buscador.metricas.STAGE_LATENCY`.
+    `indices` permite buscar sobre unos índices concretos en lugar de los
+    activos (ver `load_indices`).
+    `semantic_weight`, `bm25f_k1`, `bm25f_b`, `expand` y `proximity_weight`
+    sobrescriben los valores de config (usado por la evaluación offline).
+    `filters` (p. ej. ["year>=2019", "lang=es"]) se compilan a un bitset y
+    restringen los documentos antes de puntuar; con `facets=True` se añaden
+    a `stats['facetas']` los recuentos por source/lang/year de los documentos
+    que pasan los filtros y contienen algún término de la consulta (y sus
+    frases), los mismos en los dos modos y sin depender del score semántico.
+    Un modo o filtro no válidos lanzan `ConsultaInvalida`.
     """
+    if mode not in SEARCH_MODES:
+        raise ConsultaInvalida(f"Modo de búsqueda desconocido: {mode!r}")
+    if indices is None:
+        indices = get_indices()
+    tfidf_index = indices['tfidf_index']
+    doc_ids = indices['doc_ids']
+    doc_embeddings = indices['doc_embeddings']
+    model = indices['model']
+    positional_index = indices.get('positional_index')
+    filter_index = indices.get('filter_index')
+    if stats is None:
+        stats = {}
+    tiempos = stats.setdefault('tiempos_ms', {})
+    debug = logger.isEnabledFor(logging.DEBUG)
+
     # 1) Preprocesado
-    tokens = preprocess_text(query)
-    print(f"Tokens preprocesados: {tokens}")
+    with span('preproceso', tiempos):
+        text, phrases = split_phrases(query)
+        tokens = preprocess_text(text)
+        phrase_terms = [t for t in (preprocess_text(p) for p in phrases) if t]
+    logger.debug("Tokens preprocesados: %s", tokens)
 
     # 2) Expansión semántica
-    expanded = expand_query(tokens)
-    print(f"Tokens expandidos: {expanded}")
+    with span('expansion', tiempos):
+        expanded = expand_query(tokens) if expand else list(tokens)
+    logger.debug("Tokens expandidos: %s", expanded)
+    stats['terminos'] = tokens
+    stats['expandidos'] = expanded
 
     # 3) Vectorizar consulta (TF-IDF)
-    q_vec = vectorize_query(expanded)
-    print(f"Vector de consulta (TF-IDF): {q_vec}")
+    with span('vectorizacion', tiempos):
+        q_vec = vectorize_query(expanded, indices['idf'])
 
-    # 4) Similitud coseno (TF-IDF)
-    cos_scores = {
-        doc: sum(q_vec.get(term, 0.0) * vec.get(term, 0.0) for term in q_vec)
-        for doc, vec in tfidf_index.items()
-    }
+    # 4) Filtros de metadatos: bitset de documentos permitidos
+    allowed = None
+    filter_bits = filter_index['all'] if filter_index else 0
+    if filters:
+        if filter_index is None:
+            raise ConsultaInvalida("No hay metadatos para filtrar: ejecuta la indexación")
+        with span('filtros', tiempos):
+            filter_bits = compile_filters(filters, filter_index)
+            allowed = set(bits_to_docs(filter_bits, doc_ids))
 
-    # 5) Score BM25F
-    bm25_scores = score_bm25f(expanded, inverted_index, bm25f_stats)
+    # 5) Score BM25F (solo recorre las postings de los términos de la consulta)
+    with span('bm25f', tiempos):
+        bm25_scores = score_bm25f(expanded, indices['inverted_index'],
+                                  indices['bm25f_stats'], k1=bm25f_k1, b=bm25f_b,
+                                  docs=allowed)
 
-    # 6) Componente léxico: TF-IDF + BM25F
-    lex_scores = {
-        doc: tfidf_weight * cos_scores.get(doc, 0.0)
-        + (1 - tfidf_weight) * bm25_scores.get(doc, 0.0)
-        for doc in doc_ids
-    }
+    # 6) Frases: solo sobreviven los documentos que las contienen
+    if phrase_terms:
+        with span('frases', tiempos):
+            for terms in phrase_terms:
+                if positional_index is not None:
+                    allowed = set(phrase_matches(terms, positional_index, allowed))
+                else:
+                    allowed = intersect_postings(terms, indices['inverted_index'], allowed)
+            bm25_scores = {doc: sc for doc, sc in bm25_scores.items() if doc in allowed}
 
-    # 7) Score semántico con fastText
-    emb_list = [FT_MODEL.get_word_vector(t) for t in expanded if t]
-    if emb_list:
-        q_emb = np.mean(emb_list, axis=0)
-    else:
-        q_emb = np.zeros(FT_MODEL.get_dimension())
-    sem_scores = {
-        doc: cosine_sim(q_emb, emb)
-        for doc, emb in doc_embeddings.items()
-    }
+    # 7) Conjunto de documentos a re-puntuar
+    with span('candidatos', tiempos):
+        if mode == 'etapas':
+            candidates = _top_k(bm25_scores, max(candidates_k, top_n))
+        elif allowed is not None and filter_index is not None:
+            candidates = bits_to_docs(docs_to_bits(allowed, filter_index), doc_ids)
+        elif allowed is not None:
+            candidates = [doc for doc in doc_ids if doc in allowed]
+        else:
+            candidates = doc_ids
+    stats['modo'] = mode
+    stats['documentos'] = len(doc_ids)
+    stats['candidatos'] = len(candidates)
 
-    print(f"Scores semánticos: {sem_scores}")
+    # 8) Similitud coseno (TF-IDF)
+    with span('tfidf', tiempos):
+        if hasattr(tfidf_index, 'cosine_scores'):
+            # Índice compartido: pesos guardados por término
+            cos_scores = tfidf_index.cosine_scores(q_vec, candidates)
+        else:
+            cos_scores = {}
+            for doc in candidates:
+                vec = tfidf_index.get(doc, {})
+                cos_scores[doc] = sum(q_vec.get(term, 0.0) * vec.get(term, 0.0)
+                                      for term in q_vec)
 
-    # 8) Score final: mezcla de léxico y semántico
-    final_scores = {
-        doc: (1 - SEMANTIC_WEIGHT) * lex_scores.get(doc, 0.0)
-        + SEMANTIC_WEIGHT * sem_scores.get(doc, 0.0)
-        for doc in doc_ids
-    }
+    # 9) Score semántico con fastText
+    with span('embedding', tiempos):
+        emb_list = [model.get_word_vector(t) for t in expanded if t]
+        if emb_list:
+            q_emb = np.mean(emb_list, axis=0)
+        else:
+            q_emb = np.zeros(model.get_dimension())
+        if hasattr(doc_embeddings, 'cosine_scores'):
+            # Índice compartido: matriz de embeddings alineada con doc_ids
+            sem_scores = doc_embeddings.cosine_scores(q_emb, candidates)
+        else:
+            sem_scores = {}
+            for doc in candidates:
+                emb = doc_embeddings.get(doc)
+                if emb is not None:
+                    sem_scores[doc] = cosine_sim(q_emb, emb)
+
+    # 10) Score final: léxico (TF-IDF + BM25F) mezclado con semántico
+    with span('fusion', tiempos):
+        final_scores = {}
+        for doc in candidates:
+            lex = (tfidf_weight * cos_scores.get(doc, 0.0)
+                   + (1 - tfidf_weight) * bm25_scores.get(doc, 0.0))
+            final_scores[doc] = ((1 - semantic_weight) * lex
+                                 + semantic_weight * sem_scores.get(doc, 0.0))
+
+    # 11) Embeddings cuantizados: los mejores tras la fusión (no solo los
+    #     mejores por coseno aproximado) pasan al coseno exacto
+    if hasattr(doc_embeddings, 'rerank') and doc_embeddings.rerank_k:
+        with span('rerank', tiempos):
+            shortlist = _top_k(final_scores, max(doc_embeddings.rerank_k, top_n))
+            for doc, exact in doc_embeddings.rerank(q_emb, shortlist).items():
+                final_scores[doc] += semantic_weight * (exact - sem_scores.get(doc, 0.0))
+
+    # 12) Bonus de proximidad para los mejores documentos
+    #     (no aplica si la consulta son solo frases: ya son adyacentes)
+    free_terms = set(tokens).difference(*phrase_terms)
+    if (positional_index is not None and proximity_weight
+            and len(set(tokens)) > 1 and free_terms):
+        with span('proximidad', tiempos):
+            for doc in _top_k(final_scores, max(PROXIMITY_CANDIDATES, top_n)):
+                final_scores[doc] += proximity_weight * proximity_score(
+                    tokens, doc, positional_index)
 
-    print(f"Scores finales combinados: {final_scores}")
+    # 13) Filtrar y ordenar resultados con score > 0
+    with span('orden', tiempos):
+        ranked = heapq.nlargest(
+            top_n,
+            ((doc, sc) for doc, sc in final_scores.items() if sc > 0.0),
+            key=lambda x: x[1]
+        )
 
-    # 9) Filtrar y ordenar resultados con score > 0
-    ranked = sorted(
-        ((doc, sc) for doc, sc in final_scores.items() if sc > 0.0),
-        key=lambda x: x[1],
-        reverse=True
-    )
+    # 14) Facetas de las coincidencias léxicas: bm25_scores tiene todos los
+    #     documentos con algún término en las postings (ya filtrados por
+    #     frases), en cualquier modo; los candidatos de 'etapas' o el coseno
+    #     semántico (positivo en casi todo el corpus) no cuentan
+    if facets and filter_index is not None:
+        with span('facetas', tiempos):
+            matched = docs_to_bits(bm25_scores, filter_index)
+            stats['facetas'] = facet_counts(filter_index, matched & filter_bits)
 
-    print(f"Resultados ordenados: {ranked}")
+    if debug:
+        # Solo los primeros documentos: volcar todos los scores es inviable
+        # con un corpus real
+        logger.debug("Top %d de %d candidatos: %s", len(ranked), len(candidates), ranked)
+        logger.debug("Tiempos por etapa (ms): %s", tiempos)
 
-    return ranked[:top_n]
+    return ranked
 
 
 if __name__ == '__main__':
@@ -118,6 +429,8 @@ if __name__ == '__main__':
         print("Uso: python search_engine.py 'consulta de prueba'")
         sys.exit(1)
 
+    logging.basicConfig(level=LOG_LEVEL,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
     query_str = sys.argv[1]
     results = search(query_str)
 
@@ -0,0 +1,843 @@
+# buscador/shared_index.py
+"""
+Índices de solo lectura compartidos entre procesos (varios workers de uvicorn).
+
+Un proceso cargador empaqueta los índices en arrays .npy dentro de una
+generación (SHARED_INDEX_DIR/gen-...) y la publica de forma atómica
+reescribiendo el puntero CURRENT, igual que las generaciones de la
+indexación (indexador/generaciones.py). Cada worker abre los arrays con
+mmap_mode='r': las páginas viven en la caché del sistema operativo y se
+comparten entre todos los procesos, así que un worker más apenas añade
+memoria (solo las cachés de búsqueda de términos). También van en arrays los
+doc_ids (con claves ordenadas para buscar la fila de un doc_id), las
+columnas y bitsets de los filtros de metadatos y el índice de snippets: la
+generación compartida no depende de la de indexación de la que salió, que
+puede haberse borrado.
+
+Uso (desde la raíz del proyecto):
+    python -m buscador.shared_index            # empaqueta la generación actual
+    BUSCADOR_SHARED_INDEX=1 uvicorn api:app --workers 4
+
+El hilo de recarga de cada worker (search_engine.start_index_watcher)
+comprueba CURRENT cada INDEX_RELOAD_SECONDS y pasa a la nueva generación sin
+reiniciarse; las consultas en curso terminan con la anterior.
+
+Diferencia con el modo normal: en lugar del modelo fastText se guardan solo
+los vectores del vocabulario del corpus y de los sinónimos (SharedVectors).
+fastText da vector (por subpalabras) a cualquier palabra; aquí una palabra
+de la consulta que no está en el corpus ni en los sinónimos tiene vector
+nulo y no cuenta en la media del embedding de la consulta. Si la consulta
+tiene alguna, el score semántico y por tanto el orden pueden cambiar
+respecto a BUSCADOR_SHARED_INDEX=0 (los scores TF-IDF y BM25F son los
+mismos: esas palabras tampoco están en las postings).
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+from bisect import bisect_left
+from functools import lru_cache
+from itertools import chain
+from collections.abc import Mapping
+
+import numpy as np
+
+from config import SHARED_INDEX_DIR, SHARED_INDEX_KEEP, EXTRACTED_TEXT_DIR
+from extractor.metadata import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS
+from buscador.filtros import FACET_FIELDS
+from indexador.generaciones import (new_generation, publish_generation,
+                                    current_generation, verify_generation)
+from indexador.snippet_index import OFFSETS_FILE
+
+logger = logging.getLogger(__name__)
+
+META_FILE = 'meta.json'
+# Archivos sin los que una generación compartida no es válida
+REQUIRED_FILES = (META_FILE, 'doc_ids.npy', 'doc_keys.npy', 'terms.npy', 'idf.npy',
+                  'doc_len.npy')
+# ... y los de los metadatos y los snippets si la generación los tiene
+METADATA_FILES = (tuple(f'meta_{name}.npy' for name in NUMERIC_COLUMNS)
+                  + tuple(f'meta_{name}_codes.npy' for name in CATEGORICAL_COLUMNS)
+                  + tuple(f'facet_{name}.npy' for name in FACET_FIELDS))
+SNIPPET_FILES = (OFFSETS_FILE, 'snip_docs.npy', 'snip_rel.npy')
+FORMAT_VERSION = 2
+
+# Filas que decodifica cada paso al recorrer todos los doc_ids
+DOC_IDS_CHUNK = 65536
+# `DocIds.take` decodifica de una vez el tramo entre la primera y la última
+# fila pedidas si se pide al menos 1 de cada TAKE_SPAN_RATIO filas del tramo
+TAKE_SPAN_RATIO = 8
+
+# Búsquedas de término en el vocabulario cacheadas por proceso
+TERM_CACHE_SIZE = 65536
+POSTINGS_CACHE_SIZE = 1024
+
+
+# ─── Listas de cadenas en dos arrays (bytes UTF-8 + offsets) ───────────────────
+
+def _save_strings(gen_dir: str, name: str, strings: list) -> None:
+    encoded = [s.encode('utf-8') for s in strings]
+    ptr = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=ptr[1:])
+    np.save(os.path.join(gen_dir, name + '.npy'),
+            np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    np.save(os.path.join(gen_dir, name + '_ptr.npy'), ptr)
+
+
+class StringArray:
+    """
+    Secuencia de cadenas sobre arrays mapeados en memoria (sin crear los
+    objetos str hasta que se accede a ellos).
+    """
+
+    def __init__(self, gen_dir: str, name: str):
+        self.blob = _load(gen_dir, name)
+        self.ptr = _load(gen_dir, name + '_ptr')
+
+    def __len__(self) -> int:
+        return len(self.ptr) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self.blob[self.ptr[i]:self.ptr[i + 1]]).decode('utf-8')
+
+    def tolist(self) -> list:
+        data = bytes(self.blob)
+        ptr = self.ptr.tolist()
+        return [data[a:b].decode('utf-8') for a, b in zip(ptr, ptr[1:])]
+
+
+class Vocabulary(StringArray):
+    """
+    StringArray ordenado: `index(term)` por búsqueda binaria (-1 si no está).
+    """
+
+    def __init__(self, gen_dir: str, name: str):
+        super().__init__(gen_dir, name)
+        self.index = lru_cache(maxsize=TERM_CACHE_SIZE)(self._index)
+
+    def _index(self, term: str) -> int:
+        i = bisect_left(self, term)
+        return i if i < len(self) and self[i] == term else -1
+
+
+def _load(gen_dir: str, name: str) -> np.ndarray:
+    # Vista ndarray normal sobre el mmap: np.memmap añade coste a cada operación
+    return np.load(os.path.join(gen_dir, name + '.npy'), mmap_mode='r').view(np.ndarray)
+
+
+# ─── doc_ids: fila -> doc_id y doc_id -> fila sin diccionarios por proceso ─────
+
+def _save_doc_ids(gen_dir: str, doc_ids: list) -> None:
+    # Cada doc_id termina en NUL (no aparece en rutas de archivo): un tramo
+    # de filas se decodifica con un solo decode().split() y los doc_ids
+    # ordenados (claves de ancho fijo, dtype 'S') dan la fila de un doc_id
+    encoded = [doc.encode('utf-8') + b'\0' for doc in doc_ids]
+    ptr = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=ptr[1:])
+    np.save(os.path.join(gen_dir, 'doc_ids.npy'),
+            np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    np.save(os.path.join(gen_dir, 'doc_ids_ptr.npy'), ptr)
+    keys = np.array([b[:-1] for b in encoded], dtype=bytes)
+    order = np.argsort(keys, kind='stable')
+    np.save(os.path.join(gen_dir, 'doc_keys.npy'), keys[order])
+    np.save(os.path.join(gen_dir, 'doc_keys_rows.npy'), order.astype(np.int64))
+
+
+class DocIds:
+    """
+    doc_ids de la generación (secuencia, sin lista por proceso). `take(rows)`
+    decodifica solo las filas pedidas; `index(doc)` y `rows(docs)` buscan la
+    fila de un doc_id con searchsorted sobre las claves ordenadas (-1 si no
+    está).
+    """
+
+    def __init__(self, gen_dir: str):
+        self.blob = _load(gen_dir, 'doc_ids')
+        self.ptr = _load(gen_dir, 'doc_ids_ptr')
+        self.keys = _load(gen_dir, 'doc_keys')
+        self.key_rows = _load(gen_dir, 'doc_keys_rows')
+        self._data = memoryview(self.blob)
+
+    def __len__(self) -> int:
+        return len(self.ptr) - 1
+
+    def _span(self, lo: int, hi: int) -> list:
+        # doc_ids de las filas [lo, hi) (hi > lo)
+        return bytes(self.blob[self.ptr[lo]:self.ptr[hi] - 1]).decode('utf-8').split('\0')
+
+    def __getitem__(self, row: int) -> str:
+        return str(self._data[self.ptr[row]:self.ptr[row + 1] - 1], 'utf-8')
+
+    def take(self, rows) -> list:
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return []
+        lo, hi = int(rows.min()), int(rows.max()) + 1
+        if len(rows) * TAKE_SPAN_RATIO >= hi - lo:
+            span = self._span(lo, hi)
+            return [span[r] for r in (rows - lo).tolist()]
+        data = self._data
+        return [str(data[a:b], 'utf-8')
+                for a, b in zip(self.ptr[rows].tolist(), (self.ptr[rows + 1] - 1).tolist())]
+
+    def __iter__(self):
+        n = len(self)
+        return chain.from_iterable(self._span(lo, min(lo + DOC_IDS_CHUNK, n))
+                                   for lo in range(0, n, DOC_IDS_CHUNK))
+
+    def tolist(self) -> list:
+        return self._span(0, len(self)) if len(self) else []
+
+    def index(self, doc_id: str) -> int:
+        key = doc_id.encode('utf-8')
+        if len(key) > self.keys.itemsize:
+            return -1
+        i = int(self.keys.searchsorted(key))
+        return int(self.key_rows[i]) if i < len(self.keys) and self.keys[i] == key else -1
+
+    def __contains__(self, doc_id) -> bool:
+        return self.index(doc_id) >= 0
+
+    def rows(self, docs) -> np.ndarray:
+        encoded = [doc.encode('utf-8') for doc in docs]
+        if not encoded or not len(self.keys):
+            return np.full(len(encoded), -1, dtype=np.int64)
+        keys = np.array(encoded, dtype=self.keys.dtype)
+        i = np.minimum(self.keys.searchsorted(keys), len(self.keys) - 1)
+        # Un doc_id más largo que las claves se habría truncado al convertirlo
+        fits = np.fromiter(map(len, encoded), dtype=np.int64,
+                           count=len(encoded)) <= self.keys.itemsize
+        return np.where((self.keys[i] == keys) & fits, self.key_rows[i], -1)
+
+
+class DocPositions(Mapping):
+    """
+    doc_id -> fila, como el dict `pos` de los índices en memoria. `rows`
+    busca muchos doc_ids a la vez (lo usa buscador.filtros.docs_to_bits).
+    """
+
+    def __init__(self, doc_ids: DocIds):
+        self._doc_ids = doc_ids
+        self.rows = doc_ids.rows
+
+    def __len__(self) -> int:
+        return len(self._doc_ids)
+
+    def __iter__(self):
+        return iter(self._doc_ids)
+
+    def __contains__(self, doc_id) -> bool:
+        return doc_id in self._doc_ids
+
+    def __getitem__(self, doc_id: str) -> int:
+        row = self._doc_ids.index(doc_id)
+        if row < 0:
+            raise KeyError(doc_id)
+        return row
+
+
+# ─── Filtros de metadatos y snippets ───────────────────────────────────────────
+
+class CodedColumn:
+    """
+    Columna categórica codificada: un código por fila y los valores
+    distintos ordenados. `isin` sustituye a np.isin sobre la columna.
+    """
+
+    def __init__(self, gen_dir: str, name: str):
+        self.codes = _load(gen_dir, name + '_codes')
+        self.values = Vocabulary(gen_dir, name + '_values')
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def isin(self, wanted) -> np.ndarray:
+        codes = [c for c in map(self.values.index, wanted) if c >= 0]
+        return np.isin(self.codes, codes)
+
+
+class SharedBitsets(Mapping):
+    """
+    valor -> bitset (int) de un campo de faceta, a partir de la matriz de
+    bits empaquetados (una fila por valor).
+    """
+
+    def __init__(self, gen_dir: str, name: str, numeric: bool):
+        keys = StringArray(gen_dir, name + '_keys').tolist()
+        self._row = {(int(k) if numeric else k): i for i, k in enumerate(keys)}
+        self._bits = _load(gen_dir, name)
+
+    def __len__(self) -> int:
+        return len(self._row)
+
+    def __iter__(self):
+        return iter(self._row)
+
+    def __getitem__(self, value) -> int:
+        return int.from_bytes(self._bits[self._row[value]].tobytes(), 'little')
+
+
+class SnippetDocs(Mapping):
+    """
+    doc_id -> (primera fila, nº de tokens, ruta del .txt, tamaño), como
+    snippet_docs.pkl, para los documentos con entrada en el índice de snippets.
+    """
+
+    def __init__(self, index):
+        self._index = index
+        self._docs = _load(index.gen_dir, 'snip_docs')
+        self._rel = StringArray(index.gen_dir, 'snip_rel')
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._docs[:, 2] >= 0))
+
+    def __iter__(self):
+        return iter(self._index.doc_ids.take(np.flatnonzero(self._docs[:, 2] >= 0)))
+
+    def __getitem__(self, doc_id: str) -> tuple:
+        row = self._index.doc_ids.index(doc_id)
+        if row < 0 or self._docs[row, 2] < 0:
+            raise KeyError(doc_id)
+        first_row, n_tokens, size = self._docs[row].tolist()
+        return first_row, n_tokens, self._rel[row], size
+
+
+# ─── Vistas con la interfaz de los diccionarios de load_indices ────────────────
+
+class Postings(Mapping):
+    """
+    Postings de un término: doc_id -> valor (frecuencia o posiciones
+    comprimidas). `rows` son las filas de los documentos, en orden creciente.
+    """
+
+    def __init__(self, index, rows: np.ndarray, start: int, value_at, values):
+        self._index = index
+        self._rows = rows
+        self._start = start
+        self._value_at = value_at
+        self._values = values
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __iter__(self):
+        return iter(self._index.doc_ids.take(self._rows))
+
+    def _find(self, doc_id: str) -> int:
+        row = self._index.doc_ids.index(doc_id)
+        if row < 0:
+            return -1
+        i = int(np.searchsorted(self._rows, row))
+        return i if i < len(self._rows) and self._rows[i] == row else -1
+
+    def __contains__(self, doc_id) -> bool:
+        return self._find(doc_id) >= 0
+
+    def __getitem__(self, doc_id: str):
+        i = self._find(doc_id)
+        if i < 0:
+            raise KeyError(doc_id)
+        return self._value_at(self._start + i)
+
+    def items(self):
+        return zip(self._index.doc_ids.take(self._rows), self._values())
+
+
+class FreqPostings(Postings):
+    """
+    Postings de frecuencias (BM25F). `bm25f_scores` puntúa todas a la vez
+    (score_bm25f lo usa si las postings lo tienen).
+    """
+
+    def bm25f_scores(self, idf: float, k1: float, b: float, avgdl: float,
+                     weight: float = 1.0):
+        idx = self._index
+        freqs = idx.post_freq[self._start:self._start + len(self._rows)].astype(np.float64)
+        lengths = idx.doc_len[self._rows].astype(np.float64)
+        scores = idf * ((freqs * (k1 + 1)) / (freqs + k1 * (1 - b + b * (lengths / avgdl))))
+        return zip(idx.doc_ids.take(self._rows), (scores * weight).tolist())
+
+
+class TermMapping(Mapping):
+    """
+    term -> Postings sobre las postings ordenadas por término.
+    `kind` elige el valor: 'freq' (BM25F) o 'posiciones' (índice posicional).
+    """
+
+    def __init__(self, index, kind: str):
+        self._index = index
+        self._kind = kind
+        # Las frases y la proximidad piden las postings de los mismos
+        # términos una vez por documento candidato
+        self._postings = lru_cache(maxsize=POSTINGS_CACHE_SIZE)(self._make_postings)
+
+    def __len__(self) -> int:
+        return len(self._index.terms)
+
+    def __iter__(self):
+        return iter(self._index.terms.tolist())
+
+    def __contains__(self, term) -> bool:
+        return self._index.terms.index(term) >= 0
+
+    def __getitem__(self, term: str) -> Postings:
+        postings = self._postings(term)
+        if postings is None:
+            raise KeyError(term)
+        return postings
+
+    def _make_postings(self, term: str):
+        idx = self._index
+        tid = idx.terms.index(term)
+        if tid < 0:
+            return None
+        a, b = int(idx.post_ptr[tid]), int(idx.post_ptr[tid + 1])
+        if self._kind == 'freq':
+            return FreqPostings(idx, idx.post_rows[a:b], a, lambda i: int(idx.post_freq[i]),
+                                lambda: idx.post_freq[a:b].tolist())
+        return Postings(idx, idx.post_rows[a:b], a, idx.positions_at,
+                        lambda: [idx.positions_at(i) for i in range(a, b)])
+
+
+class TermValues(Mapping):
+    """
+    term -> valor escalar (idf, df) a partir de un array alineado con el vocabulario.
+    """
+
+    def __init__(self, terms: Vocabulary, values):
+        self._terms = terms
+        self._values = values
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def __iter__(self):
+        return iter(self._terms.tolist())
+
+    def __getitem__(self, term: str):
+        tid = self._terms.index(term)
+        if tid < 0:
+            raise KeyError(term)
+        return self._values[tid].item()
+
+
+class DocLengths(Mapping):
+    """
+    doc_id -> {'cuerpo': longitud}, como `bm25f_stats['doc_lengths']`.
+    """
+
+    def __init__(self, index):
+        self._index = index
+
+    def __len__(self) -> int:
+        return len(self._index.doc_ids)
+
+    def __iter__(self):
+        return iter(self._index.doc_ids)
+
+    def __getitem__(self, doc_id: str) -> dict:
+        return {'cuerpo': int(self._index.doc_len[self._index.pos[doc_id]])}
+
+
+class DocEmbeddings(Mapping):
+    """
+    doc_id -> embedding (fila de la matriz compartida), solo para los
+    documentos que tienen embedding.
+    """
+
+    def __init__(self, index):
+        self._index = index
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._index.emb_mask))
+
+    def __iter__(self):
+        return iter(self._index.doc_ids.take(np.flatnonzero(self._index.emb_mask)))
+
+    def __getitem__(self, doc_id: str) -> np.ndarray:
+        row = self._index.doc_ids.index(doc_id)
+        if row < 0 or not self._index.emb_mask[row]:
+            raise KeyError(doc_id)
+        return self._index.emb[row]
+
+    def cosine_scores(self, q_emb: np.ndarray, candidates: list) -> dict:
+        """
+        Similitud coseno de `q_emb` con los candidatos que tienen embedding,
+        en una sola multiplicación matriz-vector.
+        """
+        idx = self._index
+        q_norm = float(np.linalg.norm(q_emb))
+        if len(candidates) == len(idx.doc_ids):
+            rows = np.flatnonzero(idx.emb_mask)
+            docs = idx.doc_ids.take(rows)
+        else:
+            rows = idx.doc_ids.rows(candidates)
+            keep = idx.emb_mask[rows]
+            rows = rows[keep]
+            docs = [doc for doc, k in zip(candidates, keep.tolist()) if k]
+        if not q_norm:
+            sims = np.zeros(len(rows))
+        else:
+            den = idx.emb_norm[rows] * q_norm
+            sims = np.divide(idx.emb[rows] @ q_emb.astype(np.float32), den,
+                             out=np.zeros(len(rows), dtype=np.float32), where=den > 0)
+        return dict(zip(docs, sims.tolist()))
+
+
+class SharedTfidf:
+    """
+    Pesos TF-IDF guardados por término. En lugar de `get(doc)` expone
+    `cosine_scores`, que recorre solo las postings de los términos de la
+    consulta (el buscador lo usa si el índice lo tiene).
+    """
+
+    def __init__(self, index):
+        self._index = index
+
+    def __len__(self) -> int:
+        return len(self._index.doc_ids)
+
+    def cosine_scores(self, q_vec: dict, candidates: list) -> dict:
+        idx = self._index
+        acc = np.zeros(len(idx.doc_ids), dtype=np.float64)
+        for term, weight in q_vec.items():
+            tid = idx.terms.index(term)
+            if tid < 0 or not weight:
+                continue
+            a, b = int(idx.post_ptr[tid]), int(idx.post_ptr[tid + 1])
+            acc[idx.post_rows[a:b]] += weight * idx.post_tfidf[a:b]
+        if len(candidates) == len(idx.doc_ids):
+            rows = np.flatnonzero(acc)
+            return dict(zip(idx.doc_ids.take(rows), acc[rows].tolist()))
+        return dict(zip(candidates, acc[idx.doc_ids.rows(candidates)].tolist()))
+
+
+class SharedVectors:
+    """
+    Almacén de vectores de palabra con la interfaz del modelo fastText
+    (`get_word_vector`, `get_dimension`) para el vocabulario del corpus y
+    los sinónimos. Una palabra desconocida devuelve el vector nulo.
+    """
+
+    def __init__(self, gen_dir: str):
+        self.words = Vocabulary(gen_dir, 'vec_terms')
+        self.vectors = _load(gen_dir, 'vec')
+        self._zeros = np.zeros(self.vectors.shape[1], dtype=np.float32)
+
+    def get_dimension(self) -> int:
+        return self.vectors.shape[1]
+
+    def get_word_vector(self, word: str) -> np.ndarray:
+        i = self.words.index(word)
+        return self.vectors[i] if i >= 0 else self._zeros
+
+
+def read_meta(gen_dir: str) -> dict:
+    """
+    meta.json de una generación compartida (ValueError si el formato no es
+    el de esta versión).
+    """
+    with open(os.path.join(gen_dir, META_FILE), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Formato de índice compartido no soportado en '{gen_dir}'")
+    return meta
+
+
+def required_files(meta: dict) -> tuple:
+    """
+    Archivos obligatorios de una generación compartida según su meta.json.
+    """
+    return (REQUIRED_FILES
+            + (METADATA_FILES if meta.get('metadatos') else ())
+            + (SNIPPET_FILES if meta.get('snippets') else ()))
+
+
+class SharedIndex:
+    """
+    Arrays de una generación abiertos con mmap. `bundle()` devuelve el dict
+    con las mismas claves que `search_engine.load_indices`.
+    """
+
+    def __init__(self, gen_dir: str):
+        self.meta = read_meta(gen_dir)
+        self.gen_dir = gen_dir
+        self.doc_ids = DocIds(gen_dir)
+        self.pos = DocPositions(self.doc_ids)
+        self.terms = Vocabulary(gen_dir, 'terms')
+        for name in ('idf', 'df', 'post_ptr', 'post_rows', 'post_freq', 'post_tfidf',
+                     'pos_ptr', 'pos_blob', 'doc_len', 'emb', 'emb_mask', 'emb_norm'):
+            setattr(self, name, _load(gen_dir, name))
+
+    def positions_at(self, i: int) -> bytes:
+        return bytes(self.pos_blob[self.pos_ptr[i]:self.pos_ptr[i + 1]])
+
+    def filter_index(self) -> dict:
+        """
+        Índice de filtros con las claves de `buscador.filtros.build_filter_index`.
+        """
+        gen_dir = self.gen_dir
+        return {
+            'doc_ids': self.doc_ids,
+            'pos': self.pos,
+            'all': (1 << len(self.doc_ids)) - 1,
+            'numeric': {name: _load(gen_dir, f'meta_{name}') for name in NUMERIC_COLUMNS},
+            'columns': {name: CodedColumn(gen_dir, f'meta_{name}')
+                        for name in CATEGORICAL_COLUMNS},
+            'categories': {name: SharedBitsets(gen_dir, f'facet_{name}',
+                                               numeric=name in NUMERIC_COLUMNS)
+                           for name in FACET_FIELDS},
+        }
+
+    def snippet_index(self) -> dict:
+        """
+        Índice de snippets con las claves de `load_snippet_index`.
+        """
+        return {
+            'offsets': _load(self.gen_dir, OFFSETS_FILE[:-len('.npy')]),
+            'docs': SnippetDocs(self),
+            'text_dir': self.meta.get('textos') or EXTRACTED_TEXT_DIR,
+        }
+
+    def bundle(self) -> dict:
+        return {
+            'tfidf_index': SharedTfidf(self),
+            'idf': TermValues(self.terms, self.idf),
+            'doc_ids': self.doc_ids,
+            'inverted_index': TermMapping(self, 'freq'),
+            'bm25f_stats': {
+                'N': self.meta['N'],
+                'df': TermValues(self.terms, self.df),
+                'doc_lengths': DocLengths(self),
+                'avgdl': self.meta['avgdl'],
+            },
+            'positional_index': (TermMapping(self, 'posiciones')
+                                 if self.meta['posiciones'] else None),
+            'filter_index': self.filter_index() if self.meta['metadatos'] else None,
+            'snippet_index': self.snippet_index() if self.meta['snippets'] else None,
+            'doc_embeddings': DocEmbeddings(self),
+            'model': SharedVectors(self.gen_dir),
+            'generacion': os.path.basename(self.gen_dir),
+        }
+
+
+# ─── Empaquetado y publicación ─────────────────────────────────────────────────
+
+def pack_indices(indices: dict, gen_dir: str, extra_words=()) -> dict:
+    """
+    Escribe en `gen_dir` los índices de `load_indices()` como arrays .npy:
+    postings ordenadas por término (frecuencia, peso TF-IDF y posiciones
+    comprimidas), longitudes de documento, la matriz de embeddings alineada
+    con doc_ids, los vectores de palabra del vocabulario (+ `extra_words`),
+    los filtros de metadatos y el índice de snippets. Retorna el meta.json.
+    """
+    from indexador.fasttext_index import align_embeddings
+
+    doc_ids = list(indices['doc_ids'])
+    pos = {doc: i for i, doc in enumerate(doc_ids)}
+    inverted_index = indices['inverted_index']
+    tfidf_index = indices['tfidf_index']
+    positional_index = indices.get('positional_index')
+    stats = indices['bm25f_stats']
+    idf = indices['idf']
+    model = indices['model']
+
+    os.makedirs(gen_dir, exist_ok=True)
+    terms = sorted(inverted_index)
+    _save_doc_ids(gen_dir, doc_ids)
+    _save_strings(gen_dir, 'terms', terms)
+    np.save(os.path.join(gen_dir, 'idf.npy'),
+            np.array([idf.get(t, 0.0) for t in terms], dtype=np.float64))
+    np.save(os.path.join(gen_dir, 'df.npy'),
+            np.array([stats['df'].get(t, 0) for t in terms], dtype=np.int32))
+
+    post_ptr = np.zeros(len(terms) + 1, dtype=np.int64)
+    rows, freqs, weights = [], [], []
+    pos_ptr, blob = [0], bytearray()
+    for tid, term in enumerate(terms):
+        postings = sorted((pos[doc], freq) for doc, freq in inverted_index[term].items())
+        term_positions = positional_index.get(term, {}) if positional_index else {}
+        for row, freq in postings:
+            doc = doc_ids[row]
+            rows.append(row)
+            freqs.append(freq)
+            weights.append(tfidf_index.get(doc, {}).get(term, 0.0))
+            blob += term_positions.get(doc, b'')
+            pos_ptr.append(len(blob))
+        post_ptr[tid + 1] = len(rows)
+    for name, values, dtype in (('post_ptr', post_ptr, np.int64),
+                                ('post_rows', rows, np.int32),
+                                ('post_freq', freqs, np.int32),
+                                ('post_tfidf', weights, np.float32),
+                                ('pos_ptr', pos_ptr, np.int64),
+                                ('pos_blob', blob, np.uint8)):
+        np.save(os.path.join(gen_dir, name + '.npy'), np.asarray(values, dtype=dtype))
+
+    lengths = stats['doc_lengths']
+    np.save(os.path.join(gen_dir, 'doc_len.npy'),
+            np.array([lengths.get(doc, {}).get('cuerpo', 0) for doc in doc_ids],
+                     dtype=np.int32))
+
+    dim = model.get_dimension()
+    emb = np.zeros((len(doc_ids), dim), dtype=np.float32)
+    emb_mask = np.zeros(len(doc_ids), dtype=bool)
+    for doc, vec in align_embeddings(indices['doc_embeddings'], doc_ids).items():
+        emb[pos[doc]] = vec
+        emb_mask[pos[doc]] = True
+    np.save(os.path.join(gen_dir, 'emb.npy'), emb)
+    np.save(os.path.join(gen_dir, 'emb_mask.npy'), emb_mask)
+    np.save(os.path.join(gen_dir, 'emb_norm.npy'), np.linalg.norm(emb, axis=1))
+
+    pack_vectors(model, set(terms).union(extra_words), gen_dir)
+    if indices.get('filter_index') is not None:
+        _pack_filters(indices['filter_index'], gen_dir)
+    if indices.get('snippet_index') is not None:
+        _pack_snippets(indices['snippet_index'], doc_ids, gen_dir)
+
+    meta = {
+        'version': FORMAT_VERSION,
+        'N': stats['N'],
+        'avgdl': stats['avgdl'],
+        'dim': dim,
+        'posiciones': positional_index is not None,
+        'metadatos': indices.get('filter_index') is not None,
+        'snippets': indices.get('snippet_index') is not None,
+        'textos': (indices['snippet_index']['text_dir']
+                   if indices.get('snippet_index') is not None else None),
+        'documentos': len(doc_ids),
+        'terminos': len(terms),
+        'origen': indices.get('generacion'),
+        'creado': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    with open(os.path.join(gen_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def _pack_filters(filter_index: dict, gen_dir: str) -> None:
+    # Columnas numéricas tal cual; categóricas codificadas con diccionario;
+    # bitsets de faceta como una fila de bytes por valor
+    for name, column in filter_index['numeric'].items():
+        np.save(os.path.join(gen_dir, f'meta_{name}.npy'), np.asarray(column))
+    for name, column in filter_index['columns'].items():
+        column = list(column)
+        values = sorted(set(column))
+        code = {v: i for i, v in enumerate(values)}
+        np.save(os.path.join(gen_dir, f'meta_{name}_codes.npy'),
+                np.array([code[v] for v in column], dtype=np.int32))
+        _save_strings(gen_dir, f'meta_{name}_values', values)
+    n_bytes = (len(filter_index['doc_ids']) + 7) // 8
+    for name, per_value in filter_index['categories'].items():
+        keys = list(per_value)
+        raw = b''.join(per_value[k].to_bytes(n_bytes, 'little') for k in keys)
+        np.save(os.path.join(gen_dir, f'facet_{name}.npy'),
+                np.frombuffer(raw, dtype=np.uint8).reshape(len(keys), n_bytes))
+        _save_strings(gen_dir, f'facet_{name}_keys', [str(k) for k in keys])
+
+
+def _pack_snippets(snippet_index: dict, doc_ids: list, gen_dir: str) -> None:
+    # (primera fila, nº de tokens, tamaño) alineados con doc_ids; tamaño -1
+    # si el documento no tiene entrada
+    rows = np.full((len(doc_ids), 3), -1, dtype=np.int64)
+    rel = []
+    for i, doc in enumerate(doc_ids):
+        entry = snippet_index['docs'].get(doc)
+        if entry is None:
+            rel.append('')
+            continue
+        first_row, n_tokens, path, size = entry
+        rows[i] = (first_row, n_tokens, size)
+        rel.append(path)
+    np.save(os.path.join(gen_dir, 'snip_docs.npy'), rows)
+    _save_strings(gen_dir, 'snip_rel', rel)
+
+    offsets = snippet_index['offsets']
+    target = os.path.join(gen_dir, OFFSETS_FILE)
+    source = getattr(offsets, 'filename', None)
+    if source is None:
+        np.save(target, np.asarray(offsets))
+        return
+    # Los archivos de una generación publicada no cambian: basta un enlace
+    # duro (copia si está en otro sistema de archivos)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def pack_vectors(model, words, gen_dir: str) -> int:
+    """
+    Guarda en `gen_dir` los vectores de `words` (vec.npy + vec_terms) para
+    abrirlos con SharedVectors. Retorna el número de palabras.
+    """
+    words = sorted(w for w in set(words) if w)
+    vectors = np.lib.format.open_memmap(os.path.join(gen_dir, 'vec.npy'), mode='w+',
+                                        dtype=np.float32,
+                                        shape=(len(words), model.get_dimension()))
+    for i, word in enumerate(words):
+        vectors[i] = model.get_word_vector(word)
+    vectors.flush()
+    del vectors
+    _save_strings(gen_dir, 'vec_terms', words)
+    return len(words)
+
+
+def publish_shared_index(indices: dict, base_dir: str = SHARED_INDEX_DIR,
+                         extra_words=(), keep: int = SHARED_INDEX_KEEP) -> str:
+    """
+    Empaqueta `indices` en una generación nueva de `base_dir` y la publica
+    con `indexador.generaciones.publish_generation` (rename atómico y
+    CURRENT reescrito con os.replace): los workers ven la generación
+    anterior o la nueva completa, nunca una mezcla. Retorna el nombre publicado.
+    """
+    tmp_dir = new_generation(base_dir)
+    meta = pack_indices(indices, tmp_dir, extra_words)
+    name = publish_generation(tmp_dir, keep=keep, required=required_files(meta))
+    logger.info("Índice compartido publicado: %s", name)
+    return name
+
+
+def attach_shared_index(base_dir: str = SHARED_INDEX_DIR, current: dict = None) -> dict:
+    """
+    Abre (sin copiar) la generación publicada y devuelve sus índices, tras
+    comprobar que están sus archivos con el tamaño y la fecha del manifiesto
+    (ValueError si no cuadran; los checksums se comprueban al publicarla y
+    leerlos en cada worker costaría tanto como cargar los .pkl).
+    Si `current` ya corresponde a esa generación se devuelve tal cual.
+    """
+    name = current_generation(base_dir)
+    if name is None:
+        raise RuntimeError(f"No hay índice compartido publicado en '{base_dir}': "
+                           "ejecuta python -m buscador.shared_index")
+    if current is not None and current.get('generacion') == name:
+        return current
+    gen_dir = os.path.join(base_dir, name)
+    verify_generation(gen_dir, required=required_files(read_meta(gen_dir)),
+                      checksums=False)
+    indices = SharedIndex(gen_dir).bundle()
+    logger.info("Índice compartido %s conectado (pid %d)", name, os.getpid())
+    return indices
+
+
+def publish_current_index(index_dir: str = None, base_dir: str = SHARED_INDEX_DIR) -> str:
+    """
+    Empaqueta y publica la generación de indexación `index_dir` (por
+    defecto la actual). main.py la llama tras cada indexación para que los
+    workers con BUSCADOR_SHARED_INDEX=1 pasen a los índices nuevos.
+    """
+    from buscador.search_engine import load_indices
+    from expansion.semantic_expand import SYNONYMS
+
+    # Los sinónimos también necesitan vector: la expansión los añade a la consulta
+    synonyms = set(SYNONYMS).union(*SYNONYMS.values())
+    return publish_shared_index(load_indices(index_dir), base_dir, extra_words=synonyms)
+
+
+if __name__ == '__main__':
+    from config import LOG_LEVEL
+
+    logging.basicConfig(level=LOG_LEVEL,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    publish_current_index()
@@ -55,12 +55,36 @@ EMBEDDINGS_PATH = os.path.join(INDEX_DIR, 'doc_embeddings.pkl')
 # Peso del componente semántico al combinar scores (0.0–1.0)
 SEMANTIC_WEIGHT = 0.3
 
+# Cuantización de los embeddings de documento que se cargan en memoria:
+#   ''     → float32 (doc_embeddings.pkl tal cual)
+#   'int8' → un byte por dimensión (4x menos memoria)
+#   'pq'   → product quantization: PQ_SUBVECTORS bytes por documento
+EMBEDDINGS_QUANTIZATION = os.environ.get('BUSCADOR_EMB_QUANT', '')
+# Subvectores y centroides por subvector de PQ (la dimensión debe ser
+# múltiplo de PQ_SUBVECTORS; como mucho 256 centroides, un byte por código)
+PQ_SUBVECTORS = 50
+PQ_CENTROIDS = 256
+# Mejores documentos tras la fusión (score final) cuyo score semántico se
+# recalcula con el vector float32 exacto (leído por mmap); 0 desactiva el re-rank
+EMBEDDINGS_RERANK = 100
+
 
 # ─── AJUSTES DE BÚSQUEDA POR DEFECTO ───────────────────────────────────────────
 # Número de resultados por defecto
 TOP_N_DEFAULT = 10
 # Peso TF-IDF vs BM25F en el componente léxico (0.0–1.0)
 LEX_WEIGHT_DEFAULT = 0.5
+
+
+# ─── BÚSQUEDA POR ETAPAS ───────────────────────────────────────────────────────
+# Modos de búsqueda:
+#   'completo' → TF-IDF, BM25F y fastText puntúan todos los documentos
+#   'etapas'   → BM25F genera candidatos y solo esos se re-puntúan
+SEARCH_MODES = ('completo', 'etapas')
+SEARCH_MODE_DEFAULT = 'completo'
+# Número de candidatos BM25F que pasan a la re-puntuación TF-IDF + fastText
+CANDIDATES_K_DEFAULT = 100
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 RAW_PDF_DIR = os.path.join(BASE_DIR, 'data', 'libros_raw')  # PDFs originales
 EXTRACTED_TEXT_DIR = os.path.join(
@@ -82,6 +106,13 @@ BM25F_FIELD_WEIGHTS = {
     'titulo': 2.0,
     'cuerpo': 1.0
 }
+# Guardar también posiciones por posting (necesario para frases "..." y
+# proximidad); ocupa más disco y memoria que el índice de frecuencias
+BM25F_POSITIONS = True
+# Bonus máximo por proximidad de los términos de la consulta (0 = desactivado)
+PROXIMITY_WEIGHT = 0.2
+# Solo los N mejores documentos reciben el bonus de proximidad
+PROXIMITY_CANDIDATES = 100
 
 # Stopwords
 STOPWORDS_PATH = os.path.join(BASE_DIR, 'data', 'stopwords.txt')
@@ -92,3 +123,58 @@ SYNONYMS_PATH = os.path.join(BASE_DIR, 'expansion', 'dictionary.json')
 # Rendimiento y extensiones
 NUM_WORKERS = 4  # Número de procesos para extracción y preprocesado
 PDF_EXTENSIONS = ['.pdf']  # Extensiones válidas
+
+# ─── GENERACIONES DE ÍNDICES ───────────────────────────────────────────────────
+# Cada indexación escribe una generación nueva (gen-<fecha>-<pid>) que se
+# publica de forma atómica; el puntero CURRENT indica la activa
+INDEX_GENERATIONS_DIR = os.path.join(INDEX_DIR, 'generaciones')
+# Generaciones publicadas que se conservan en disco
+INDEX_GENERATIONS_KEEP = 3
+# Cada cuántos segundos comprueba la API si hay una generación nueva
+INDEX_RELOAD_SECONDS = 10.0
+
+# ─── ÍNDICE COMPARTIDO ENTRE WORKERS ───────────────────────────────────────────
+# Con BUSCADOR_SHARED_INDEX=1 los workers abren con mmap la generación
+# publicada por `python -m buscador.shared_index` (o por main.py tras cada
+# indexación) en lugar de cargar los .pkl. Diferencias con el modo normal en
+# el docstring de buscador/shared_index.py
+SHARED_INDEX = os.environ.get('BUSCADOR_SHARED_INDEX', '0') == '1'
+SHARED_INDEX_DIR = os.path.join(INDEX_DIR, 'compartido')
+# Generaciones publicadas que se conservan en disco
+SHARED_INDEX_KEEP = 2
+
+# ─── BÚSQUEDA DISTRIBUIDA (SHARDS) ─────────────────────────────────────────────
+# Generaciones particionadas por documento (python -m indexador.shards)
+SHARDS_DIR = os.path.join(INDEX_DIR, 'shards')
+NUM_SHARDS = 4
+# Shards que consulta el coordinador de /search: 'local' (un proceso por
+# shard de la generación publicada en SHARDS_DIR) o URLs separadas por comas
+# de APIs arrancadas con BUSCADOR_SHARD=<n>. Vacío = índice único
+SHARDS = os.environ.get('BUSCADOR_SHARDS', '')
+# Shard que sirve esta API en /shard/search (None = no es un shard)
+SHARD_ID = (int(os.environ['BUSCADOR_SHARD'])
+            if os.environ.get('BUSCADOR_SHARD', '').isdigit() else None)
+# Tiempo máximo de respuesta de cada shard; los que no llegan se omiten
+# y la respuesta se marca como parcial
+SHARD_TIMEOUT_SECONDS = 2.0
+# Tiempo máximo de carga de los shards al arrancar (o al cambiar de
+# generación) antes de servir consultas con ellos
+SHARD_STARTUP_TIMEOUT_SECONDS = 600.0
+# Procesos por shard local (consultas concurrentes por shard); cada uno
+# tiene en memoria los índices de su shard
+SHARD_PROCESSES = 2
+
+# ─── SNIPPETS ──────────────────────────────────────────────────────────────────
+# Tamaño (en tokens sin stopwords) de la ventana donde se buscan los términos
+SNIPPET_WINDOW_TOKENS = 24
+# Tokens de contexto añadidos a cada lado de la ventana elegida
+SNIPPET_CONTEXT_TOKENS = 4
+# Máximo de apariciones por término consideradas al elegir la ventana
+SNIPPET_MAX_OCCURRENCES = 5000
+# Etiquetas para resaltar los términos (el resto del texto se escapa como HTML)
+SNIPPET_HIGHLIGHT_TAGS = ('<mark>', '</mark>')
+
+# ─── LOGGING Y MÉTRICAS ────────────────────────────────────────────────────────
+# Nivel de logging; con DEBUG se registran tokens, top de resultados y tiempos
+# de cada consulta (se puede sobrescribir con BUSCADOR_LOG_LEVEL)
+LOG_LEVEL = os.environ.get('BUSCADOR_LOG_LEVEL', 'INFO').upper()
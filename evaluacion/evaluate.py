@@ -0,0 +1,224 @@
+# evaluacion/evaluate.py
+"""
+Evaluación offline de relevancia y latencia sobre consultas juzgadas.
+
+Uso (desde la raíz del proyecto):
+    python -m evaluacion.evaluate evaluacion/consultas_ejemplo.json
+    python -m evaluacion.evaluate consultas.json --grid grid.json --k 10 --output res.json
+
+Formato de las consultas (JSON):
+    [{"query": "programacion python",
+      "relevantes": {"book.python": 2, "otro_doc": 1}}, ...]
+  El grado es la relevancia graduada (0 = no relevante) que usa nDCG.
+
+Formato del grid (JSON): parámetro de `search()` -> lista de valores, p. ej.
+    {"tfidf_weight": [0.3, 0.5, 0.7], "semantic_weight": [0.0, 0.3],
+     "bm25f_k1": [1.2, 1.5], "bm25f_b": [0.5, 0.75], "expand": [true, false]}
+La relevancia de cada combinación se calcula en un proceso distinto
+(NUM_WORKERS por defecto); la latencia se mide después, configuración a
+configuración en el proceso principal, para que los tiempos (y la frontera
+de Pareto calidad/latencia) no incluyan la contención con otros procesos.
+"""
+
+import json
+import math
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from buscador.search_engine import search, get_indices
+from config import NUM_WORKERS, LEX_WEIGHT_DEFAULT
+
+# Parámetros de search() que admite el grid
+GRID_PARAMS = ('tfidf_weight', 'semantic_weight', 'bm25f_k1', 'bm25f_b',
+               'expand', 'mode', 'candidates_k', 'proximity_weight')
+
+
+def dcg(gains: list) -> float:
+    return sum((2 ** g - 1) / math.log2(i + 2) for i, g in enumerate(gains))
+
+
+def ndcg_at_k(ranking: list, judgments: dict, k: int) -> float:
+    """
+    nDCG@k con ganancia exponencial (2^rel - 1).
+    """
+    ideal = dcg(sorted(judgments.values(), reverse=True)[:k])
+    if ideal == 0:
+        return 0.0
+    return dcg([judgments.get(doc, 0) for doc in ranking[:k]]) / ideal
+
+
+def reciprocal_rank(ranking: list, judgments: dict) -> float:
+    for rank, doc in enumerate(ranking, start=1):
+        if judgments.get(doc, 0) > 0:
+            return 1.0 / rank
+    return 0.0
+
+
+def recall_at_k(ranking: list, judgments: dict, k: int) -> float:
+    relevant = {doc for doc, g in judgments.items() if g > 0}
+    if not relevant:
+        return 0.0
+    return len(relevant.intersection(ranking[:k])) / len(relevant)
+
+
+def load_queries(path: str) -> list:
+    with open(path, 'r', encoding='utf-8') as f:
+        queries = json.load(f)
+    for q in queries:
+        if 'query' not in q or 'relevantes' not in q:
+            raise ValueError(f"Consulta mal formada (faltan 'query'/'relevantes'): {q}")
+    return queries
+
+
+def expand_grid(grid: dict) -> list:
+    """
+    Producto cartesiano del grid: lista de dicts de parámetros.
+    """
+    unknown = set(grid) - set(GRID_PARAMS)
+    if unknown:
+        raise ValueError(f"Parámetros de grid no soportados: {sorted(unknown)}")
+    if not grid:
+        return [{}]
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def relevance_config(params: dict, queries: list, k: int) -> dict:
+    """
+    Ejecuta todas las consultas con `params` y devuelve las métricas medias
+    de relevancia y las de cada consulta (sin latencia, ver `time_config`).
+    """
+    params = dict(params)
+    params.setdefault('tfidf_weight', LEX_WEIGHT_DEFAULT)
+    per_query = []
+    for q in queries:
+        ranking = [doc for doc, _ in search(q['query'], top_n=k, **params)]
+        judgments = q['relevantes']
+        per_query.append({
+            'query': q['query'],
+            'ndcg': ndcg_at_k(ranking, judgments, k),
+            'rr': reciprocal_rank(ranking, judgments),
+            'recall': recall_at_k(ranking, judgments, k),
+        })
+    return {
+        'parametros': params,
+        f'ndcg@{k}': round(float(np.mean([r['ndcg'] for r in per_query])), 4),
+        'mrr': round(float(np.mean([r['rr'] for r in per_query])), 4),
+        f'recall@{k}': round(float(np.mean([r['recall'] for r in per_query])), 4),
+        'consultas': per_query,
+    }
+
+
+def time_config(result: dict, queries: list, k: int) -> dict:
+    """
+    Mide la latencia de cada consulta con los parámetros de `result` y añade
+    p50, p95 y nDCG por ms. Debe ejecutarse sin otras configuraciones en
+    paralelo: la latencia es la de una consulta sin contención de CPU.
+    """
+    params = result['parametros']
+    # Consulta de calentamiento (no se mide): cachés frías del proceso
+    if queries:
+        search(queries[0]['query'], top_n=k, **params)
+    for q, per_query in zip(queries, result['consultas']):
+        t0 = time.perf_counter()
+        search(q['query'], top_n=k, **params)
+        per_query['latencia_ms'] = (time.perf_counter() - t0) * 1000.0
+
+    latencies = np.array([r['latencia_ms'] for r in result['consultas']])
+    p50 = float(np.percentile(latencies, 50))
+    result['latencia_p50_ms'] = round(p50, 3)
+    result['latencia_p95_ms'] = round(float(np.percentile(latencies, 95)), 3)
+    result['ndcg_por_ms'] = round(result[f'ndcg@{k}'] / p50, 4) if p50 else None
+    return result
+
+
+def evaluate_config(params: dict, queries: list, k: int) -> dict:
+    """
+    Relevancia y latencia de una configuración en el proceso actual.
+    """
+    return time_config(relevance_config(params, queries, k), queries, k)
+
+
+def _warm_worker():
+    # Con fork los índices ya vienen del proceso padre; con spawn se cargan aquí
+    get_indices()
+
+
+def run_grid(queries: list, grid: dict, k: int, workers: int) -> list:
+    """
+    Relevancia de todas las configuraciones en paralelo y, con el pool ya
+    cerrado, latencia de cada una en serie.
+    """
+    configs = expand_grid(grid)
+    if workers <= 1 or len(configs) == 1:
+        return [evaluate_config(c, queries, k) for c in configs]
+    # Cargar antes de crear el pool para que los workers (fork) compartan memoria
+    get_indices()
+    with ProcessPoolExecutor(max_workers=min(workers, len(configs)),
+                             initializer=_warm_worker) as executor:
+        futures = [executor.submit(relevance_config, c, queries, k) for c in configs]
+        results = [f.result() for f in futures]
+    return [time_config(r, queries, k) for r in results]
+
+
+def pareto_front(results: list, k: int) -> list:
+    """
+    Configuraciones no dominadas en (nDCG@k más alto, latencia p50 más baja).
+    """
+    key = f'ndcg@{k}'
+    front = []
+    for r in results:
+        dominated = any(
+            o[key] >= r[key] and o['latencia_p50_ms'] <= r['latencia_p50_ms']
+            and (o[key] > r[key] or o['latencia_p50_ms'] < r['latencia_p50_ms'])
+            for o in results
+        )
+        if not dominated:
+            front.append(r)
+    return sorted(front, key=lambda r: r['latencia_p50_ms'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('queries', help='JSON con consultas y juicios de relevancia')
+    parser.add_argument('--grid', help='JSON con los valores a barrer por parámetro')
+    parser.add_argument('--k', type=int, default=10, help='corte para nDCG@k y recall@k')
+    parser.add_argument('--workers', type=int, default=NUM_WORKERS,
+                        help='procesos en paralelo para el barrido')
+    parser.add_argument('--output', help='JSON con el detalle por configuración y consulta')
+    args = parser.parse_args(argv)
+
+    queries = load_queries(args.queries)
+    grid = {}
+    if args.grid:
+        with open(args.grid, 'r', encoding='utf-8') as f:
+            grid = json.load(f)
+
+    results = run_grid(queries, grid, args.k, args.workers)
+    results.sort(key=lambda r: r[f'ndcg@{args.k}'], reverse=True)
+    front = pareto_front(results, args.k)
+
+    print(f"{len(queries)} consultas, {len(results)} configuraciones\n")
+    print(f"{'nDCG@' + str(args.k):>9} {'MRR':>7} {'R@' + str(args.k):>7} "
+          f"{'p50 ms':>9} {'p95 ms':>9}  parámetros")
+    for r in results:
+        mark = '*' if r in front else ' '
+        print(f"{r[f'ndcg@{args.k}']:>9.4f} {r['mrr']:>7.4f} {r[f'recall@{args.k}']:>7.4f} "
+              f"{r['latencia_p50_ms']:>9.3f} {r['latencia_p95_ms']:>9.3f} {mark} {r['parametros']}")
+    print("\n* = frontera de Pareto calidad/latencia")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'k': args.k, 'resultados': results,
+                       'pareto': [r['parametros'] for r in front]},
+                      f, indent=2, ensure_ascii=False)
+        print(f"Detalle guardado en '{args.output}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import os
+import re
+import pickle
+import logging
+
+import numpy as np
+
+from config import RAW_PDF_DIR, EXTRACTED_TEXT_DIR, METADATA_DIR
+from extractor.preprocess import STOPWORDS, clean_text
+from indexador.generaciones import resolve_index_dir
+
+METADATA_FILE = 'metadatos.pkl'
+
+# Columnas categóricas (listas de str) y numéricas (arrays numpy)
+CATEGORICAL_COLUMNS = ('file', 'source', 'lang', 'title', 'author')
+NUMERIC_COLUMNS = {'year': np.int32, 'pages': np.int32, 'size': np.int64}
+
+# Palabras vacías inglesas frecuentes para distinguir 'en' de 'es'
+EN_STOPWORDS = {'the', 'of', 'and', 'to', 'in', 'is', 'that', 'for', 'it', 'with',
+                'as', 'was', 'on', 'are', 'be', 'this', 'by', 'from', 'or', 'an'}
+
+YEAR_RE = re.compile(r'(19|20)\d{2}')
+
+
+def detect_language(text: str, sample_chars: int = 20000) -> str:
+    """
+    Idioma aproximado ('es', 'en' o 'desconocido') según la proporción de
+    palabras vacías de cada idioma en el comienzo del texto.
+    """
+    words = clean_text(text[:sample_chars]).split()
+    if not words:
+        return 'desconocido'
+    es = sum(1 for w in words if w in STOPWORDS)
+    en = sum(1 for w in words if w in EN_STOPWORDS)
+    if max(es, en) < 0.05 * len(words):
+        return 'desconocido'
+    return 'es' if es >= en else 'en'
+
+
+def _pdf_year(info) -> int:
+    """
+    Año a partir de /CreationDate o /ModDate ("D:YYYYMMDD..."); 0 si no hay.
+    """
+    for key in ('/CreationDate', '/ModDate'):
+        value = str(info.get(key, '') or '') if info else ''
+        match = YEAR_RE.search(value)
+        if match:
+            return int(match.group(0))
+    return 0
+
+
+def extract_pdf_metadata(pdf_path: str) -> dict:
+    """
+    Metadatos de un PDF: diccionario /Info, número de páginas y tamaño.
+    """
+    # Import local: cargar metadatos o filtrar (buscador.filtros) no necesita PyPDF2
+    from PyPDF2 import PdfReader
+
+    meta = {'year': 0, 'pages': 0, 'size': os.path.getsize(pdf_path),
+            'title': '', 'author': ''}
+    try:
+        reader = PdfReader(pdf_path)
+        info = reader.metadata
+        meta['pages'] = len(reader.pages)
+        meta['year'] = _pdf_year(info)
+        if info:
+            meta['title'] = str(info.get('/Title', '') or '')
+            meta['author'] = str(info.get('/Author', '') or '')
+    except Exception as e:
+        logging.error(f"Error leyendo metadatos de '{pdf_path}': {e}")
+    return meta
+
+
+def build_metadata_index(doc_ids: list, metadata_dir: str = METADATA_DIR,
+                         text_dir: str = EXTRACTED_TEXT_DIR) -> dict:
+    """
+    Construye las columnas de metadatos alineadas con `doc_ids` (el mismo
+    orden que el índice TF-IDF) y las guarda en metadata_dir (la generación
+    nueva desde main.py). Los textos se leen de text_dir.
+    - file: doc_id
+    - source: subcarpeta de RAW_PDF_DIR donde está el PDF ('general' si en la raíz)
+    - lang: idioma detectado en el texto extraído
+    - year, pages, size, title, author: del PDF
+    """
+    columns = {name: [] for name in CATEGORICAL_COLUMNS}
+    numeric = {name: [] for name in NUMERIC_COLUMNS}
+
+    for doc_id in doc_ids:
+        pdf_path = os.path.join(RAW_PDF_DIR, doc_id + '.pdf')
+        txt_path = os.path.join(text_dir, doc_id + '.txt')
+        meta = (extract_pdf_metadata(pdf_path) if os.path.exists(pdf_path)
+                else {'year': 0, 'pages': 0, 'size': 0, 'title': '', 'author': ''})
+        text = ''
+        if os.path.exists(txt_path):
+            with open(txt_path, 'r', encoding='utf-8', errors='ignore') as f:
+                text = f.read(20000)
+        subdir = os.path.dirname(doc_id)
+
+        columns['file'].append(doc_id)
+        columns['source'].append(subdir.split(os.sep)[0] if subdir else 'general')
+        columns['lang'].append(detect_language(text))
+        columns['title'].append(meta['title'])
+        columns['author'].append(meta['author'])
+        for name in NUMERIC_COLUMNS:
+            numeric[name].append(meta[name])
+
+    metadata = {'doc_ids': list(doc_ids)}
+    metadata.update(columns)
+    for name, dtype in NUMERIC_COLUMNS.items():
+        metadata[name] = np.asarray(numeric[name], dtype=dtype)
+
+    save_metadata(metadata, metadata_dir)
+    print(f"Metadatos de {len(doc_ids)} documentos guardados en '{metadata_dir}'")
+    return metadata
+
+
+def save_metadata(metadata: dict, metadata_dir: str = METADATA_DIR) -> None:
+    os.makedirs(metadata_dir, exist_ok=True)
+    with open(os.path.join(metadata_dir, METADATA_FILE), 'wb') as f:
+        pickle.dump(metadata, f)
+
+
+def load_metadata(metadata_dir: str = None):
+    """
+    Carga las columnas de metadatos (por defecto, de la generación publicada
+    o de METADATA_DIR); None si aún no se han construido.
+    """
+    path = os.path.join(metadata_dir or resolve_index_dir(METADATA_DIR), METADATA_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+if __name__ == '__main__':
+    from indexador.tfidf_index import load_tfidf_index
+    _, _, ids = load_tfidf_index()
+    build_metadata_index(ids)
@@ -3,59 +3,47 @@ import math
 import pickle
 from collections import defaultdict
 
-from config import EXTRACTED_TEXT_DIR, INDEX_DIR, BM25F_K1, BM25F_B, BM25F_FIELD_WEIGHTS
-from extractor.preprocess import preprocess_text
+from config import (EXTRACTED_TEXT_DIR, INDEX_DIR, BM25F_K1, BM25F_B,
+                    BM25F_FIELD_WEIGHTS, BM25F_POSITIONS)
+from indexador.tfidf_index import read_corpus_tokens
+from indexador.positional_index import compute_positional_index, save_positional_index
+from indexador.generaciones import resolve_index_dir
 
 
-def build_bm25f_index():
+def compute_bm25f_index(docs_tokens: dict):
     """
-    Construye el índice invertido y estadísticas necesarias para BM25F:
-    - Lee todos los .txt en EXTRACTED_TEXT_DIR
-    - Preprocesa y tokeniza
-    - Calcula df (document frequency)
-    - Almacena freq por documento
-    - Calcula longitudes y avgdl
-    - Guarda estructuras en INDEX_DIR
+    Calcula en memoria el índice invertido y las estadísticas BM25F:
+    - df (document frequency)
+    - freq por documento
+    - longitudes y avgdl
+    Retorna: (inverted_index, stats)
     """
     # Estructuras intermedias
     inverted_index = defaultdict(dict)  # term -> {doc_id: freq}
     df = defaultdict(int)               # term -> doc frequency
     doc_lengths = {}                    # doc_id -> {field: length}
 
-    # Procesar cada documento
-    for root, _, files in os.walk(EXTRACTED_TEXT_DIR):
-        for filename in files:
-            if not filename.lower().endswith('.txt'):
-                continue
-            path = os.path.join(root, filename)
-            rel = os.path.relpath(path, EXTRACTED_TEXT_DIR)
-            doc_id = os.path.splitext(rel)[0]
-
-            text = open(path, 'r', encoding='utf-8').read()
-            tokens = preprocess_text(text)
-            # Solo campo 'cuerpo' disponible
-            length = len(tokens)
-            doc_lengths[doc_id] = {'cuerpo': length}
-
-            # Frecuencia de término en cuerpo
-            freqs = defaultdict(int)
-            for t in tokens:
-                freqs[t] += 1
-            # Actualizar df e inverted index
-            for term, cnt in freqs.items():
-                df[term] += 1
-                inverted_index[term][doc_id] = cnt
+    for doc_id, tokens in docs_tokens.items():
+        # Solo campo 'cuerpo' disponible
+        length = len(tokens)
+        doc_lengths[doc_id] = {'cuerpo': length}
+
+        # Frecuencia de término en cuerpo
+        freqs = defaultdict(int)
+        for t in tokens:
+            freqs[t] += 1
+        # Actualizar df e inverted index
+        for term, cnt in freqs.items():
+            df[term] += 1
+            inverted_index[term][doc_id] = cnt
 
     N = len(doc_lengths)
-    if N == 0:
-        print(f"No hay documentos para BM25F en {EXTRACTED_TEXT_DIR}")
-        return
 
     # Calcular promedio de longitud por campo
     avgdl = {}
     for field in BM25F_FIELD_WEIGHTS:
         total = sum(lengths.get(field, 0) for lengths in doc_lengths.values())
-        avgdl[field] = total / float(N)
+        avgdl[field] = total / float(N) if N else 0.0
 
     # Preparar estadísticas
     stats = {
@@ -64,41 +52,76 @@ def build_bm25f_index():
         'doc_lengths': doc_lengths,
         'avgdl': avgdl
     }
+    return dict(inverted_index), stats
 
-    # Guardar en disco
-    os.makedirs(INDEX_DIR, exist_ok=True)
-    with open(os.path.join(INDEX_DIR, 'bm25f_index.pkl'), 'wb') as f:
-        pickle.dump(dict(inverted_index), f)
-    with open(os.path.join(INDEX_DIR, 'bm25f_stats.pkl'), 'wb') as f:
+
+def save_bm25f_index(inverted_index: dict, stats: dict,
+                     index_dir: str = INDEX_DIR) -> None:
+    """
+    Persiste el índice invertido y las estadísticas BM25F en index_dir.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, 'bm25f_index.pkl'), 'wb') as f:
+        pickle.dump(inverted_index, f)
+    with open(os.path.join(index_dir, 'bm25f_stats.pkl'), 'wb') as f:
         pickle.dump(stats, f)
 
+
+def build_bm25f_index(index_dir: str = INDEX_DIR):
+    """
+    Construye el índice invertido y estadísticas necesarias para BM25F:
+    - Lee todos los .txt en EXTRACTED_TEXT_DIR
+    - Preprocesa y tokeniza
+    - Calcula df (document frequency)
+    - Almacena freq por documento
+    - Calcula longitudes y avgdl
+    - Opcionalmente (BM25F_POSITIONS) guarda las posiciones de cada posting
+    - Guarda estructuras en index_dir (una generación nueva desde main.py)
+    """
+    docs_tokens = read_corpus_tokens()
+
+    N = len(docs_tokens)
+    if N == 0:
+        print(f"No hay documentos para BM25F en {EXTRACTED_TEXT_DIR}")
+        return
+
+    inverted_index, stats = compute_bm25f_index(docs_tokens)
+
+    # Guardar en disco
+    save_bm25f_index(inverted_index, stats, index_dir)
+    if BM25F_POSITIONS:
+        save_positional_index(compute_positional_index(docs_tokens), index_dir)
+
     print(
-        f"Índice BM25F construido y guardado en '{INDEX_DIR}' (N={N}, términos={len(df)})")
+        f"Índice BM25F construido y guardado en '{index_dir}' (N={N}, términos={len(stats['df'])})")
 
 
-def load_bm25f_index():
+def load_bm25f_index(index_dir: str = None):
     """
-    Carga el índice BM25F y estadísticas desde disco.
+    Carga el índice BM25F y estadísticas desde disco (por defecto, de la
+    generación publicada o de INDEX_DIR).
     Retorna: (inverted_index, stats)
     """
-    with open(os.path.join(INDEX_DIR, 'bm25f_index.pkl'), 'rb') as f:
+    index_dir = index_dir or resolve_index_dir()
+    with open(os.path.join(index_dir, 'bm25f_index.pkl'), 'rb') as f:
         inverted_index = pickle.load(f)
-    with open(os.path.join(INDEX_DIR, 'bm25f_stats.pkl'), 'rb') as f:
+    with open(os.path.join(index_dir, 'bm25f_stats.pkl'), 'rb') as f:
         stats = pickle.load(f)
     return inverted_index, stats
 
 
-def score_bm25f(query_terms, inverted_index, stats):
+def score_bm25f(query_terms, inverted_index, stats, k1=BM25F_K1, b=BM25F_B,
+                docs=None):
     """
     Calcula scores BM25F para todos los documentos dados los términos de consulta.
+    k1 y b por defecto los de config (se pueden variar para calibrarlos).
+    `docs` (set) restringe el cálculo a esos documentos (filtros).
     Retorna: dict doc_id -> score
     """
     N = stats['N']
     df = stats['df']
     doc_lengths = stats['doc_lengths']
     avgdl = stats['avgdl']
-    k1 = BM25F_K1
-    b = BM25F_B
     field_weights = BM25F_FIELD_WEIGHTS
 
     scores = defaultdict(float)
@@ -110,8 +133,22 @@ def score_bm25f(query_terms, inverted_index, stats):
         df_t = df.get(term, 0)
         idf = math.log((N - df_t + 0.5) / (df_t + 0.5) + 1)
         postings = inverted_index[term]
+        if hasattr(postings, 'bm25f_scores') and (docs is None or len(docs) >= len(postings)):
+            # Índice compartido: todas las postings del término de una vez
+            for doc_id, score in postings.bm25f_scores(idf, k1, b, avgdl.get('cuerpo', 0),
+                                                       field_weights.get('cuerpo', 1.0)):
+                if docs is None or doc_id in docs:
+                    scores[doc_id] += score
+            continue
+        # Recorrer el lado más pequeño: postings del término o docs permitidos
+        if docs is None:
+            matching = postings.items()
+        elif len(docs) < len(postings):
+            matching = ((d, postings[d]) for d in docs if d in postings)
+        else:
+            matching = ((d, f) for d, f in postings.items() if d in docs)
         # Para cada doc que contiene el término
-        for doc_id, f_td in postings.items():
+        for doc_id, f_td in matching:
             # Solo campo cuerpo
             dl = doc_lengths[doc_id].get('cuerpo', 0)
             avg = avgdl.get('cuerpo', 0)
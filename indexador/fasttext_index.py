@@ -2,22 +2,65 @@
 
 import os
 import pickle
+from collections.abc import Mapping
 
 import numpy as np
-import fasttext
 
 from extractor.preprocess import preprocess_text
-from config import PDF_DIR, TEXT_DIR, EMBEDDINGS_PATH, FASTTEXT_MODEL_PATH
+from config import (PDF_DIR, TEXT_DIR, EMBEDDINGS_PATH, FASTTEXT_MODEL_PATH,
+                    EMBEDDINGS_QUANTIZATION, PQ_SUBVECTORS, PQ_CENTROIDS,
+                    EMBEDDINGS_RERANK)
 
+# Nombre del archivo de embeddings dentro de una generación de índices
+EMBEDDINGS_FILE = os.path.basename(EMBEDDINGS_PATH)
 
-def build_fasttext_index():
+
+def compute_doc_embedding(tokens: list, model):
+    """
+    Embedding de documento: media de los vectores de palabra de sus tokens.
+    `model` es cualquier objeto con `get_word_vector(palabra)`.
+    Retorna None si no hay tokens válidos.
+    """
+    vecs = [model.get_word_vector(t) for t in tokens if t]
+    if not vecs:
+        return None
+    return np.mean(vecs, axis=0)
+
+
+def align_embeddings(doc_embeddings: dict, doc_ids: list) -> dict:
+    """
+    Re-indexa los embeddings por doc_id. `build_fasttext_index` los guarda
+    con la ruta del PDF como clave (a veces una ruta de Windows), mientras
+    que el buscador los consulta por doc_id: se casan por nombre de archivo
+    sin extensión cuando la clave no es ya un doc_id.
+    """
+    known = set(doc_ids)
+    by_name = {}
+    for doc in doc_ids:
+        by_name.setdefault(os.path.basename(doc), []).append(doc)
+
+    aligned = {}
+    for key, emb in doc_embeddings.items():
+        if key in known:
+            aligned[key] = emb
+            continue
+        name = os.path.splitext(key.replace('\\', '/').rsplit('/', 1)[-1])[0]
+        matches = by_name.get(name, [])
+        if len(matches) == 1:
+            aligned.setdefault(matches[0], emb)
+    return aligned
+
+
+def build_fasttext_index(embeddings_path: str = EMBEDDINGS_PATH):
     """
     Genera embeddings de documento con fastText:
       1) Carga el modelo preentrenado.
       2) Por cada PDF en PDF_DIR, lee el .txt preprocesado en TEXT_DIR,
-         calcula el embedding promedio y lo guarda en EMBEDDINGS_PATH.
+         calcula el embedding promedio y lo guarda en embeddings_path.
     """
-    # 1) Cargar el modelo fastText
+    # 1) Cargar el modelo fastText (import local: el resto del módulo
+    #    funciona con cualquier modelo que exponga get_word_vector)
+    import fasttext
     model = fasttext.load_model(FASTTEXT_MODEL_PATH)
 
     embeddings = {}
@@ -39,25 +82,296 @@ def build_fasttext_index():
             text = f.read()
         tokens = preprocess_text(text)
 
-        # 4) Obtener vectores fastText para cada token
-        vecs = [model.get_word_vector(t) for t in tokens if t]
-        if not vecs:
+        # 4-5) Embedding de documento (media de vectores fastText)
+        doc_emb = compute_doc_embedding(tokens, model)
+        if doc_emb is None:
             # Si no hay tokens válidos, saltamos
             continue
 
-        # 5) Calcular embedding de documento (media de vectores)
-        doc_emb = np.mean(vecs, axis=0)
-
         # 6) Guardar embedding en el diccionario, clave = ruta absoluta al PDF
         pdf_path = os.path.join(PDF_DIR, fname)
         embeddings[pdf_path] = doc_emb
 
     # 7) Asegurar que el directorio de salida existe
-    os.makedirs(os.path.dirname(EMBEDDINGS_PATH), exist_ok=True)
+    os.makedirs(os.path.dirname(embeddings_path), exist_ok=True)
 
     # 8) Persistir todos los embeddings a disco
-    with open(EMBEDDINGS_PATH, 'wb') as f:
+    with open(embeddings_path, 'wb') as f:
         pickle.dump(embeddings, f)
 
     print(
         f"✅ fastText: embeddings generados para {len(embeddings)} documentos.")
+
+
+# ─── Embeddings cuantizados ───────────────────────────────────────────────────
+# Los vectores se normalizan antes de cuantizar: el buscador solo usa el
+# coseno, así que basta con guardar la dirección y el error de cuantización
+# no depende de la norma del documento. La consulta no se cuantiza (distancia
+# asimétrica): se multiplica en float contra los códigos.
+
+# Archivos dentro del directorio de índices ('int8' o 'pq')
+QUANTIZED_FILE_FORMAT = 'doc_embeddings.{}.npz'
+# Vectores unitarios float32 para el re-rank exacto (se leen por mmap)
+EXACT_EMBEDDINGS_FILE = 'doc_embeddings.f32.npy'
+QUANTIZATION_METHODS = ('int8', 'pq')
+
+# Filas por bloque en k-means: acota la matriz de distancias temporal
+_CHUNK_ROWS = 65536
+# Filas int8 por bloque al puntuar: el bloque convertido a float cabe en caché
+_SCORE_BLOCK_ROWS = 1024
+
+
+def embeddings_matrix(doc_embeddings: dict, doc_ids: list) -> tuple:
+    """
+    (doc_ids con embedding, matriz float32 de vectores unitarios), en el
+    orden de `doc_ids`. Los vectores nulos se quedan a cero.
+    """
+    ids = [doc for doc in doc_ids if doc in doc_embeddings]
+    dim = len(next(iter(doc_embeddings.values()))) if doc_embeddings else 0
+    matrix = np.zeros((len(ids), dim), dtype=np.float32)
+    for row, doc in enumerate(ids):
+        matrix[row] = doc_embeddings[doc]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return ids, matrix
+
+
+def quantize_int8(matrix: np.ndarray) -> tuple:
+    """
+    Cuantización escalar simétrica por dimensión: x ≈ codes * scale,
+    con codes en int8 [-127, 127]. Retorna (codes, scale).
+    """
+    scale = np.abs(matrix).max(axis=0) / 127.0 if len(matrix) else np.zeros(matrix.shape[1])
+    scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(matrix / scale), -127, 127).astype(np.int8)
+    return codes, scale
+
+
+def _nearest_centroid(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # argmin ||x - c||² = argmin (||c||² - 2 x·c), por bloques de filas
+    c_sq = (centroids ** 2).sum(axis=1)
+    out = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), _CHUNK_ROWS):
+        block = x[start:start + _CHUNK_ROWS]
+        out[start:start + len(block)] = (c_sq - 2.0 * block @ centroids.T).argmin(axis=1)
+    return out
+
+
+def _kmeans(x: np.ndarray, k: int, iterations: int, rng) -> np.ndarray:
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest_centroid(x, centroids)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Centroides vacíos: se re-siembran con puntos al azar
+        n_empty = int((~filled).sum())
+        if n_empty:
+            centroids[~filled] = x[rng.choice(len(x), size=n_empty)]
+    return centroids
+
+
+def train_pq(matrix: np.ndarray, n_subvectors: int, n_centroids: int = 256,
+             iterations: int = 20, train_size: int = 50000, seed: int = 0) -> np.ndarray:
+    """
+    Entrena los codebooks de product quantization: la dimensión se parte en
+    `n_subvectors` trozos y en cada uno se hace k-means con `n_centroids`
+    centroides (sobre una muestra de `train_size` vectores como mucho).
+    Con menos vectores que `n_centroids` hay un centroide por vector.
+    Retorna un array (n_subvectors, centroides, dim / n_subvectors).
+    """
+    n, dim = matrix.shape
+    if dim % n_subvectors:
+        raise ValueError(f"La dimensión {dim} no es múltiplo de {n_subvectors} subvectores")
+    if not 1 <= n_centroids <= 256:
+        raise ValueError("PQ admite de 1 a 256 centroides por subvector (códigos de un byte)")
+    rng = np.random.default_rng(seed)
+    sample = matrix[rng.choice(n, size=train_size, replace=False)] if n > train_size else matrix
+    k = min(n_centroids, len(sample))
+    sub = dim // n_subvectors
+    # Solo los k centroides entrenados: uno a cero sin entrenar podría ser el
+    # más cercano al codificar
+    codebooks = np.zeros((n_subvectors, k, sub), dtype=np.float32)
+    for j in range(n_subvectors):
+        codebooks[j] = _kmeans(sample[:, j * sub:(j + 1) * sub], k, iterations, rng)
+    return codebooks
+
+
+def encode_pq(matrix: np.ndarray, codebooks: np.ndarray) -> np.ndarray:
+    """
+    Código PQ de cada vector: índice del centroide más cercano en cada
+    subvector. Retorna un array uint8 (n_subvectors, n): por subvector, para
+    que el score recorra memoria contigua.
+    """
+    n_subvectors, _, sub = codebooks.shape
+    codes = np.empty((n_subvectors, len(matrix)), dtype=np.uint8)
+    for j in range(n_subvectors):
+        codes[j] = _nearest_centroid(matrix[:, j * sub:(j + 1) * sub], codebooks[j])
+    return codes
+
+
+def save_quantized_embeddings(doc_embeddings: dict, doc_ids: list, index_dir: str,
+                              method: str = EMBEDDINGS_QUANTIZATION,
+                              n_subvectors: int = PQ_SUBVECTORS,
+                              n_centroids: int = PQ_CENTROIDS, exact: bool = True) -> str:
+    """
+    Cuantiza los embeddings de documento con `method` ('int8' o 'pq') y los
+    guarda en `index_dir`. Con `exact` guarda también los vectores unitarios
+    float32 para el re-rank. Retorna la ruta del archivo cuantizado.
+    """
+    if method not in QUANTIZATION_METHODS:
+        raise ValueError(f"Cuantización desconocida '{method}' (usa {QUANTIZATION_METHODS})")
+    ids, matrix = embeddings_matrix(doc_embeddings, doc_ids)
+    arrays = {'doc_ids': np.array(ids, dtype=str)}
+    if method == 'int8':
+        arrays['codes'], arrays['scale'] = quantize_int8(matrix)
+    else:
+        codebooks = train_pq(matrix, n_subvectors, n_centroids)
+        arrays['codes'], arrays['codebooks'] = encode_pq(matrix, codebooks), codebooks
+
+    os.makedirs(index_dir, exist_ok=True)
+    path = os.path.join(index_dir, QUANTIZED_FILE_FORMAT.format(method))
+    np.savez(path, **arrays)
+    if exact:
+        np.save(os.path.join(index_dir, EXACT_EMBEDDINGS_FILE), matrix)
+    print(f"Embeddings cuantizados ({method}) guardados en '{path}' ({len(ids)} documentos)")
+    return path
+
+
+def build_quantized_embeddings(index_dir: str, doc_ids: list,
+                               method: str = EMBEDDINGS_QUANTIZATION) -> str:
+    """
+    Cuantiza los embeddings que `build_fasttext_index` dejó en `index_dir`
+    (alineados con `doc_ids`).
+    """
+    with open(os.path.join(index_dir, EMBEDDINGS_FILE), 'rb') as f:
+        doc_embeddings = align_embeddings(pickle.load(f), doc_ids)
+    return save_quantized_embeddings(doc_embeddings, doc_ids, index_dir, method)
+
+
+class QuantizedEmbeddings(Mapping):
+    """
+    doc_id -> embedding reconstruido (unitario) a partir de los códigos int8
+    o PQ. El buscador usa `cosine_scores`, que puntúa la consulta float contra
+    los códigos sin descomprimir la matriz (distancia asimétrica), y, si hay
+    vectores exactos, `rerank` para recalcular con ellos el coseno de los
+    `rerank_k` mejores documentos tras la fusión con los scores léxicos.
+    """
+
+    def __init__(self, method: str, doc_ids: list, codes: np.ndarray, params: np.ndarray,
+                 exact: np.ndarray = None, rerank: int = 0):
+        self.method = method
+        self.doc_ids = doc_ids
+        self.pos = {doc: row for row, doc in enumerate(doc_ids)}
+        self.codes = codes
+        # 'int8': escala por dimensión; 'pq': codebooks
+        self.params = params
+        self.exact = exact
+        self.rerank_k = rerank if exact is not None else 0
+        # Última lista de candidatos que era el corpus entero (modo completo)
+        self._all_candidates = None
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Bytes en memoria de los códigos y sus parámetros (sin doc_ids ni
+        los vectores exactos, que están en disco).
+        """
+        return self.codes.nbytes + self.params.nbytes
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def __iter__(self):
+        return iter(self.doc_ids)
+
+    def __getitem__(self, doc_id: str) -> np.ndarray:
+        row = self.pos[doc_id]
+        if self.method == 'int8':
+            return self.codes[row].astype(np.float32) * self.params
+        code = self.codes[:, row]
+        return self.params[np.arange(len(code)), code].ravel()
+
+    def dot_scores(self, q_emb: np.ndarray, rows: np.ndarray = None) -> np.ndarray:
+        """
+        Productos escalares aproximados de `q_emb` con las filas `rows`
+        (None: todas).
+        - int8: (q * scale) · codes, por bloques de filas
+        - pq: tabla (subvector, centroide) de productos parciales con la
+          consulta; el score es la suma de las entradas que indican los
+          códigos de cada subvector
+        """
+        q = q_emb.astype(np.float32)
+        n = len(self.doc_ids) if rows is None else len(rows)
+        out = np.zeros(n, dtype=np.float32)
+        if self.method == 'int8':
+            q_scaled = q * self.params
+            for start in range(0, n, _SCORE_BLOCK_ROWS):
+                block = (self.codes[start:start + _SCORE_BLOCK_ROWS] if rows is None
+                         else self.codes[rows[start:start + _SCORE_BLOCK_ROWS]])
+                out[start:start + len(block)] = block.astype(np.float32) @ q_scaled
+        else:
+            n_subvectors, _, sub = self.params.shape
+            table = np.einsum('jcs,js->jc', self.params, q.reshape(n_subvectors, sub))
+            for j in range(n_subvectors):
+                codes = self.codes[j] if rows is None else self.codes[j].take(rows)
+                out += table[j].take(codes)
+        return out
+
+    def cosine_scores(self, q_emb: np.ndarray, candidates: list) -> dict:
+        """
+        Coseno aproximado de `q_emb` con los candidatos que tienen embedding.
+        """
+        if candidates is self._all_candidates or candidates == self.doc_ids:
+            # Todo el corpus: sin buscar la fila de cada candidato
+            self._all_candidates = candidates
+            rows = None
+            keys = self.doc_ids
+        else:
+            rows = np.array([self.pos.get(doc, -1) for doc in candidates], dtype=np.int64)
+            rows = rows[rows >= 0]
+            keys = list(map(self.doc_ids.__getitem__, rows.tolist()))
+        q_norm = float(np.linalg.norm(q_emb))
+        if not q_norm or not keys:
+            return dict.fromkeys(keys, 0.0)
+        sims = self.dot_scores(q_emb, rows) / q_norm
+        return dict(zip(keys, sims.tolist()))
+
+    def rerank(self, q_emb: np.ndarray, docs: list) -> dict:
+        """
+        Coseno exacto (vectores float32 del mmap) de `q_emb` con los `docs`
+        que tienen embedding; {} si no hay vectores exactos.
+        """
+        if self.exact is None:
+            return {}
+        rows = np.array(sorted(self.pos[doc] for doc in docs if doc in self.pos),
+                        dtype=np.int64)  # lectura del mmap en orden de disco
+        keys = list(map(self.doc_ids.__getitem__, rows.tolist()))
+        q_norm = float(np.linalg.norm(q_emb))
+        if not q_norm or not keys:
+            return dict.fromkeys(keys, 0.0)
+        sims = np.asarray(self.exact[rows]) @ q_emb.astype(np.float32) / q_norm
+        return dict(zip(keys, sims.tolist()))
+
+
+def load_quantized_embeddings(index_dir: str, method: str = EMBEDDINGS_QUANTIZATION,
+                              rerank: int = EMBEDDINGS_RERANK):
+    """
+    Carga los embeddings cuantizados con `method` de `index_dir`; None si no
+    se han generado. Los vectores exactos (si existen y `rerank` > 0) se
+    abren por mmap: solo se leen las filas que se re-puntúan.
+    """
+    path = os.path.join(index_dir, QUANTIZED_FILE_FORMAT.format(method))
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        doc_ids = data['doc_ids'].tolist()
+        codes = data['codes']
+        params = data['scale'] if method == 'int8' else data['codebooks']
+    exact = None
+    exact_path = os.path.join(index_dir, EXACT_EMBEDDINGS_FILE)
+    if rerank and os.path.exists(exact_path):
+        exact = np.load(exact_path, mmap_mode='r')
+    return QuantizedEmbeddings(method, doc_ids, codes, params, exact=exact, rerank=rerank)
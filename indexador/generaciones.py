@@ -0,0 +1,244 @@
+# indexador/generaciones.py
+"""
+Generaciones versionadas de índices.
+
+Cada indexación escribe en un directorio nuevo 'gen-<fecha>-<pid>-<n>.tmp'
+dentro de INDEX_GENERATIONS_DIR. Al terminar se escribe manifest.json (tamaño,
+fecha de modificación y sha256 de cada archivo), se comprueba que están los
+archivos obligatorios, el directorio se renombra sin '.tmp' y el puntero
+CURRENT se sustituye con os.replace. Un lector ve siempre una generación
+completa: nunca mezcla un tfidf_index.pkl nuevo con un idf.pkl antiguo.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import itertools
+
+from config import INDEX_DIR, INDEX_GENERATIONS_DIR, INDEX_GENERATIONS_KEEP
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_VERSION = 1
+TMP_SUFFIX = '.tmp'
+
+# Archivos sin los que una generación de búsqueda no es válida
+REQUIRED_FILES = ('tfidf_index.pkl', 'idf.pkl', 'doc_ids.pkl',
+                  'bm25f_index.pkl', 'bm25f_stats.pkl')
+
+# Directorios .tmp abandonados (indexaciones interrumpidas) se borran pasado
+# este tiempo, o antes si el proceso que los creó ya no existe
+STALE_TMP_SECONDS = 24 * 3600
+
+# Distingue las generaciones creadas por un proceso en el mismo segundo
+_GENERATION_SEQ = itertools.count()
+
+
+def sha256_file(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fsync_dir(path: str) -> None:
+    # Persistir renames en el directorio (no disponible en Windows)
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def new_generation(base_dir: str = INDEX_GENERATIONS_DIR) -> str:
+    """
+    Crea el directorio temporal de una generación nueva y retorna su ruta.
+    El nombre (fecha, pid y contador) no coincide con el de ninguna
+    generación existente, publicada o no.
+    """
+    os.makedirs(base_dir, exist_ok=True)
+    while True:
+        name = (time.strftime('gen-%Y%m%d-%H%M%S')
+                + f'-{os.getpid()}-{next(_GENERATION_SEQ):04d}')
+        gen_dir = os.path.join(base_dir, name + TMP_SUFFIX)
+        if os.path.exists(os.path.join(base_dir, name)):
+            continue
+        try:
+            os.makedirs(gen_dir)
+        except FileExistsError:
+            continue
+        return gen_dir
+
+
+def write_manifest(gen_dir: str, extra: dict = None) -> dict:
+    """
+    Escribe manifest.json con el tamaño, la fecha de modificación (ns) y el
+    sha256 de cada archivo de la generación (fsync de cada uno antes de
+    calcularlo).
+    """
+    files = {}
+    for root, _, names in os.walk(gen_dir):
+        for filename in sorted(names):
+            path = os.path.join(root, filename)
+            rel = os.path.relpath(path, gen_dir).replace(os.sep, '/')
+            if rel == MANIFEST_FILE:
+                continue
+            with open(path, 'rb+') as f:
+                os.fsync(f.fileno())
+            stat = os.stat(path)
+            files[rel] = {'bytes': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                          'sha256': sha256_file(path)}
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'creado': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'archivos': files,
+    }
+    manifest.update(extra or {})
+    with open(os.path.join(gen_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    return manifest
+
+
+def verify_generation(gen_dir: str, required: tuple = REQUIRED_FILES,
+                      prefix: str = '', checksums: bool = True) -> dict:
+    """
+    Comprueba que la generación tiene manifiesto, los archivos obligatorios
+    y que tamaño y sha256 coinciden. Lanza ValueError si algo no cuadra;
+    retorna el manifiesto. Con `prefix` (p. ej. 'shard-01/') solo se
+    comprueban los archivos bajo ese subdirectorio. Sin `checksums` no se
+    leen los archivos: se comparan tamaño y fecha de modificación.
+    """
+    path = os.path.join(gen_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise ValueError(f"Generación sin {MANIFEST_FILE}: '{gen_dir}'")
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    files = manifest.get('archivos', {})
+    missing = [name for name in required if name not in files]
+    if missing:
+        raise ValueError(f"Faltan {missing} en la generación '{gen_dir}'")
+    for rel, info in files.items():
+        if not rel.startswith(prefix):
+            continue
+        file_path = os.path.join(gen_dir, rel)
+        if not os.path.exists(file_path):
+            raise ValueError(f"Falta '{rel}' en la generación '{gen_dir}'")
+        stat = os.stat(file_path)
+        if checksums:
+            valid = stat.st_size == info['bytes'] and sha256_file(file_path) == info['sha256']
+        else:
+            valid = (stat.st_size == info['bytes']
+                     and info.get('mtime_ns', stat.st_mtime_ns) == stat.st_mtime_ns)
+        if not valid:
+            raise ValueError(f"Checksum incorrecto en '{rel}' de la generación '{gen_dir}'")
+    return manifest
+
+
+def publish_generation(tmp_dir: str, keep: int = INDEX_GENERATIONS_KEEP,
+                       extra: dict = None, required: tuple = REQUIRED_FILES) -> str:
+    """
+    Publica una generación construida en `tmp_dir`:
+    1) manifest.json con los checksums
+    2) comprobación de que están los archivos `required`
+    3) rename atómico de 'gen-....tmp' a 'gen-...'
+    4) CURRENT reescrito con os.replace (atómico)
+    Si falla 2) o 3) se borra `tmp_dir` y se relanza el error: una
+    generación incompleta nunca pasa a ser la actual.
+    Conserva las `keep` generaciones más recientes. Retorna el nombre publicado.
+    """
+    if not tmp_dir.endswith(TMP_SUFFIX):
+        raise ValueError(f"No es un directorio temporal de generación: '{tmp_dir}'")
+    base_dir = os.path.dirname(tmp_dir)
+    gen_dir = tmp_dir[:-len(TMP_SUFFIX)]
+    name = os.path.basename(gen_dir)
+
+    write_manifest(tmp_dir, extra)
+    try:
+        # Los checksums se acaban de calcular: basta con tamaño y fecha
+        verify_generation(tmp_dir, required=required, checksums=False)
+        os.rename(tmp_dir, gen_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    tmp_current = os.path.join(base_dir, CURRENT_FILE + TMP_SUFFIX)
+    with open(tmp_current, 'w', encoding='utf-8') as f:
+        f.write(name + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_current, os.path.join(base_dir, CURRENT_FILE))
+    _fsync_dir(base_dir)
+
+    prune_generations(base_dir, keep)
+    logger.info("Generación publicada: %s", gen_dir)
+    return name
+
+
+def prune_generations(base_dir: str, keep: int = INDEX_GENERATIONS_KEEP) -> None:
+    """
+    Borra las generaciones antiguas (nunca la actual) y los directorios
+    .tmp abandonados: los de un proceso que ya no existe o con más de
+    STALE_TMP_SECONDS. Un proceso que aún tenga abierta una generación
+    borrada conserva los datos que ya cargó.
+    """
+    current = current_generation(base_dir)
+    now = time.time()
+    published = []
+    for entry in os.listdir(base_dir):
+        path = os.path.join(base_dir, entry)
+        if not entry.startswith('gen-') or not os.path.isdir(path):
+            continue
+        if entry.endswith(TMP_SUFFIX):
+            if (now - os.path.getmtime(path) > STALE_TMP_SECONDS
+                    or not _owner_alive(entry)):
+                shutil.rmtree(path, ignore_errors=True)
+        else:
+            published.append(entry)
+    for old in sorted(published)[:-keep]:
+        if old != current:
+            shutil.rmtree(os.path.join(base_dir, old), ignore_errors=True)
+
+
+def _owner_alive(entry: str) -> bool:
+    # ¿Sigue vivo el proceso que creó 'gen-<fecha>-<hora>-<pid>[-<n>].tmp'?
+    # (solo en POSIX; en otros sistemas se espera a STALE_TMP_SECONDS)
+    parts = entry[:-len(TMP_SUFFIX)].split('-')
+    if os.name != 'posix' or len(parts) < 4 or not parts[3].isdigit():
+        return True
+    try:
+        os.kill(int(parts[3]), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def current_generation(base_dir: str = INDEX_GENERATIONS_DIR):
+    """
+    Nombre de la generación publicada en `base_dir`; None si no hay ninguna.
+    """
+    try:
+        with open(os.path.join(base_dir, CURRENT_FILE), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def resolve_index_dir(legacy_dir: str = INDEX_DIR,
+                      base_dir: str = INDEX_GENERATIONS_DIR) -> str:
+    """
+    Directorio de la generación actual o, si aún no se ha publicado ninguna,
+    `legacy_dir` (índices planos anteriores a las generaciones).
+    """
+    name = current_generation(base_dir)
+    return os.path.join(base_dir, name) if name else legacy_dir
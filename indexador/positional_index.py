@@ -0,0 +1,208 @@
+# indexador/positional_index.py
+
+import os
+import re
+import pickle
+from bisect import bisect_left
+from itertools import accumulate
+from collections import defaultdict
+
+from config import INDEX_DIR
+from indexador.generaciones import resolve_index_dir
+
+POSITIONS_FILE = 'positional_index.pkl'
+
+# Frases entre comillas dobles dentro de la consulta
+PHRASE_RE = re.compile(r'"([^"]+)"')
+
+
+def encode_positions(positions: list) -> bytes:
+    """
+    Comprime una lista creciente de posiciones: deltas codificados como
+    varint (7 bits por byte, el bit alto indica que sigue otro byte).
+    """
+    out = bytearray()
+    prev = 0
+    for pos in positions:
+        delta = pos - prev
+        prev = pos
+        while delta >= 0x80:
+            out.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        out.append(delta)
+    return bytes(out)
+
+
+def decode_positions(data: bytes, limit: int = None) -> list:
+    """
+    Inverso de `encode_positions`. Con `limit` solo se decodifican las
+    primeras `limit` posiciones (el coste no depende del total).
+    """
+    # Términos frecuentes: todos los deltas caben en un byte y la
+    # decodificación se reduce a una suma acumulada (en C)
+    head = data if limit is None else data[:limit]
+    if not head or max(head) < 0x80:
+        return list(accumulate(head))
+    positions = []
+    pos = 0
+    delta = 0
+    shift = 0
+    for byte in data:
+        delta |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            pos += delta
+            positions.append(pos)
+            if len(positions) == limit:
+                break
+            delta = 0
+            shift = 0
+    return positions
+
+
+def compute_positional_index(docs_tokens: dict) -> dict:
+    """
+    Índice posicional: term -> {doc_id: posiciones comprimidas}.
+    Las posiciones son índices en la lista de tokens ya preprocesada (sin
+    stopwords), la misma que usan TF-IDF y BM25F.
+    """
+    positional_index = defaultdict(dict)
+    for doc_id, tokens in docs_tokens.items():
+        term_positions = defaultdict(list)
+        for pos, term in enumerate(tokens):
+            term_positions[term].append(pos)
+        for term, positions in term_positions.items():
+            positional_index[term][doc_id] = encode_positions(positions)
+    return dict(positional_index)
+
+
+def save_positional_index(positional_index: dict, index_dir: str = INDEX_DIR) -> None:
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, POSITIONS_FILE), 'wb') as f:
+        pickle.dump(positional_index, f)
+
+
+def load_positional_index(index_dir: str = None):
+    """
+    Carga el índice posicional; None si no se construyó.
+    """
+    path = os.path.join(index_dir or resolve_index_dir(), POSITIONS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def split_phrases(query: str) -> tuple:
+    """
+    Separa las frases entre comillas del resto de la consulta.
+    Retorna: (consulta sin comillas, [texto de cada frase])
+    """
+    phrases = [p.strip() for p in PHRASE_RE.findall(query) if p.strip()]
+    return query.replace('"', ' '), phrases
+
+
+def intersect_postings(terms: list, postings_index: dict, docs=None) -> set:
+    """
+    Documentos que contienen todos los términos. Empieza por el término más
+    raro para que los conjuntos intermedios sean lo más pequeños posible.
+    `docs` restringe opcionalmente el resultado a un conjunto previo.
+    """
+    postings = []
+    for term in set(terms):
+        if term not in postings_index:
+            return set()
+        postings.append(postings_index[term])
+    if not postings:
+        return set()
+    postings.sort(key=len)
+    result = set(postings[0]) if docs is None else {d for d in postings[0] if d in docs}
+    for plist in postings[1:]:
+        result = {doc for doc in result if doc in plist}
+        if not result:
+            break
+    return result
+
+
+def phrase_matches(terms: list, positional_index: dict, docs=None) -> dict:
+    """
+    Documentos donde `terms` aparecen consecutivos (en la secuencia
+    preprocesada). Retorna {doc_id: número de apariciones de la frase}.
+    """
+    if not terms:
+        return {}
+    candidates = intersect_postings(terms, positional_index, docs)
+    if len(terms) == 1:
+        return {doc: len(decode_positions(positional_index[terms[0]][doc]))
+                for doc in candidates}
+
+    matches = {}
+    for doc in candidates:
+        lists = [decode_positions(positional_index[t][doc]) for t in terms]
+        # En cada documento ancla el término con menos apariciones y comprueba
+        # el resto por búsqueda binaria: O(r · t · log n)
+        anchor = min(range(len(terms)), key=lambda i: len(lists[i]))
+        count = 0
+        for p in lists[anchor]:
+            start = p - anchor
+            for i, plist in enumerate(lists):
+                if i == anchor:
+                    continue
+                j = bisect_left(plist, start + i)
+                if j == len(plist) or plist[j] != start + i:
+                    break
+            else:
+                count += 1
+        if count:
+            matches[doc] = count
+    return matches
+
+
+def min_span(position_lists: list) -> int:
+    """
+    Longitud (en tokens) de una ventana corta que contiene al menos una
+    posición de cada lista (listas ordenadas y no vacías).
+    Para cada aparición de la lista más corta toma, en las demás, la posición
+    más cercana (búsqueda binaria): O(r · t · log n) en lugar de recorrer todas
+    las posiciones; el resultado es como mucho el doble de la ventana óptima.
+    """
+    lists = sorted(position_lists, key=len)
+    anchors, others = lists[0], lists[1:]
+    best = None
+    for p in anchors:
+        lo = hi = p
+        for plist in others:
+            i = bisect_left(plist, p)
+            if i == 0:
+                q = plist[0]
+            elif i == len(plist):
+                q = plist[-1]
+            else:
+                before, after = plist[i - 1], plist[i]
+                q = before if p - before <= after - p else after
+            lo = min(lo, q)
+            hi = max(hi, q)
+        if best is None or hi - lo + 1 < best:
+            best = hi - lo + 1
+            if best == len(position_lists):
+                break
+    return best
+
+
+def proximity_score(terms: list, doc_id: str, positional_index: dict) -> float:
+    """
+    Cercanía de los términos de la consulta en el documento, en [0, 1]:
+    1.0 si aparecen todos adyacentes, decreciendo con el tamaño de la
+    ventana mínima que contiene los presentes y con los que faltan.
+    """
+    unique = set(terms)
+    lists = []
+    for term in unique:
+        plist = positional_index.get(term, {}).get(doc_id)
+        if plist is not None:
+            lists.append(decode_positions(plist))
+    if len(lists) < 2:
+        return 0.0
+    coverage = len(lists) / float(len(unique))
+    return coverage * len(lists) / float(min_span(lists))
@@ -0,0 +1,218 @@
+# indexador/shards.py
+"""
+Índices particionados por documento en N shards.
+
+Cada documento va al shard crc32(doc_id) % N. Cada shard es un directorio
+con los mismos archivos que una generación normal (se carga con
+`search_engine.load_indices`), pero con estadísticas globales:
+- idf.pkl es el de todo el corpus, así que el vector TF-IDF de la consulta
+  y los pesos de los documentos son los del índice único;
+- bm25f_stats.pkl lleva N, df y avgdl globales (las longitudes son locales).
+Con ello los scores TF-IDF y BM25F de un documento no dependen del número
+de shards y el coordinador puede mezclar los top-k directamente.
+
+La generación guarda además, fuera de los shards (vectores/), los vectores
+de palabra del vocabulario global y de los sinónimos: los procesos de los
+shards los abren por mmap (SharedVectors) en lugar de cargar cada uno el
+modelo fastText. Como en el índice compartido (buscador/shared_index.py),
+una palabra de la consulta fuera de ese vocabulario no aporta al score
+semántico.
+
+Uso (desde la raíz del proyecto):
+    python -m indexador.shards --shards 4
+"""
+
+import os
+import zlib
+import pickle
+import argparse
+from collections import defaultdict
+
+from config import (EXTRACTED_TEXT_DIR, SHARDS_DIR, NUM_SHARDS,
+                    BM25F_FIELD_WEIGHTS, BM25F_POSITIONS, EMBEDDINGS_QUANTIZATION)
+from indexador.tfidf_index import (iter_corpus_tokens, compute_idf,
+                                   compute_tfidf_index, save_tfidf_index)
+from indexador.bm25f_index import compute_bm25f_index, save_bm25f_index
+from indexador.positional_index import compute_positional_index, save_positional_index
+from indexador.fasttext_index import (compute_doc_embedding, save_quantized_embeddings,
+                                      EMBEDDINGS_FILE)
+from indexador.generaciones import (new_generation, publish_generation,
+                                    current_generation, verify_generation,
+                                    REQUIRED_FILES)
+
+SHARD_DIR_FORMAT = 'shard-{:02d}'
+# Subdirectorio de la generación con los vectores de palabra (SharedVectors)
+VECTORS_DIR = 'vectores'
+
+
+def shard_of(doc_id: str, n_shards: int) -> int:
+    """
+    Shard de un documento (estable entre ejecuciones y máquinas).
+    """
+    return zlib.crc32(doc_id.encode('utf-8')) % n_shards
+
+
+def shard_dirs(gen_dir: str) -> list:
+    """
+    Directorios de los shards de una generación, en orden.
+    """
+    return sorted(os.path.join(gen_dir, d) for d in os.listdir(gen_dir)
+                  if d.startswith('shard-') and os.path.isdir(os.path.join(gen_dir, d)))
+
+
+def current_shard_dirs(base_dir: str = SHARDS_DIR) -> tuple:
+    """
+    (nombre de la generación publicada, directorios de sus shards).
+    """
+    name = current_generation(base_dir)
+    if name is None:
+        raise RuntimeError(f"No hay índice particionado publicado en '{base_dir}': "
+                           "ejecuta python -m indexador.shards")
+    return name, shard_dirs(os.path.join(base_dir, name))
+
+
+def compute_global_stats(docs_tokens) -> dict:
+    """
+    Primera pasada sobre (doc_id, tokens): N, df, avgdl e idf de todo el corpus.
+    Solo guarda contadores por término, no los tokens.
+    """
+    df = defaultdict(int)
+    N = 0
+    total_length = 0
+    for _, tokens in docs_tokens:
+        N += 1
+        total_length += len(tokens)
+        for term in set(tokens):
+            df[term] += 1
+    df = dict(df)
+    avg = total_length / float(N) if N else 0.0
+    return {
+        'N': N,
+        'df': df,
+        # Solo hay campo 'cuerpo' (igual que compute_bm25f_index)
+        'avgdl': {field: (avg if field == 'cuerpo' else 0.0) for field in BM25F_FIELD_WEIGHTS},
+        'idf': compute_idf(df, N),
+    }
+
+
+def compute_shard_indices(docs_tokens: dict, global_stats: dict) -> dict:
+    """
+    Índices TF-IDF y BM25F de los documentos de un shard con las
+    estadísticas globales. Retorna un dict con las claves de `load_indices`
+    (sin embeddings, metadatos ni snippets).
+    """
+    tfidf_index, idf, doc_ids = compute_tfidf_index(docs_tokens, idf=global_stats['idf'])
+    inverted_index, stats = compute_bm25f_index(docs_tokens)
+    stats['N'] = global_stats['N']
+    stats['avgdl'] = global_stats['avgdl']
+    # df global, pero solo de los términos de este shard (score_bm25f no mira más)
+    stats['df'] = {term: global_stats['df'][term] for term in inverted_index}
+    return {
+        'tfidf_index': tfidf_index,
+        'idf': idf,
+        'doc_ids': doc_ids,
+        'inverted_index': inverted_index,
+        'bm25f_stats': stats,
+    }
+
+
+def build_sharded_index(n_shards: int = NUM_SHARDS, text_dir: str = EXTRACTED_TEXT_DIR,
+                        base_dir: str = SHARDS_DIR, model=None) -> str:
+    """
+    Construye y publica una generación particionada en `base_dir`:
+    1) una pasada por el corpus para las estadísticas globales
+    2) por cada shard, una pasada que solo lee sus documentos y guarda
+       TF-IDF, BM25F, posiciones, metadatos, snippets y embeddings
+    En memoria solo hay a la vez los tokens de un shard.
+    `model` es el modelo de embeddings (por defecto el fastText de config).
+    Retorna el nombre de la generación publicada.
+    """
+    from extractor.metadata import build_metadata_index
+    from indexador.snippet_index import build_snippet_index
+    from buscador.shared_index import pack_vectors
+    from expansion.semantic_expand import SYNONYMS
+    if model is None:
+        import fasttext
+        from config import FASTTEXT_MODEL_PATH
+        model = fasttext.load_model(FASTTEXT_MODEL_PATH)
+
+    global_stats = compute_global_stats(iter_corpus_tokens(text_dir))
+    print(f"Estadísticas globales: N={global_stats['N']}, términos={len(global_stats['df'])}")
+
+    gen_dir = new_generation(base_dir)
+    for i in range(n_shards):
+        shard_dir = os.path.join(gen_dir, SHARD_DIR_FORMAT.format(i))
+        docs_tokens = dict(iter_corpus_tokens(
+            text_dir, doc_filter=lambda doc_id: shard_of(doc_id, n_shards) == i))
+
+        indices = compute_shard_indices(docs_tokens, global_stats)
+        save_tfidf_index(indices['tfidf_index'], indices['idf'], indices['doc_ids'], shard_dir)
+        save_bm25f_index(indices['inverted_index'], indices['bm25f_stats'], shard_dir)
+        if BM25F_POSITIONS:
+            save_positional_index(compute_positional_index(docs_tokens), shard_dir)
+        build_metadata_index(indices['doc_ids'], shard_dir, text_dir)
+        build_snippet_index(text_dir, shard_dir, doc_ids=set(docs_tokens))
+
+        embeddings = {}
+        for doc_id, tokens in docs_tokens.items():
+            emb = compute_doc_embedding(tokens, model)
+            if emb is not None:
+                embeddings[doc_id] = emb
+        with open(os.path.join(shard_dir, EMBEDDINGS_FILE), 'wb') as f:
+            pickle.dump(embeddings, f)
+        if EMBEDDINGS_QUANTIZATION and embeddings:
+            save_quantized_embeddings(embeddings, indices['doc_ids'], shard_dir)
+        print(f"Shard {i}: {len(docs_tokens)} documentos")
+
+    vectors_dir = os.path.join(gen_dir, VECTORS_DIR)
+    os.makedirs(vectors_dir)
+    n_words = pack_vectors(model, set(global_stats['df']).union(*SYNONYMS.values(), SYNONYMS),
+                           vectors_dir)
+    print(f"Vectores de palabra: {n_words}")
+
+    required = tuple(SHARD_DIR_FORMAT.format(i) + '/' + f
+                     for i in range(n_shards) for f in REQUIRED_FILES)
+    name = publish_generation(gen_dir, required=required + (VECTORS_DIR + '/vec.npy',),
+                              extra={'shards': n_shards, 'documentos': global_stats['N']})
+    print(f"Índice particionado publicado: {name} ({n_shards} shards)")
+    return name
+
+
+def load_shard_indices(shard_id: int, base_dir: str = SHARDS_DIR, model=None,
+                       generation: str = None) -> dict:
+    """
+    Índices de un shard de la generación particionada `generation` (por
+    defecto la publicada), tras verificar los checksums de sus archivos
+    ('generacion' es el nombre de la generación, no el del shard).
+    Sin `model`, las palabras de la consulta se buscan en los vectores de
+    la generación (SharedVectors) y solo si no los tiene se carga fastText.
+    """
+    from buscador.search_engine import load_indices
+    from buscador.shared_index import SharedVectors
+
+    if generation is None:
+        name, dirs = current_shard_dirs(base_dir)
+    else:
+        name, dirs = generation, shard_dirs(os.path.join(base_dir, generation))
+    if not 0 <= shard_id < len(dirs):
+        raise ValueError(f"Shard {shard_id} no existe en '{name}' ({len(dirs)} shards)")
+    gen_dir = os.path.join(base_dir, name)
+    prefix = os.path.basename(dirs[shard_id]) + '/'
+    verify_generation(gen_dir, required=tuple(prefix + f for f in REQUIRED_FILES),
+                      prefix=prefix)
+    vectors_dir = os.path.join(gen_dir, VECTORS_DIR)
+    if model is None and os.path.isdir(vectors_dir):
+        verify_generation(gen_dir, required=(VECTORS_DIR + '/vec.npy',),
+                          prefix=VECTORS_DIR + '/')
+        model = SharedVectors(vectors_dir)
+    indices = load_indices(dirs[shard_id], verify=False, model=model)
+    indices['generacion'] = name
+    return indices
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shards', type=int, default=NUM_SHARDS, help='número de shards')
+    args = parser.parse_args()
+    build_sharded_index(args.shards)
@@ -0,0 +1,213 @@
+# indexador/snippet_index.py
+
+import os
+import re
+import html
+import pickle
+import logging
+
+import numpy as np
+
+from config import (EXTRACTED_TEXT_DIR, INDEX_DIR, SNIPPET_WINDOW_TOKENS,
+                    SNIPPET_CONTEXT_TOKENS, SNIPPET_MAX_OCCURRENCES,
+                    SNIPPET_HIGHLIGHT_TAGS)
+from extractor.preprocess import STOPWORDS, clean_text, preprocess_text
+from indexador.positional_index import decode_positions
+from indexador.generaciones import resolve_index_dir
+
+OFFSETS_FILE = 'snippet_offsets.npy'
+SNIPPET_DOCS_FILE = 'snippet_docs.pkl'
+
+# Secuencias de letras ASCII o bytes UTF-8 no ASCII: todo lo demás separa
+# palabras igual que clean_text, así que los tokens coinciden con preprocess_text
+WORD_BYTES_RE = re.compile(rb'[A-Za-z\x80-\xff]+')
+UNICODE_WORD_RE = re.compile(r'[^\W\d_]+')
+
+# Bytes leídos cuando el documento no contiene ningún término de la consulta
+FALLBACK_BYTES = 800
+FALLBACK_CHARS = 200
+
+
+def tokenize_with_offsets(data: bytes) -> tuple:
+    """
+    Tokeniza el texto en bruto conservando el rango de bytes de cada token.
+    Retorna (tokens, offsets) con offsets de forma (n, 2): [inicio, fin).
+    """
+    tokens = []
+    offsets = []
+    for match in WORD_BYTES_RE.finditer(data):
+        piece = match.group().decode('utf-8', errors='ignore')
+        words = clean_text(piece).split(' ')
+        spans = [(match.start(), match.end())] * len(words)
+        if len(words) > 1:
+            # Varias palabras unidas por separadores no ASCII (p. ej. espacio
+            # duro): rango propio para cada una si se pueden alinear
+            sub = [m.span() for m in UNICODE_WORD_RE.finditer(piece)]
+            if len(sub) == len(words):
+                spans = [(match.start() + len(piece[:a].encode('utf-8')),
+                          match.start() + len(piece[:b].encode('utf-8'))) for a, b in sub]
+        for token, span in zip(words, spans):
+            if token and token not in STOPWORDS:
+                tokens.append(token)
+                offsets.append(span)
+    return tokens, np.asarray(offsets, dtype=np.uint32).reshape(-1, 2)
+
+
+def build_snippet_index(text_dir: str = EXTRACTED_TEXT_DIR, index_dir: str = INDEX_DIR,
+                        doc_ids=None):
+    """
+    Precalcula, para cada .txt de text_dir, el rango de bytes de cada token
+    preprocesado. Junto al índice posicional (posición del token -> bytes)
+    permite leer solo el fragmento del snippet. `doc_ids` (set) limita el
+    índice a esos documentos (los de un shard).
+    Guarda:
+    - snippet_offsets.npy: matriz (tokens totales, 2) uint32
+    - snippet_docs.pkl: doc_id -> (primera fila, nº de tokens, ruta del .txt,
+      tamaño del .txt en bytes)
+    """
+    docs = {}
+    chunks = []
+    row = 0
+    for root, _, files in os.walk(text_dir):
+        for filename in files:
+            if not filename.lower().endswith('.txt'):
+                continue
+            path = os.path.join(root, filename)
+            rel = os.path.relpath(path, text_dir)
+            doc_id = os.path.splitext(rel)[0]
+            if doc_ids is not None and doc_id not in doc_ids:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            tokens, offsets = tokenize_with_offsets(data)
+            # Las posiciones del índice posicional deben corresponder 1:1
+            if tokens != preprocess_text(data.decode('utf-8', errors='ignore')):
+                logging.warning(f"Tokens desalineados en '{rel}', sin snippet precalculado")
+                continue
+            docs[doc_id] = (row, len(tokens), rel, len(data))
+            chunks.append(offsets)
+            row += len(tokens)
+
+    offsets = np.concatenate(chunks) if chunks else np.zeros((0, 2), dtype=np.uint32)
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, OFFSETS_FILE), offsets)
+    with open(os.path.join(index_dir, SNIPPET_DOCS_FILE), 'wb') as f:
+        pickle.dump(docs, f)
+    print(f"Índice de snippets guardado en '{index_dir}' ({len(docs)} documentos, {row} tokens)")
+
+
+def load_snippet_index(index_dir: str = None, text_dir: str = EXTRACTED_TEXT_DIR):
+    """
+    Carga el índice de snippets (offsets en modo mmap); None si no existe.
+    """
+    index_dir = index_dir or resolve_index_dir()
+    offsets_path = os.path.join(index_dir, OFFSETS_FILE)
+    docs_path = os.path.join(index_dir, SNIPPET_DOCS_FILE)
+    if not (os.path.exists(offsets_path) and os.path.exists(docs_path)):
+        return None
+    with open(docs_path, 'rb') as f:
+        docs = pickle.load(f)
+    return {
+        'offsets': np.load(offsets_path, mmap_mode='r'),
+        'docs': docs,
+        'text_dir': text_dir,
+    }
+
+
+def best_window(term_positions: dict, weights: dict, window: int) -> tuple:
+    """
+    Ventana de `window` tokens con mayor puntuación: cada término distinto
+    suma su peso y cada repetición un 10% de él.
+    term_positions: term -> posiciones ordenadas. Retorna (inicio, fin) o None.
+    """
+    events = sorted((p, t) for t, plist in term_positions.items() for p in plist)
+    if not events:
+        return None
+    best, best_range = -1.0, None
+    counts = {}
+    score = 0.0
+    left = 0
+    for right, (pos, term) in enumerate(events):
+        counts[term] = counts.get(term, 0) + 1
+        score += weights[term] if counts[term] == 1 else 0.1 * weights[term]
+        while pos - events[left][0] >= window:
+            old = events[left][1]
+            counts[old] -= 1
+            score -= weights[old] if counts[old] == 0 else 0.1 * weights[old]
+            left += 1
+        if score > best:
+            best, best_range = score, (events[left][0], pos)
+    return best_range
+
+
+def make_snippet(doc_id: str, terms: list, expanded: list, positional_index: dict,
+                 snippet_index: dict, highlight: bool = False):
+    """
+    Snippet de `doc_id` centrado en la ventana con más términos de la consulta
+    (los expandidos valen la mitad). Lee del .txt solo el rango de bytes de la
+    ventana, así que el coste no depende del tamaño del documento.
+    Con `highlight`, el texto se escapa como HTML y los términos se envuelven
+    en SNIPPET_HIGHLIGHT_TAGS. Retorna None si el doc no está en el índice o
+    su .txt ha cambiado desde que se indexó (p. ej. re-extracción en curso).
+    """
+    entry = snippet_index['docs'].get(doc_id)
+    if entry is None:
+        return None
+    first_row, n_tokens, rel, size = entry
+    path = os.path.join(snippet_index['text_dir'], rel)
+    try:
+        if os.path.getsize(path) != size:
+            return None
+    except OSError:
+        return None
+
+    weights = {t: 0.5 for t in expanded}
+    weights.update({t: 1.0 for t in terms})
+    term_positions = {}
+    for term in weights:
+        plist = positional_index.get(term, {}).get(doc_id)
+        if plist is not None:
+            term_positions[term] = decode_positions(plist, limit=SNIPPET_MAX_OCCURRENCES)
+
+    window = best_window(term_positions, weights, SNIPPET_WINDOW_TOKENS)
+    offsets = snippet_index['offsets']
+    start = end = 0
+    if window is not None:
+        lo = max(0, window[0] - SNIPPET_CONTEXT_TOKENS)
+        hi = min(n_tokens - 1, window[1] + SNIPPET_CONTEXT_TOKENS)
+        # Una ventana fuera de los tokens del documento (posiciones de otra
+        # versión del texto) da lo > hi: se usa el comienzo del texto
+        if lo <= hi:
+            start = int(offsets[first_row + lo][0])
+            end = int(offsets[first_row + hi][1])
+    with open(path, 'rb') as f:
+        if end <= start:
+            text = f.read(FALLBACK_BYTES).decode('utf-8', errors='ignore')[:FALLBACK_CHARS]
+            return (html.escape(text) if highlight else text).strip()
+        f.seek(start)
+        data = f.read(end - start)
+
+    if not highlight:
+        return data.decode('utf-8', errors='ignore').strip()
+
+    # Rangos (relativos al fragmento) de los términos dentro de la ventana
+    marks = sorted({
+        (int(offsets[first_row + p][0]) - start, int(offsets[first_row + p][1]) - start)
+        for plist in term_positions.values() for p in plist if lo <= p <= hi
+    })
+    open_tag, close_tag = SNIPPET_HIGHLIGHT_TAGS
+    parts = []
+    cursor = 0
+    for m_start, m_end in marks:
+        if m_start < cursor:
+            continue
+        parts.append(html.escape(data[cursor:m_start].decode('utf-8', errors='ignore')))
+        parts.append(open_tag + html.escape(data[m_start:m_end].decode('utf-8', errors='ignore'))
+                     + close_tag)
+        cursor = m_end
+    parts.append(html.escape(data[cursor:].decode('utf-8', errors='ignore')))
+    return ''.join(parts).strip()
+
+
+if __name__ == '__main__':
+    build_snippet_index()
@@ -5,33 +5,57 @@ from collections import defaultdict
 
 from config import EXTRACTED_TEXT_DIR, INDEX_DIR, TFIDF_USE_IDF, TFIDF_SMOOTH_IDF, TFIDF_NORMALIZE
 from extractor.preprocess import preprocess_text
+from indexador.generaciones import resolve_index_dir
 
 
-def build_tfidf_index():
+def iter_corpus_tokens(text_dir: str = EXTRACTED_TEXT_DIR, doc_filter=None):
     """
-    Construye el índice TF-IDF manualmente:
-    - Lee todos los .txt en EXTRACTED_TEXT_DIR
-    - Preprocesa y tokeniza
-    - Calcula TF, DF y, opcionalmente, IDF
-    - Genera vectores TF-IDF y los normaliza
-    - Guarda estructuras en INDEX_DIR
+    Recorre los .txt de text_dir y genera (doc_id, tokens preprocesados) sin
+    tener todo el corpus en memoria. `doc_filter(doc_id)` permite saltarse
+    documentos antes de leerlos (p. ej. los de otro shard).
     """
-    # Recopilar documentos y tokens
-    docs_tokens = {}
-    for root, _, files in os.walk(EXTRACTED_TEXT_DIR):
+    for root, _, files in os.walk(text_dir):
         for filename in files:
             if filename.lower().endswith('.txt'):
                 path = os.path.join(root, filename)
-                rel = os.path.relpath(path, EXTRACTED_TEXT_DIR)
+                rel = os.path.relpath(path, text_dir)
                 doc_id = os.path.splitext(rel)[0]
+                if doc_filter is not None and not doc_filter(doc_id):
+                    continue
                 text = open(path, 'r', encoding='utf-8').read()
-                tokens = preprocess_text(text)
-                docs_tokens[doc_id] = tokens
+                yield doc_id, preprocess_text(text)
+
+
+def read_corpus_tokens(text_dir: str = EXTRACTED_TEXT_DIR) -> dict:
+    """
+    Lee todos los .txt de text_dir y devuelve {doc_id: tokens preprocesados}.
+    """
+    return dict(iter_corpus_tokens(text_dir))
+
+
+def compute_idf(df: dict, N: int) -> dict:
+    """
+    IDF de cada término a partir de su document frequency y del nº de documentos.
+    """
+    idf = {}
+    for term, doc_freq in df.items():
+        if TFIDF_SMOOTH_IDF:
+            # idf suavizada: log(1 + N/df)
+            idf_val = math.log(1.0 + (N / float(doc_freq)))
+        else:
+            idf_val = math.log(N / float(doc_freq)) if doc_freq > 0 else 0.0
+        idf[term] = idf_val if TFIDF_USE_IDF else 1.0
+    return idf
+
 
+def compute_tfidf_index(docs_tokens: dict, idf: dict = None):
+    """
+    Calcula TF, DF, IDF y los vectores TF-IDF (normalizados) en memoria.
+    Con `idf` (p. ej. el global de todos los shards) no se recalcula a partir
+    de estos documentos.
+    Retorna: (tfidf_index, idf, doc_ids)
+    """
     N = len(docs_tokens)
-    if N == 0:
-        print("No hay documentos para indexar en", EXTRACTED_TEXT_DIR)
-        return
 
     # Calcular DF (document frequency) y TF (term frequency)
     df = defaultdict(int)
@@ -45,14 +69,8 @@ def build_tfidf_index():
             df[term] += 1
 
     # Calcular IDF
-    idf = {}
-    for term, doc_freq in df.items():
-        if TFIDF_SMOOTH_IDF:
-            # idf suavizada: log(1 + N/df)
-            idf_val = math.log(1.0 + (N / float(doc_freq)))
-        else:
-            idf_val = math.log(N / float(doc_freq)) if doc_freq > 0 else 0.0
-        idf[term] = idf_val if TFIDF_USE_IDF else 1.0
+    if idf is None:
+        idf = compute_idf(df, N)
 
     # Construir vectores TF-IDF y normalizar
     tfidf_index = {}
@@ -69,42 +87,76 @@ def build_tfidf_index():
                     vec[term] /= norm
         tfidf_index[doc_id] = vec
 
-    # Guardar en disco
-    os.makedirs(INDEX_DIR, exist_ok=True)
-    with open(os.path.join(INDEX_DIR, 'tfidf_index.pkl'), 'wb') as f:
+    return tfidf_index, idf, list(docs_tokens.keys())
+
+
+def save_tfidf_index(tfidf_index: dict, idf: dict, doc_ids: list,
+                     index_dir: str = INDEX_DIR) -> None:
+    """
+    Persiste las estructuras TF-IDF en index_dir.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, 'tfidf_index.pkl'), 'wb') as f:
         pickle.dump(tfidf_index, f)
-    with open(os.path.join(INDEX_DIR, 'idf.pkl'), 'wb') as f:
+    with open(os.path.join(index_dir, 'idf.pkl'), 'wb') as f:
         pickle.dump(idf, f)
-    with open(os.path.join(INDEX_DIR, 'doc_ids.pkl'), 'wb') as f:
-        pickle.dump(list(docs_tokens.keys()), f)
+    with open(os.path.join(index_dir, 'doc_ids.pkl'), 'wb') as f:
+        pickle.dump(doc_ids, f)
+
+
+def build_tfidf_index(index_dir: str = INDEX_DIR):
+    """
+    Construye el índice TF-IDF manualmente:
+    - Lee todos los .txt en EXTRACTED_TEXT_DIR
+    - Preprocesa y tokeniza
+    - Calcula TF, DF y, opcionalmente, IDF
+    - Genera vectores TF-IDF y los normaliza
+    - Guarda estructuras en index_dir (una generación nueva desde main.py)
+    """
+    # Recopilar documentos y tokens
+    docs_tokens = read_corpus_tokens()
+
+    N = len(docs_tokens)
+    if N == 0:
+        print("No hay documentos para indexar en", EXTRACTED_TEXT_DIR)
+        return
+
+    tfidf_index, idf, doc_ids = compute_tfidf_index(docs_tokens)
+
+    # Guardar en disco
+    save_tfidf_index(tfidf_index, idf, doc_ids, index_dir)
 
-    print(f"Índice TF-IDF construido y guardado en '{INDEX_DIR}' con {N} documentos y {len(idf)} términos.")
+    print(f"Índice TF-IDF construido y guardado en '{index_dir}' con {N} documentos y {len(idf)} términos.")
 
 
-def load_tfidf_index():
+def load_tfidf_index(index_dir: str = None):
     """
-    Carga estructuras TF-IDF desde disco.
+    Carga estructuras TF-IDF desde disco (por defecto, de la generación
+    publicada o, si no hay ninguna, de INDEX_DIR).
     Retorna: (tfidf_index, idf, doc_ids)
     """
-    with open(os.path.join(INDEX_DIR, 'tfidf_index.pkl'), 'rb') as f:
+    index_dir = index_dir or resolve_index_dir()
+    with open(os.path.join(index_dir, 'tfidf_index.pkl'), 'rb') as f:
         tfidf_index = pickle.load(f)
-    with open(os.path.join(INDEX_DIR, 'idf.pkl'), 'rb') as f:
+    with open(os.path.join(index_dir, 'idf.pkl'), 'rb') as f:
         idf = pickle.load(f)
-    with open(os.path.join(INDEX_DIR, 'doc_ids.pkl'), 'rb') as f:
+    with open(os.path.join(index_dir, 'doc_ids.pkl'), 'rb') as f:
         doc_ids = pickle.load(f)
     return tfidf_index, idf, doc_ids
 
 
-def vectorize_query(tokens: list) -> dict:
+def vectorize_query(tokens: list, idf: dict = None) -> dict:
     """
     Dado un listado de tokens de consulta, retorna un vector TF-IDF normalizado.
+    Si no se pasa `idf`, se carga desde disco (lento: relee todos los índices).
     """
     # TF de la consulta
     freqs = defaultdict(int)
     for t in tokens:
         freqs[t] += 1
-    # Cargar IDF
-    _, idf, _ = load_tfidf_index()
+    # Cargar IDF solo si no viene ya en memoria
+    if idf is None:
+        _, idf, _ = load_tfidf_index()
     # Construir vector
     vec = {}
     for term, freq in freqs.items():
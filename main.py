@@ -1,3 +1,4 @@
+import os
 import sys
 
 from extractor.pdf_extractor import extract_all_texts
@@ -5,7 +6,14 @@ from indexador.tfidf_index import build_tfidf_index, load_tfidf_index
 from indexador.bm25f_index import build_bm25f_index, load_bm25f_index
 from buscador.search_engine import search
 from expansion.semantic_expand import expand_query
-from indexador.fasttext_index import build_fasttext_index
+from indexador.fasttext_index import (build_fasttext_index, build_quantized_embeddings,
+                                      EMBEDDINGS_FILE)
+from extractor.metadata import build_metadata_index
+from indexador.snippet_index import build_snippet_index
+from indexador.generaciones import new_generation, publish_generation, current_generation
+from buscador.shared_index import publish_current_index
+from config import (EMBEDDINGS_QUANTIZATION, INDEX_GENERATIONS_DIR, SHARED_INDEX,
+                    SHARED_INDEX_DIR)
 
 def mostrar_menu():
     print("\n=== Buscador Semántico ===")
@@ -15,20 +23,40 @@ def mostrar_menu():
 
 
 def opcion_indexar():
-    print("[1/3] Extrayendo texto de PDFs...")
+    print("[1/5] Extrayendo texto de PDFs...")
     processed = extract_all_texts()
     print(f"   Documentos procesados: {len(processed)}")
 
-    print("[2/3] Construyendo índice TF-IDF...")
-    build_tfidf_index()
+    # Los índices se construyen en una generación nueva; la API sigue
+    # sirviendo la anterior hasta que se publica completa
+    gen_dir = new_generation()
+    print(f"   Generación en construcción: {gen_dir}")
 
-    print("[3/3] Construyendo índice BM25F...")
-    build_bm25f_index()
+    print("[2/5] Construyendo índice TF-IDF...")
+    build_tfidf_index(gen_dir)
 
-    build_fasttext_index()
-    
+    print("[3/5] Construyendo índice BM25F...")
+    build_bm25f_index(gen_dir)
 
-    print("Indexación completada.")
+    print("[4/5] Extrayendo metadatos (año, páginas, idioma...)...")
+    _, _, doc_ids = load_tfidf_index(gen_dir)
+    build_metadata_index(doc_ids, gen_dir)
+
+    print("[5/5] Precalculando offsets para snippets...")
+    build_snippet_index(index_dir=gen_dir)
+
+    build_fasttext_index(os.path.join(gen_dir, EMBEDDINGS_FILE))
+    if EMBEDDINGS_QUANTIZATION:
+        build_quantized_embeddings(gen_dir, doc_ids)
+
+    name = publish_generation(gen_dir, extra={'documentos': len(doc_ids)})
+    print(f"Indexación completada. Generación publicada: {name}")
+
+    # Los workers con BUSCADOR_SHARED_INDEX=1 siguen el índice compartido,
+    # no esta generación: se reempaqueta si se usa
+    if SHARED_INDEX or current_generation(SHARED_INDEX_DIR):
+        shared = publish_current_index(os.path.join(INDEX_GENERATIONS_DIR, name))
+        print(f"Índice compartido publicado: {shared}")
 
 
 def opcion_buscar():
@@ -0,0 +1,31 @@
+# tests/test_compare.py
+
+from benchmarks.compare import compare, direction
+
+
+def test_direccion_de_las_metricas():
+    assert direction('consultas.completo.total_ms.p50') == -1
+    assert direction('indexado.tfidf.segundos') == -1
+    assert direction('pico_rss_bytes') == -1
+    assert direction('cuantizacion.pq.bytes_por_documento') == -1
+    assert direction('consultas.etapas.qps') == 1
+    assert direction('indexado.tfidf.docs_por_segundo') == 1
+    assert direction('cuantizacion.int8.rerank_0.recall') == 1
+    assert direction('cuantizacion.int8.reduccion') == 1
+    assert direction('indexado.corpus.documentos') == 0
+    assert direction('consultas.completo.candidatos_media') == 0
+
+
+def test_regresiones_en_ambas_direcciones():
+    base = {'meta': {'commit': 'a'},
+            'consultas': {'completo': {'total_ms': {'p50': 10.0}, 'qps': 100.0,
+                                       'candidatos_media': 50.0}},
+            'indexado': {'tfidf': {'docs_por_segundo': 1000.0}},
+            'pico_rss_bytes': 1000}
+    new = {'meta': {'commit': 'b'},
+           'consultas': {'completo': {'total_ms': {'p50': 9.0}, 'qps': 80.0,
+                                      'candidatos_media': 500.0}},
+           'indexado': {'tfidf': {'docs_por_segundo': 1200.0}},
+           'pico_rss_bytes': 1500}
+    regressions = {key for key, _, _, _, regression in compare(base, new, 10.0) if regression}
+    assert regressions == {'consultas.completo.qps', 'pico_rss_bytes'}
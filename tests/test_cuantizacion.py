@@ -0,0 +1,68 @@
+# tests/test_cuantizacion.py
+
+import numpy as np
+import pytest
+
+from indexador.fasttext_index import (quantize_int8, train_pq, encode_pq,
+                                      QuantizedEmbeddings)
+
+
+def unit_vectors(n, dim=16, seed=0):
+    x = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def pq_decode(codes, codebooks):
+    return np.concatenate([codebooks[j][codes[j]] for j in range(len(codebooks))], axis=1)
+
+
+def test_int8_error_acotado_por_la_escala():
+    x = unit_vectors(200)
+    x[:, 3] = 0.0  # dimensión siempre nula: escala 1, códigos 0
+    codes, scale = quantize_int8(x)
+    assert codes.dtype == np.int8 and np.abs(codes.astype(int)).max() <= 127
+    assert scale[3] == 1.0 and not codes[:, 3].any()
+    assert (np.abs(codes * scale - x) <= scale / 2 + 1e-7).all()
+
+
+def test_pq_ida_y_vuelta():
+    x = unit_vectors(2000)
+    codebooks = train_pq(x, n_subvectors=4, n_centroids=64)
+    assert codebooks.shape == (4, 64, 4)
+    codes = encode_pq(x, codebooks)
+    assert codes.shape == (4, 2000) and codes.dtype == np.uint8
+    error = np.linalg.norm(pq_decode(codes, codebooks) - x, axis=1)
+    assert error.mean() < 0.5
+
+
+def test_pq_con_menos_vectores_que_centroides():
+    # Con 10 vectores solo hay 10 centroides: ninguno a cero sin entrenar,
+    # y cada vector se reconstruye exactamente
+    x = unit_vectors(10)
+    codebooks = train_pq(x, n_subvectors=4, n_centroids=256)
+    assert codebooks.shape == (4, 10, 4)
+    codes = encode_pq(x, codebooks)
+    assert codes.max() < 10
+    assert pq_decode(codes, codebooks) == pytest.approx(x, abs=1e-6)
+
+
+@pytest.mark.parametrize('method', ['int8', 'pq'])
+def test_rerank_igual_que_coseno_exacto(method):
+    x = unit_vectors(500, seed=1)
+    doc_ids = [f'doc{i}' for i in range(len(x))]
+    if method == 'int8':
+        codes, params = quantize_int8(x)
+    else:
+        params = train_pq(x, n_subvectors=4, n_centroids=16)
+        codes = encode_pq(x, params)
+    emb = QuantizedEmbeddings(method, doc_ids, codes, params, exact=x, rerank=50)
+    q = np.random.default_rng(2).normal(size=16).astype(np.float32)
+    docs = doc_ids[::3] + ['sin_embedding']
+
+    exact = x @ q / np.linalg.norm(q)
+    scores = emb.rerank(q, docs)
+    assert set(scores) == set(doc_ids[::3])
+    expected = sorted(doc_ids[::3], key=lambda d: -exact[int(d[3:])])
+    assert sorted(scores, key=lambda d: -scores[d]) == expected
+    assert [scores[d] for d in expected] == pytest.approx(
+        [exact[int(d[3:])] for d in expected], abs=1e-5)
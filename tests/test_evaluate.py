@@ -0,0 +1,49 @@
+# tests/test_evaluate.py
+
+import math
+
+import pytest
+
+from evaluacion.evaluate import ndcg_at_k, reciprocal_rank, recall_at_k, pareto_front
+
+JUICIOS = {'a': 1, 'b': 0, 'c': 2, 'd': 3}
+
+
+def test_ndcg_graduado():
+    # DCG = (2^1-1)/log2(2) + 0 + (2^2-1)/log2(4) = 1 + 1.5
+    # ideal (3, 2, 1) = 7/log2(2) + 3/log2(3) + 1/log2(4)
+    ideal = 7 + 3 / math.log2(3) + 0.5
+    assert ndcg_at_k(['a', 'b', 'c'], JUICIOS, 3) == pytest.approx(2.5 / ideal)
+    assert ndcg_at_k(['d', 'c', 'a', 'b'], JUICIOS, 3) == pytest.approx(1.0)
+    # Solo cuentan los k primeros
+    assert ndcg_at_k(['b', 'x', 'd'], JUICIOS, 2) == 0.0
+    assert ndcg_at_k(['a'], {'a': 0}, 5) == 0.0
+
+
+def test_reciprocal_rank():
+    assert reciprocal_rank(['b', 'x', 'c', 'd'], JUICIOS) == pytest.approx(1 / 3)
+    assert reciprocal_rank(['d'], JUICIOS) == 1.0
+    # Sin ningún relevante (b tiene juicio 0)
+    assert reciprocal_rank(['b', 'x', 'y'], JUICIOS) == 0.0
+    assert reciprocal_rank([], JUICIOS) == 0.0
+
+
+def test_recall_at_k():
+    assert recall_at_k(['a', 'b', 'c'], JUICIOS, 2) == pytest.approx(1 / 3)
+    assert recall_at_k(['d', 'c', 'a'], JUICIOS, 3) == 1.0
+    assert recall_at_k(['a'], {'a': 0}, 3) == 0.0
+
+
+def test_pareto_front():
+    def config(name, ndcg, p50):
+        return {'nombre': name, 'ndcg@10': ndcg, 'latencia_p50_ms': p50}
+
+    results = [
+        config('rapida', 0.50, 10.0),
+        config('precisa', 0.60, 20.0),
+        config('dominada', 0.55, 25.0),   # peor que 'precisa' en ambas
+        config('lenta', 0.50, 12.0),      # mismo nDCG que 'rapida', más lenta
+        config('empate', 0.50, 10.0),     # igual que 'rapida': no la domina
+    ]
+    front = pareto_front(results, k=10)
+    assert [r['nombre'] for r in front] == ['rapida', 'empate', 'precisa']
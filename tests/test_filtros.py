@@ -0,0 +1,75 @@
+# tests/test_filtros.py
+
+import numpy as np
+import pytest
+
+from buscador.filtros import (ConsultaInvalida, build_filter_index, compile_filters,
+                              facet_counts, bits_to_docs, docs_to_bits,
+                              mask_to_bits, bits_to_mask)
+
+DOC_IDS = ['a', 'b', 'c', 'd', 'e']
+
+
+@pytest.fixture
+def filter_index():
+    metadata = {
+        'doc_ids': DOC_IDS,
+        'file': DOC_IDS,
+        'source': ['tesis', 'articulos', 'tesis', 'libros', 'articulos'],
+        'lang': ['es', 'en', 'es', 'es', 'en'],
+        'title': [''] * 5,
+        'author': ['ana', 'luis', '', 'ana', 'eva'],
+        'year': np.array([2018, 2019, 2020, 2021, 2019], dtype=np.int32),
+        'pages': np.array([10, 200, 35, 400, 12], dtype=np.int32),
+        'size': np.array([1, 2, 3, 4, 5], dtype=np.int64),
+    }
+    return build_filter_index(metadata, DOC_IDS)
+
+
+def _docs(bits):
+    return bits_to_docs(bits, DOC_IDS)
+
+
+def test_bits_roundtrip():
+    mask = np.array([True, False, True, True, False, False, False, False, True])
+    assert (bits_to_mask(mask_to_bits(mask), len(mask)) == mask).all()
+
+
+@pytest.mark.parametrize('filters, expected', [
+    ([], DOC_IDS),
+    (['year>=2019'], ['b', 'c', 'd', 'e']),
+    (['year=2019'], ['b', 'e']),
+    (['year!=2019', 'pages<100'], ['a', 'c']),
+    (['lang=es'], ['a', 'c', 'd']),
+    (['source=tesis,libros'], ['a', 'c', 'd']),
+    (['source!=tesis'], ['b', 'd', 'e']),
+    # Campo sin bitsets precalculados
+    (['author=ana'], ['a', 'd']),
+    (['lang=es', 'year>2020'], ['d']),
+    (['lang=fr'], []),
+])
+def test_compile_filters(filter_index, filters, expected):
+    assert _docs(compile_filters(filters, filter_index)) == expected
+
+
+@pytest.mark.parametrize('expr', ['year', 'year>=dosmil', 'lang>=es', 'color=rojo'])
+def test_compile_filters_invalidos(filter_index, expr):
+    with pytest.raises(ConsultaInvalida):
+        compile_filters([expr], filter_index)
+
+
+def test_facet_counts(filter_index):
+    counts = facet_counts(filter_index, filter_index['all'])
+    assert counts['source'] == {'tesis': 2, 'articulos': 2, 'libros': 1}
+    assert counts['lang'] == {'es': 3, 'en': 2}
+    assert counts['year'] == {'2018': 1, '2019': 2, '2020': 1, '2021': 1}
+
+
+def test_facet_counts_de_coincidencias_filtradas(filter_index):
+    # Facetas de los documentos con coincidencias (b, c, e) que pasan el filtro
+    matched = docs_to_bits({'b': 1.0, 'c': 0.5, 'e': 0.2}, filter_index)
+    bits = matched & compile_filters(['year>=2019'], filter_index)
+    counts = facet_counts(filter_index, bits)
+    assert counts['lang'] == {'en': 2, 'es': 1}
+    assert counts['source'] == {'articulos': 2, 'tesis': 1}
+    assert sum(counts['year'].values()) == 3
@@ -0,0 +1,118 @@
+# tests/test_generaciones.py
+
+import os
+import pickle
+
+import pytest
+
+from benchmarks.synthetic import generate_corpus, SyntheticEmbeddings
+from extractor.preprocess import preprocess_text
+from indexador.tfidf_index import compute_tfidf_index, save_tfidf_index
+from indexador.bm25f_index import compute_bm25f_index, save_bm25f_index
+from indexador.fasttext_index import compute_doc_embedding, EMBEDDINGS_FILE
+from indexador.generaciones import (new_generation, publish_generation, current_generation,
+                                    verify_generation, prune_generations, TMP_SUFFIX)
+from buscador import search_engine
+
+MODEL = SyntheticEmbeddings(dim=16)
+
+
+def build_generation(base_dir, n_docs=40, seed=0):
+    """
+    Escribe y publica en `base_dir` una generación pequeña con los índices
+    que necesita `load_indices`. Retorna su nombre.
+    """
+    docs = {doc: preprocess_text(text)
+            for doc, text in generate_corpus(n_docs, mean_length=50, vocab_size=300, seed=seed)}
+    gen_dir = new_generation(base_dir)
+    save_tfidf_index(*compute_tfidf_index(docs), gen_dir)
+    save_bm25f_index(*compute_bm25f_index(docs), gen_dir)
+    with open(os.path.join(gen_dir, EMBEDDINGS_FILE), 'wb') as f:
+        pickle.dump({doc: compute_doc_embedding(tokens, MODEL) for doc, tokens in docs.items()}, f)
+    return publish_generation(gen_dir)
+
+
+def test_publicar_actualiza_current(tmp_path):
+    assert current_generation(str(tmp_path)) is None
+    name = build_generation(str(tmp_path))
+    assert current_generation(str(tmp_path)) == name
+    assert verify_generation(os.path.join(tmp_path, name))['archivos']
+    assert not [d for d in os.listdir(tmp_path) if d.endswith(TMP_SUFFIX)]
+
+
+def test_generaciones_del_mismo_segundo_no_coinciden(tmp_path):
+    dirs = {new_generation(str(tmp_path)) for _ in range(5)}
+    assert len(dirs) == 5
+
+
+def test_generacion_incompleta_no_se_publica(tmp_path):
+    name = build_generation(str(tmp_path))
+    gen_dir = new_generation(str(tmp_path))
+    with open(os.path.join(gen_dir, 'idf.pkl'), 'wb') as f:
+        pickle.dump({}, f)
+    with pytest.raises(ValueError):
+        publish_generation(gen_dir)
+    assert current_generation(str(tmp_path)) == name
+    assert not os.path.exists(gen_dir)
+
+
+def test_checksum_incorrecto(tmp_path):
+    name = build_generation(str(tmp_path))
+    gen_dir = os.path.join(tmp_path, name)
+    with open(os.path.join(gen_dir, 'idf.pkl'), 'r+b') as f:
+        f.write(b'\0')
+    with pytest.raises(ValueError, match='Checksum'):
+        verify_generation(gen_dir)
+
+
+def test_prune_conserva_keep_y_la_actual(tmp_path):
+    names = [build_generation(str(tmp_path), n_docs=5) for _ in range(4)]
+    prune_generations(str(tmp_path), keep=2)
+    assert sorted(d for d in os.listdir(tmp_path) if d.startswith('gen-')) == sorted(names[2:])
+    assert current_generation(str(tmp_path)) == names[-1]
+
+
+def test_prune_borra_tmp_de_procesos_terminados(tmp_path):
+    build_generation(str(tmp_path), n_docs=5)
+    # pid que no existe (mayor que pid_max de Linux)
+    dead = tmp_path / ('gen-20200101-000000-99999999-0000' + TMP_SUFFIX)
+    dead.mkdir()
+    alive = new_generation(str(tmp_path))
+    prune_generations(str(tmp_path))
+    assert not dead.exists()
+    assert os.path.isdir(alive)
+
+
+@pytest.fixture
+def generaciones(tmp_path, monkeypatch):
+    # El buscador sigue el CURRENT de tmp_path en lugar del de config
+    base = str(tmp_path)
+    monkeypatch.setattr(search_engine, '_generations_dir', lambda: base)
+
+    def load_active(model=None):
+        return search_engine.load_indices(os.path.join(base, current_generation(base)),
+                                          model=model or MODEL)
+
+    monkeypatch.setattr(search_engine, '_load_active', load_active)
+    monkeypatch.setattr(search_engine, '_INDICES', None)
+    monkeypatch.setattr(search_engine, '_FAILED_GENERATION', None)
+    return base
+
+
+def test_recarga_mantiene_indices_si_falla_checksum(generaciones):
+    first = build_generation(generaciones, seed=1)
+    active = search_engine.get_indices()
+    assert active['generacion'] == first
+
+    second = build_generation(generaciones, seed=2)
+    with open(os.path.join(generaciones, second, 'tfidf_index.pkl'), 'r+b') as f:
+        f.write(b'\0')
+    assert not search_engine.reload_indices()
+    assert search_engine.get_indices() is active
+    # La generación dañada no se reintenta
+    assert not search_engine.reload_indices()
+
+    third = build_generation(generaciones, seed=3)
+    assert search_engine.reload_indices()
+    assert search_engine.get_indices()['generacion'] == third
+    assert search_engine.get_indices()['model'] is active['model']
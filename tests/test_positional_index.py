@@ -0,0 +1,72 @@
+# tests/test_positional_index.py
+
+import pytest
+
+from indexador.positional_index import (encode_positions, decode_positions,
+                                        compute_positional_index, split_phrases,
+                                        phrase_matches, min_span, proximity_score)
+
+
+@pytest.mark.parametrize('positions', [
+    [],
+    [0],
+    [0, 1, 2, 127],
+    # Deltas de 128 o más: varint de varios bytes
+    [128],
+    [5, 133, 16_517, 16_518, 2_113_669],
+    list(range(0, 1_000_000, 997)),
+])
+def test_encode_decode_roundtrip(positions):
+    assert decode_positions(encode_positions(positions)) == positions
+
+
+def test_encode_usa_un_byte_por_delta_pequeno():
+    assert len(encode_positions([3, 10, 137])) == 3
+    assert len(encode_positions([3, 131])) == 3  # delta 128 ocupa dos bytes
+
+
+def _index(docs):
+    return compute_positional_index({doc: text.split() for doc, text in docs.items()})
+
+
+def test_split_phrases():
+    text, phrases = split_phrases('python "orientada objetos" datos "" ')
+    assert phrases == ['orientada objetos']
+    assert '"' not in text
+
+
+def test_phrase_matches_exige_terminos_consecutivos():
+    index = _index({
+        'a': 'programacion orientada objetos python',
+        'b': 'objetos orientada programacion',
+        'c': 'programacion orientada python programacion orientada objetos',
+    })
+    assert phrase_matches(['programacion', 'orientada', 'objetos'], index) == {'a': 1, 'c': 1}
+    assert phrase_matches(['programacion', 'orientada'], index) == {'a': 1, 'c': 2}
+    assert phrase_matches(['orientada', 'inexistente'], index) == {}
+
+
+def test_phrase_matches_restringe_a_docs():
+    index = _index({'a': 'base datos', 'b': 'base datos'})
+    assert phrase_matches(['base', 'datos'], index, docs={'b'}) == {'b': 1}
+
+
+def test_phrase_matches_un_termino_cuenta_apariciones():
+    index = _index({'a': 'datos datos x datos', 'b': 'x'})
+    assert phrase_matches(['datos'], index) == {'a': 3}
+
+
+def test_min_span_y_proximidad():
+    assert min_span([[0, 10], [1, 20]]) == 2
+    assert min_span([[5], [9], [7]]) == 5
+    index = _index({'juntos': 'red neuronal', 'lejos': 'red a b c d e f neuronal'})
+    cerca = proximity_score(['red', 'neuronal'], 'juntos', index)
+    assert cerca == pytest.approx(1.0)
+    assert 0.0 < proximity_score(['red', 'neuronal'], 'lejos', index) < cerca
+
+
+@pytest.mark.parametrize('positions', [[1, 2, 3, 4, 5], [10, 300, 20_000, 20_001, 3_000_000]])
+def test_decode_positions_con_limite(positions):
+    data = encode_positions(positions)
+    for limit in range(len(positions) + 2):
+        assert decode_positions(data, limit=limit) == positions[:limit]
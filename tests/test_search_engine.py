@@ -0,0 +1,80 @@
+# tests/test_search_engine.py
+
+import os
+
+import pytest
+
+from benchmarks.synthetic import generate_corpus, generate_queries, SyntheticEmbeddings
+from extractor.preprocess import preprocess_text
+from indexador.tfidf_index import compute_tfidf_index
+from indexador.bm25f_index import compute_bm25f_index
+from indexador.positional_index import compute_positional_index
+from indexador.fasttext_index import compute_doc_embedding
+from buscador.search_engine import search
+from buscador.metricas import render_metrics, span
+
+VOCAB = 400
+
+
+@pytest.fixture(scope='module')
+def indices():
+    docs = {doc: preprocess_text(text)
+            for doc, text in generate_corpus(200, mean_length=60, vocab_size=VOCAB)}
+    model = SyntheticEmbeddings(dim=16)
+    tfidf_index, idf, doc_ids = compute_tfidf_index(docs)
+    inverted_index, bm25f_stats = compute_bm25f_index(docs)
+    return {
+        'tfidf_index': tfidf_index, 'idf': idf, 'doc_ids': doc_ids,
+        'inverted_index': inverted_index, 'bm25f_stats': bm25f_stats,
+        'positional_index': compute_positional_index(docs),
+        'filter_index': None, 'snippet_index': None,
+        'doc_embeddings': {doc: compute_doc_embedding(tokens, model)
+                           for doc, tokens in docs.items()},
+        'model': model,
+    }
+
+
+def test_etapas_mismo_top_k_que_completo(indices):
+    # Sin peso semántico solo puntúan los documentos con algún término, y
+    # con candidates_k >= N 'etapas' los re-puntúa todos
+    params = dict(top_n=10, expand=False, semantic_weight=0.0)
+    for query in generate_queries(20, vocab_size=VOCAB):
+        expected = search(query, indices=indices, **params)
+        got = search(query, indices=indices, mode='etapas',
+                     candidates_k=len(indices['doc_ids']), **params)
+        assert [doc for doc, _ in got] == [doc for doc, _ in expected]
+        assert [s for _, s in got] == pytest.approx([s for _, s in expected])
+
+
+def test_etapas_mismos_scores(indices):
+    # Con peso semántico 'etapas' puede dejar fuera documentos sin términos
+    # de la consulta, pero los que devuelve tienen el score de 'completo'
+    for query in generate_queries(20, vocab_size=VOCAB):
+        full = dict(search(query, indices=indices, top_n=len(indices['doc_ids']),
+                           expand=False))
+        for doc, score in search(query, indices=indices, mode='etapas', candidates_k=20,
+                                 expand=False):
+            assert score == pytest.approx(full[doc])
+
+
+def test_render_metrics_expone_histogramas_de_etapas(indices):
+    stats = {}
+    search(generate_queries(1, vocab_size=VOCAB)[0], indices=indices, stats=stats,
+           expand=False)
+    text = render_metrics()
+    assert '# TYPE buscador_etapa_duracion_segundos histogram' in text
+    for etapa in stats['tiempos_ms']:
+        labels = f'etapa="{etapa}",proceso="{os.getpid()}"'
+        assert f'buscador_etapa_duracion_segundos_bucket{{{labels},le="+Inf"}}' in text
+        assert f'buscador_etapa_duracion_segundos_count{{{labels}}}' in text
+
+
+def test_span_acumula_tiempos():
+    tiempos = {}
+    for _ in range(3):
+        with span('prueba_span', tiempos):
+            pass
+    assert set(tiempos) == {'prueba_span'} and tiempos['prueba_span'] >= 0.0
+    count = [line for line in render_metrics().splitlines()
+             if line.startswith('buscador_etapa_duracion_segundos_count{etapa="prueba_span"')]
+    assert count and count[0].endswith(' 3')
@@ -0,0 +1,120 @@
+# tests/test_shards.py
+
+import asyncio
+
+import pytest
+
+from benchmarks.synthetic import (generate_corpus, generate_queries, generate_metadata,
+                                  SyntheticEmbeddings)
+from extractor.preprocess import preprocess_text
+from indexador.tfidf_index import compute_tfidf_index
+from indexador.bm25f_index import compute_bm25f_index
+from indexador.positional_index import compute_positional_index
+from indexador.fasttext_index import compute_doc_embedding
+from indexador.shards import compute_global_stats, compute_shard_indices, shard_of
+from buscador.filtros import build_filter_index
+from buscador.search_engine import search
+from buscador.coordinador import search_shard, search_sharded
+
+N_SHARDS = 3
+VOCAB = 2000
+
+
+class MemoryShard:
+    """
+    Shard en el mismo proceso (misma interfaz que LocalShard/HttpShard).
+    """
+
+    def __init__(self, shard_id, indices, delay=0.0):
+        self.name = f"mem:{shard_id}"
+        self.indices = indices
+        self.delay = delay
+
+    async def search(self, query, params, timeout):
+        async def run():
+            await asyncio.sleep(self.delay)
+            return search_shard(query, params, indices=self.indices)
+        return await asyncio.wait_for(run(), timeout)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(scope='module')
+def corpus():
+    docs = {doc: preprocess_text(text)
+            for doc, text in generate_corpus(300, mean_length=200, vocab_size=VOCAB)}
+    model = SyntheticEmbeddings(dim=32)
+    embeddings = {doc: compute_doc_embedding(tokens, model) for doc, tokens in docs.items()}
+    metadata = generate_metadata(sorted(docs))
+
+    def finish(indices, docs_tokens):
+        indices.update(model=model,
+                       positional_index=compute_positional_index(docs_tokens),
+                       snippet_index=None,
+                       doc_embeddings={doc: embeddings[doc] for doc in docs_tokens},
+                       filter_index=build_filter_index(metadata, indices['doc_ids']))
+        return indices
+
+    tfidf_index, idf, doc_ids = compute_tfidf_index(docs)
+    inverted_index, bm25f_stats = compute_bm25f_index(docs)
+    single = finish({'tfidf_index': tfidf_index, 'idf': idf, 'doc_ids': doc_ids,
+                     'inverted_index': inverted_index, 'bm25f_stats': bm25f_stats}, docs)
+
+    global_stats = compute_global_stats(docs.items())
+    shards = []
+    for i in range(N_SHARDS):
+        docs_tokens = {doc: tokens for doc, tokens in docs.items()
+                       if shard_of(doc, N_SHARDS) == i}
+        shards.append(finish(compute_shard_indices(docs_tokens, global_stats), docs_tokens))
+    return single, shards
+
+
+def test_shards_igual_que_indice_unico(corpus):
+    single, shards = corpus
+    params = dict(top_n=10, expand=False, proximity_weight=0)
+    for query in generate_queries(20, vocab_size=VOCAB):
+        expected = search(query, indices=single, **params)
+        got = search_sharded(query, [MemoryShard(i, ix) for i, ix in enumerate(shards)],
+                             **params)
+        assert [doc for doc, _ in got] == [doc for doc, _ in expected]
+        assert [score for _, score in got] == pytest.approx([s for _, s in expected],
+                                                            abs=1e-9)
+
+
+def test_shards_etapas_mismos_scores(corpus):
+    # En 'etapas' cada shard re-puntúa su propio top-k de BM25F (más
+    # candidatos que el índice único), pero el score de cada documento es
+    # el mismo que en el índice único
+    single, shards = corpus
+    params = dict(expand=False, proximity_weight=0)
+    for query in generate_queries(20, vocab_size=VOCAB):
+        full = dict(search(query, indices=single, top_n=len(single['doc_ids']), **params))
+        got = search_sharded(query, [MemoryShard(i, ix) for i, ix in enumerate(shards)],
+                             top_n=10, mode='etapas', candidates_k=20, **params)
+        for doc, score in got:
+            assert score == pytest.approx(full[doc], abs=1e-9)
+
+
+def test_shards_facetas_y_recuentos(corpus):
+    single, shards = corpus
+    query = generate_queries(1, vocab_size=VOCAB)[0]
+    expected, stats = {}, {}
+    search(query, indices=single, stats=expected, facets=True, filters=['lang=es'])
+    search_sharded(query, [MemoryShard(i, ix) for i, ix in enumerate(shards)],
+                   stats=stats, facets=True, filters=['lang=es'])
+    assert stats['facetas'] == expected['facetas']
+    assert stats['documentos'] == expected['documentos']
+    assert not stats['parcial']
+
+
+def test_shard_lento_da_respuesta_parcial(corpus):
+    _, shards = corpus
+    query = generate_queries(1, vocab_size=VOCAB)[0]
+    stats = {}
+    slow = [MemoryShard(i, ix, delay=1.0 if i == 1 else 0.0) for i, ix in enumerate(shards)]
+    results = search_sharded(query, slow, top_n=5, timeout=0.2, stats=stats)
+    assert stats['parcial']
+    assert stats['shards']['mem:1'] == 'timeout'
+    assert stats['documentos'] == len(shards[0]['doc_ids']) + len(shards[2]['doc_ids'])
+    assert all(shard_of(doc, N_SHARDS) != 1 for doc, _ in results)
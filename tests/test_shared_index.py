@@ -0,0 +1,139 @@
+# tests/test_shared_index.py
+
+import os
+import shutil
+
+import pytest
+
+from benchmarks.synthetic import (generate_corpus, generate_queries, generate_metadata,
+                                  SyntheticEmbeddings)
+from extractor.preprocess import preprocess_text
+from indexador.tfidf_index import compute_tfidf_index
+from indexador.bm25f_index import compute_bm25f_index
+from indexador.positional_index import compute_positional_index
+from indexador.fasttext_index import compute_doc_embedding
+from indexador.snippet_index import build_snippet_index, load_snippet_index, make_snippet
+from buscador.filtros import build_filter_index
+from buscador.search_engine import search
+from buscador.shared_index import (publish_shared_index, attach_shared_index, SharedIndex,
+                                   META_FILE)
+
+VOCAB = 500
+
+
+@pytest.fixture(scope='module')
+def indices(tmp_path_factory):
+    # Índices en memoria con metadatos y snippets sobre .txt reales
+    base = tmp_path_factory.mktemp('origen')
+    text_dir = base / 'textos'
+    text_dir.mkdir()
+    docs = {}
+    for doc, text in generate_corpus(150, mean_length=80, vocab_size=VOCAB):
+        (text_dir / f'{doc}.txt').write_text(text, encoding='utf-8')
+        docs[doc] = preprocess_text(text)
+    build_snippet_index(str(text_dir), str(base / 'indice'))
+
+    model = SyntheticEmbeddings(dim=16)
+    tfidf_index, idf, doc_ids = compute_tfidf_index(docs)
+    inverted_index, bm25f_stats = compute_bm25f_index(docs)
+    return {
+        'tfidf_index': tfidf_index, 'idf': idf, 'doc_ids': doc_ids,
+        'inverted_index': inverted_index, 'bm25f_stats': bm25f_stats,
+        'positional_index': compute_positional_index(docs),
+        'filter_index': build_filter_index(generate_metadata(doc_ids), doc_ids),
+        'snippet_index': load_snippet_index(str(base / 'indice'), str(text_dir)),
+        'doc_embeddings': {doc: compute_doc_embedding(tokens, model)
+                           for doc, tokens in docs.items()},
+        'model': model,
+        'generacion': 'gen-origen',
+    }
+
+
+def assert_same_results(got, expected):
+    assert [doc for doc, _ in got] == [doc for doc, _ in expected]
+    assert [s for _, s in got] == pytest.approx([s for _, s in expected], abs=1e-5)
+
+
+@pytest.fixture
+def shared(indices, tmp_path):
+    publish_shared_index(indices, str(tmp_path))
+    return attach_shared_index(str(tmp_path))
+
+
+@pytest.mark.parametrize('mode', ['completo', 'etapas'])
+@pytest.mark.parametrize('filters', [None, ['lang=es'], ['year>=2010', 'source!=fuente_1']])
+def test_compartido_igual_que_en_memoria(indices, shared, mode, filters):
+    params = dict(top_n=10, expand=False, mode=mode, filters=filters)
+    for query in generate_queries(15, vocab_size=VOCAB):
+        expected_stats, stats = {}, {}
+        expected = search(query, indices=indices, stats=expected_stats, facets=True, **params)
+        got = search(query, indices=shared, stats=stats, facets=True, **params)
+        assert_same_results(got, expected)
+        assert stats['facetas'] == expected_stats['facetas']
+
+
+def test_frase_con_filtro(indices, shared):
+    text_dir = indices['snippet_index']['text_dir']
+    with open(os.path.join(text_dir, indices['doc_ids'][0] + '.txt'), encoding='utf-8') as f:
+        tokens = preprocess_text(f.read())
+    query = f'"{tokens[0]} {tokens[1]}" {tokens[5]}'
+    params = dict(top_n=10, expand=False, filters=['year>=2000'])
+    assert_same_results(search(query, indices=shared, **params),
+                        search(query, indices=indices, **params))
+
+
+def test_doc_ids_y_posiciones(indices, shared):
+    doc_ids = indices['doc_ids']
+    assert list(shared['doc_ids']) == doc_ids
+    assert shared['doc_ids'].take([2, 0]) == [doc_ids[2], doc_ids[0]]
+    pos = shared['filter_index']['pos']
+    assert pos[doc_ids[7]] == 7
+    assert 'no-existe' not in pos
+    assert 'x' * 500 not in pos
+    assert pos.rows([doc_ids[3], 'no-existe', doc_ids[1]]).tolist() == [3, -1, 1]
+
+
+def test_attach_sin_generacion_de_origen(indices, tmp_path):
+    # Metadatos y snippets van en la generación compartida: borrar la de
+    # indexación de la que salió no cambia los resultados
+    origin = tmp_path / 'origen'
+    shutil.copytree(os.path.dirname(indices['snippet_index']['offsets'].filename), origin)
+    copy = dict(indices, snippet_index=load_snippet_index(
+        str(origin), indices['snippet_index']['text_dir']))
+    publish_shared_index(copy, str(tmp_path / 'compartido'))
+    shutil.rmtree(origin)
+
+    shared = attach_shared_index(str(tmp_path / 'compartido'))
+    query = generate_queries(1, vocab_size=VOCAB)[0]
+    terms = preprocess_text(query)
+    for doc, _ in search(query, indices=shared, top_n=5, expand=False):
+        assert (make_snippet(doc, terms, terms, shared['positional_index'],
+                             shared['snippet_index'], highlight=True)
+                == make_snippet(doc, terms, terms, indices['positional_index'],
+                                indices['snippet_index'], highlight=True))
+    assert_same_results(search(query, indices=shared, filters=['lang=en'], expand=False),
+                        search(query, indices=indices, filters=['lang=en'], expand=False))
+
+
+def test_sin_metadatos_ni_snippets(indices, tmp_path):
+    name = publish_shared_index(dict(indices, filter_index=None, snippet_index=None),
+                                str(tmp_path))
+    shared = SharedIndex(os.path.join(tmp_path, name)).bundle()
+    assert shared['filter_index'] is None
+    assert shared['snippet_index'] is None
+
+
+def test_attach_rechaza_archivo_alterado(indices, tmp_path):
+    name = publish_shared_index(indices, str(tmp_path))
+    with open(os.path.join(tmp_path, name, 'snip_docs.npy'), 'ab') as f:
+        f.write(b'\0')
+    with pytest.raises(ValueError):
+        attach_shared_index(str(tmp_path))
+
+
+def test_attach_rechaza_generacion_sin_snippets(indices, tmp_path):
+    name = publish_shared_index(indices, str(tmp_path))
+    os.remove(os.path.join(tmp_path, name, 'snip_docs.npy'))
+    with pytest.raises(ValueError):
+        attach_shared_index(str(tmp_path))
+    assert os.path.exists(os.path.join(tmp_path, name, META_FILE))
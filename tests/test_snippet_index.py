@@ -0,0 +1,36 @@
+# tests/test_snippet_index.py
+
+import pytest
+
+from extractor.preprocess import preprocess_text
+from indexador.positional_index import compute_positional_index, encode_positions
+from indexador.snippet_index import build_snippet_index, load_snippet_index, make_snippet
+
+TEXTO = ("Introducción. Las redes neuronales aprenden representaciones. "
+         "Más adelante se estudian las redes convolucionales y su entrenamiento.")
+
+
+@pytest.fixture
+def snippet_env(tmp_path):
+    text_dir = tmp_path / 'textos'
+    text_dir.mkdir()
+    (text_dir / 'libro.txt').write_text(TEXTO, encoding='utf-8')
+    build_snippet_index(str(text_dir), str(tmp_path / 'indice'))
+    positional_index = compute_positional_index({'libro': preprocess_text(TEXTO)})
+    return positional_index, load_snippet_index(str(tmp_path / 'indice'), str(text_dir))
+
+
+def test_snippet_resalta_terminos(snippet_env):
+    positional_index, snippet_index = snippet_env
+    snippet = make_snippet('libro', ['convolucionales'], [], positional_index,
+                           snippet_index, highlight=True)
+    assert '<mark>convolucionales</mark>' in snippet
+
+
+def test_snippet_ventana_fuera_del_documento(snippet_env):
+    # Posiciones de otra versión del texto, más allá de sus tokens: se
+    # devuelve el comienzo del texto en lugar de leer hasta el final
+    _, snippet_index = snippet_env
+    positional_index = {'redes': {'libro': encode_positions([500, 501])}}
+    snippet = make_snippet('libro', ['redes'], [], positional_index, snippet_index)
+    assert snippet == TEXTO[:200].strip()